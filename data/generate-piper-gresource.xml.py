@@ -6,6 +6,16 @@ from pathlib import Path
 infile = sys.argv[1]
 outfile = sys.argv[2]
 svgdir = sys.argv[3]
+# If given, the SVGs are taken from this directory instead, relative to the
+# output file, under their original resource path.
+aliasdir = sys.argv[4] if len(sys.argv) > 4 else None
+# If given, the device thumbnails rendered into this directory, relative to
+# the output file, are included for the scale factors in
+# piper.thumbnail.BUNDLED_SCALES.
+thumbnaildir = sys.argv[5] if len(sys.argv) > 5 else None
+if thumbnaildir is not None:
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    from piper.thumbnail import BUNDLED_SCALES
 print(f"Using input file: {infile}")
 print(f"Writing to output file: {outfile}")
 print(f"SVG directory: {svgdir}")
@@ -14,9 +24,27 @@ with open(infile) as f_in, open(outfile, "w") as f_out:
     for line in f_in:
         if "@SVG_FILES@" in line:
             for svg in sorted(Path(svgdir).glob("*.svg")):
-                f_out.write(
-                    line.replace("@SVG_FILES@", f"{svg.parent.name}/{svg.name}")
-                )
+                name = f"{svg.parent.name}/{svg.name}"
+                if aliasdir is None:
+                    f_out.write(line.replace("@SVG_FILES@", name))
+                else:
+                    f_out.write(
+                        line.replace("<file>", f'<file alias="{name}">').replace(
+                            "@SVG_FILES@", f"{aliasdir}/{svg.name}"
+                        )
+                    )
+            continue
+        if "@THUMBNAIL_FILES@" in line:
+            if thumbnaildir is None:
+                continue
+            for svg in sorted(Path(svgdir).glob("*.svg")):
+                for scale in BUNDLED_SCALES:
+                    name = f"{svg.stem}@{scale}x.png"
+                    f_out.write(
+                        line.replace(
+                            "<file>", f'<file alias="thumbnails/{name}">'
+                        ).replace("@THUMBNAIL_FILES@", f"{thumbnaildir}/{name}")
+                    )
             continue
 
         f_out.write(line)
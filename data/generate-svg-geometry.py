@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+
+"""Extracts the geometry MouseMap lays out its children with from every
+device SVG into a sidecar table, so the SVGs don't have to be queried or
+measured at runtime.
+
+The table is a JSON object keyed by SVG file name, which loads an order of
+magnitude faster than a Python literal of this size. Each entry holds
+the document's size in pixels, the bounding box of every buttonN and ledN
+element and of their -leader and -path elements as (x, y, width, height) in
+whole pixels, and the leaders that point to the left. Elements that cannot be
+measured without rendering, such as text, are left out and measured by
+librsvg at runtime.
+
+A depfile listing all SVGs is written so the table is regenerated whenever
+one of them changes."""
+
+import json
+import math
+import re
+import sys
+from pathlib import Path
+
+from lxml import etree
+
+sys.path.insert(0, str(Path(__file__).parent))
+import svgpath  # noqa: E402
+
+ID_RE = re.compile(r"^(button|led)[0-9]+(-leader|-path)?$")
+
+
+def extract(path):
+    root = etree.parse(str(path)).getroot()
+    root_matrix, width, height = svgpath.document_matrix(root)
+    elements = {}
+    left = []
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        svg_id = element.get("id")
+        if svg_id is None or not ID_RE.match(svg_id):
+            continue
+        matrix = svgpath.ancestor_matrix(element, root_matrix)
+        box = svgpath.element_bbox(element, matrix)
+        if box is None:
+            continue
+        # Snap to 1/100 px first, so sub-pixel noise such as rounded
+        # coordinates doesn't grow the box by a whole pixel.
+        x0, y0, x1, y1 = (round(v, 2) for v in box)
+        x, y = math.floor(x0), math.floor(y0)
+        elements[f"#{svg_id}"] = (x, y, math.ceil(x1) - x, math.ceil(y1) - y)
+        # See data/svgs/README.md.
+        if svg_id.endswith("-leader") and "text-align:end" in element.get("style", ""):
+            left.append(f"#{svg_id}")
+    return {
+        "size": (round(width), round(height)),
+        "elements": elements,
+        "left": sorted(left),
+    }
+
+
+svgdir = Path(sys.argv[1])
+outfile = sys.argv[2]
+depfile = sys.argv[3]
+
+svgs = sorted(svgdir.glob("*.svg"))
+table = {}
+errors = []
+for svg in svgs:
+    try:
+        table[svg.name] = extract(svg)
+    except (ValueError, IndexError, etree.XMLSyntaxError) as e:
+        errors.append(f"{svg.name}: {e}")
+
+if errors:
+    for error in errors:
+        print(error, file=sys.stderr)
+    sys.exit(1)
+
+with open(outfile, "w") as f:
+    json.dump(table, f, separators=(",", ":"), sort_keys=True)
+
+with open(depfile, "w") as f:
+    deps = " ".join(str(svg).replace(" ", "\\ ") for svg in svgs)
+    f.write(f"{outfile}: {deps}\n")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+"""Compiles svg-lookup.ini into the lookup table piper.svg loads at runtime.
+
+The table is a trie written as a Python literal: nested dicts keyed by bus,
+vendor ID and product ID, where "*" is the wildcard key. The innermost dict is
+keyed by version, either as an int, as an inclusive (first, last) range tuple
+or as "*", and maps to the SVG file name.
+
+The build fails if a pattern is listed more than once, a pattern is malformed,
+version ranges overlap or an SVG does not exist."""
+
+import configparser
+import pprint
+import re
+import sys
+from pathlib import Path
+
+MATCH_RE = re.compile(
+    r"^(?P<bus>usb|bluetooth)"
+    r":(?P<vid>[0-9a-f]{4}|\*)"
+    r":(?P<pid>[0-9a-f]{4}|\*)"
+    r"(:(?P<version>[0-9]+|[0-9]+-[0-9]+|\*))?$"
+)
+
+
+def parse_version(version):
+    # A missing version means version 0, like the model strings ratbagd
+    # reports for virtually all devices.
+    if version is None:
+        return 0
+    if version == "*":
+        return version
+    if "-" in version:
+        first, last = (int(v) for v in version.split("-"))
+        return (first, last)
+    return int(version)
+
+
+def check_ranges(versions):
+    ranges = sorted(k for k in versions if isinstance(k, tuple))
+    for first, last in ranges:
+        if first > last:
+            yield f"empty version range {first}-{last}"
+    for (_, last), (first, _) in zip(ranges, ranges[1:]):
+        if first <= last:
+            yield f"overlapping version ranges at {first}"
+    exact = [k for k in versions if isinstance(k, int)]
+    for version in exact:
+        for first, last in ranges:
+            if first <= version <= last:
+                yield f"version {version} is also in range {first}-{last}"
+
+
+infile = sys.argv[1]
+outfile = sys.argv[2]
+svgdir = sys.argv[3]
+
+config = configparser.ConfigParser(strict=True)
+config.optionxform = lambda option: option
+config.read(infile)
+
+errors = []
+trie = {}
+count = 0
+for section in config.sections():
+    svg = config[section]["Svg"]
+    if not Path(svgdir, svg).exists():
+        errors.append(f"[{section}]: {svg} does not exist")
+    for match in config[section]["DeviceMatch"].split(";"):
+        if not match:
+            continue
+        m = MATCH_RE.match(match)
+        if m is None:
+            errors.append(f"[{section}]: malformed match {match}")
+            continue
+        versions = (
+            trie.setdefault(m["bus"], {})
+            .setdefault(m["vid"], {})
+            .setdefault(m["pid"], {})
+        )
+        version = parse_version(m["version"])
+        if version in versions:
+            errors.append(
+                f"[{section}]: {match} is already matched by {versions[version]}"
+            )
+            continue
+        versions[version] = svg
+        count += 1
+
+for bus, vids in trie.items():
+    for vid, pids in vids.items():
+        for pid, versions in pids.items():
+            for error in check_ranges(versions):
+                errors.append(f"{bus}:{vid}:{pid}: {error}")
+
+if not count:
+    errors.append("no device matches found")
+if errors:
+    for error in errors:
+        print(f"{infile}: {error}", file=sys.stderr)
+    sys.exit(1)
+
+with open(outfile, "w") as f:
+    f.write(f"# Generated from {Path(infile).name}, do not edit\n")
+    f.write(pprint.pformat(trie, width=100))
+    f.write("\n")
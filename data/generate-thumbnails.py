@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+
+"""Renders the thumbnails the welcome perspective shows for every device SVG,
+for each scale factor in piper.thumbnail.BUNDLED_SCALES. They are compiled
+into the gresource so they don't have to be rendered at runtime.
+
+A depfile listing all SVGs is written so the thumbnails are rendered again
+whenever one of them changes."""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import gi  # noqa: E402
+
+gi.require_version("Rsvg", "2.0")
+from gi.repository import GLib, Rsvg  # noqa: E402
+
+from piper.thumbnail import (  # noqa: E402
+    BUNDLED_SCALES,
+    render_thumbnail,
+    thumbnail_name,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("svgdir", type=Path)
+    parser.add_argument("outdir", type=Path)
+    parser.add_argument("--stamp", help="a file to touch when done")
+    parser.add_argument("--depfile", help="a depfile for the stamp to write")
+    args = parser.parse_args()
+
+    args.outdir.mkdir(parents=True, exist_ok=True)
+    svgs = sorted(args.svgdir.glob("*.svg"))
+    errors = []
+    for svg in svgs:
+        try:
+            handle = Rsvg.Handle.new_from_file(str(svg))
+        except GLib.Error as e:
+            errors.append(f"{svg.name}: {e.message}")
+            continue
+        for scale in BUNDLED_SCALES:
+            surface = render_thumbnail(handle, scale)
+            if surface is None:
+                errors.append(f"{svg.name}: no Device layer")
+                break
+            surface.write_to_png(str(args.outdir / thumbnail_name(svg.name, scale)))
+        handle.close()
+
+    if errors:
+        for error in errors:
+            print(error, file=sys.stderr)
+        sys.exit(1)
+
+    if args.stamp:
+        Path(args.stamp).touch()
+    if args.depfile:
+        with open(args.depfile, "w") as f:
+            deps = " ".join(str(svg).replace(" ", "\\ ") for svg in svgs)
+            f.write(f"{args.stamp}: {deps}\n")
+
+
+if __name__ == "__main__":
+    main()
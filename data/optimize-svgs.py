@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+
+"""Minifies the device SVGs for the gresource. Editor metadata, comments,
+unused definitions and redundant style properties are removed and coordinates
+are rounded, since librsvg and lxml parse all of it on every load. The
+identifiers MouseMap and tests/check-svg.py rely on are kept: the Device,
+Buttons and LEDs layers and all buttonN and ledN elements with their leaders
+and paths. check-svg.py also expects every path, rect, g and circle to have
+an identifier, so unused identifiers of those are shortened, not removed.
+
+Paths in the Device layer are also simplified within a pixel tolerance, see
+svgpath.simplify_commands. Leaders in the Buttons and LEDs layers are left
+exact.
+
+A report of the byte, node, parse-time and, if librsvg is available, render
+time savings per file is printed."""
+
+import argparse
+import math
+import re
+import sys
+import time
+from pathlib import Path
+
+from lxml import etree
+
+sys.path.insert(0, str(Path(__file__).parent))
+import svgpath  # noqa: E402
+
+SVG_NS = "http://www.w3.org/2000/svg"
+XLINK_NS = "http://www.w3.org/1999/xlink"
+EDITOR_NAMESPACES = {
+    "http://www.inkscape.org/namespaces/inkscape",
+    "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
+    "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+    "http://creativecommons.org/ns#",
+    "http://web.resource.org/cc/",
+    "http://purl.org/dc/elements/1.1/",
+}
+KEEP_ID_RE = re.compile(r"^(Device|Buttons|LEDs|(button|led)[0-9]+(-leader|-path)?)$")
+ID_REQUIRED_TAGS = {"path", "rect", "g", "circle"}
+REFERENCE_RE = re.compile(r"url\(\s*['\"]?#([^)'\"\s]+)['\"]?\s*\)")
+SHAPE_TAGS = {"path", "rect", "circle", "ellipse", "line", "polyline", "polygon"}
+COORDINATE_ATTRIBUTES = {
+    "x",
+    "y",
+    "width",
+    "height",
+    "cx",
+    "cy",
+    "r",
+    "rx",
+    "ry",
+    "x1",
+    "y1",
+    "x2",
+    "y2",
+}
+
+# Properties that are not inherited and are set to their initial value, so
+# they can be dropped from any element.
+DEFAULT_PROPERTIES = {
+    "opacity": "1",
+    "vector-effect": "none",
+    "isolation": "auto",
+    "mix-blend-mode": "normal",
+    "filter": "none",
+    "clip-path": "none",
+    "mask": "none",
+    "stroke-dasharray": "none",
+    "stroke-dashoffset": "0",
+}
+# Properties that only affect text or gradient stops, dropped from shapes,
+# which have neither. text-align is kept, it marks leaders pointing left.
+TEXT_PROPERTY_RE = re.compile(
+    r"^(font|font-.*|line-height|letter-spacing|word-spacing|writing-mode"
+    r"|text-anchor|text-decoration.*|text-indent|text-transform|direction"
+    r"|baseline-shift|dominant-baseline|stop-color|stop-opacity"
+    r"|solid-color|solid-opacity|-inkscape-.*|inline-size|shape-.*)$"
+)
+
+
+def short_ids():
+    # Yields short identifiers for elements whose identifier is unused.
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    n = 0
+    while True:
+        value, text = n, ""
+        while True:
+            value, rest = divmod(value, len(digits))
+            text = digits[rest] + text
+            if value == 0:
+                break
+        yield f"_{text}"
+        n += 1
+
+
+def referenced_ids(root):
+    ids = set()
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        for name, value in element.attrib.items():
+            if name in (f"{{{XLINK_NS}}}href", "href") and value.startswith("#"):
+                ids.add(value[1:])
+            ids.update(REFERENCE_RE.findall(value))
+    return ids
+
+
+def strip_editor_data(root):
+    for element in list(root.iter()):
+        if not isinstance(element.tag, str):
+            # Comments and processing instructions.
+            if element.getparent() is not None:
+                remove(element)
+            continue
+        qname = etree.QName(element)
+        if qname.namespace in EDITOR_NAMESPACES or qname.localname in (
+            "metadata",
+            "title",
+        ):
+            remove(element)
+            continue
+        for name in list(element.attrib):
+            if etree.QName(name).namespace in EDITOR_NAMESPACES:
+                del element.attrib[name]
+
+
+def remove(element):
+    # Removes an element, keeping its tail text.
+    parent = element.getparent()
+    if element.tail and element.tail.strip():
+        previous = element.getprevious()
+        if previous is not None:
+            previous.tail = (previous.tail or "") + element.tail
+        else:
+            parent.text = (parent.text or "") + element.tail
+    parent.remove(element)
+
+
+def strip_unused_defs(root):
+    # Definitions can reference each other, so repeat until nothing changes.
+    while True:
+        used = referenced_ids(root)
+        unused = [
+            element
+            for defs in root.iter(f"{{{SVG_NS}}}defs")
+            for element in defs
+            if isinstance(element.tag, str) and element.get("id") not in used
+        ]
+        if not unused:
+            break
+        for element in unused:
+            remove(element)
+    for defs in list(root.iter(f"{{{SVG_NS}}}defs")):
+        if len(defs) == 0:
+            remove(defs)
+
+
+def strip_ids(root):
+    used = referenced_ids(root)
+    names = short_ids()
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        svg_id = element.get("id")
+        if svg_id is None or svg_id in used or KEEP_ID_RE.match(svg_id):
+            continue
+        if etree.QName(element).localname in ID_REQUIRED_TAGS:
+            new_id = next(names)
+            while new_id in used:
+                new_id = next(names)
+            element.set("id", new_id)
+        else:
+            del element.attrib["id"]
+
+
+def minify_style(element, decimals):
+    style = element.get("style")
+    if style is None:
+        return
+    is_shape = etree.QName(element).localname in SHAPE_TAGS
+    declarations = []
+    for declaration in style.split(";"):
+        name, _, value = declaration.partition(":")
+        name, value = name.strip(), value.strip()
+        if not name:
+            continue
+        if DEFAULT_PROPERTIES.get(name) == value:
+            continue
+        if is_shape and TEXT_PROPERTY_RE.match(name):
+            continue
+        if name == "stroke-width":
+            value = re.sub(
+                svgpath._NUMBER_RE,
+                lambda m: svgpath.format_number(float(m.group()), decimals),
+                value,
+            )
+        declarations.append(f"{name}:{value}")
+    if declarations:
+        element.set("style", ";".join(declarations))
+    else:
+        del element.attrib["style"]
+
+
+def round_numbers(element, decimals):
+    def rounded(match):
+        return svgpath.format_number(float(match.group()), decimals)
+
+    for name in COORDINATE_ATTRIBUTES & set(element.attrib):
+        element.set(name, svgpath._NUMBER_RE.sub(rounded, element.get(name)))
+    if element.get("d"):
+        element.set("d", svgpath.format_path(element.get("d"), decimals))
+    if element.get("points"):
+        element.set("points", svgpath._NUMBER_RE.sub(rounded, element.get("points")))
+    if element.get("transform"):
+        # Transforms can scale, so they keep significant digits instead.
+        element.set(
+            "transform",
+            svgpath._NUMBER_RE.sub(
+                lambda m: f"{float(m.group()):.6g}", element.get("transform")
+            ),
+        )
+
+
+def simplify_device_paths(root, tolerance, decimals):
+    # Simplifies the paths in the Device layer and returns their node counts
+    # before and after. The tolerance is in pixels and converted into each
+    # path's user units.
+    root_matrix = svgpath.document_matrix(root)[0]
+    before = after = 0
+    for layer in root.iterfind(f".//{{{SVG_NS}}}g[@id='Device']"):
+        for path in layer.iter(f"{{{SVG_NS}}}path"):
+            commands = svgpath.absolute_commands(path.get("d", ""))
+            nodes = svgpath.count_nodes(commands)
+            before += nodes
+            m = svgpath.multiply(
+                svgpath.ancestor_matrix(path, root_matrix),
+                svgpath.parse_transform(path.get("transform")),
+            )
+            scale = math.sqrt(abs(m[0] * m[3] - m[1] * m[2]))
+            simplified = svgpath.simplify_commands(commands, tolerance / scale)
+            if svgpath.count_nodes(simplified) < nodes:
+                path.set(
+                    "d",
+                    svgpath.format_path_commands(
+                        svgpath.relative_commands(simplified), decimals
+                    ),
+                )
+                nodes = svgpath.count_nodes(simplified)
+            after += nodes
+    return before, after
+
+
+def strip_whitespace(root):
+    for element in root.iter():
+        if not isinstance(element.tag, str):
+            continue
+        if etree.QName(element).localname in ("text", "tspan", "textPath"):
+            continue
+        if element.text is not None and not element.text.strip():
+            element.text = None
+        if element.tail is not None and not element.tail.strip():
+            element.tail = None
+
+
+def optimize(data, decimals, tolerance):
+    # Returns the optimized SVG and the Device layer's node counts before and
+    # after simplification.
+    parser = etree.XMLParser(remove_comments=True, remove_pis=True)
+    root = etree.fromstring(data, parser)
+    strip_editor_data(root)
+    strip_unused_defs(root)
+    strip_ids(root)
+    nodes = (0, 0)
+    if tolerance > 0:
+        nodes = simplify_device_paths(root, tolerance, decimals)
+    for element in root.iter():
+        if not isinstance(element.tag, str) or element is root:
+            continue
+        minify_style(element, decimals)
+        round_numbers(element, decimals)
+    strip_whitespace(root)
+    etree.cleanup_namespaces(root)
+    return etree.tostring(root, encoding="utf-8"), nodes
+
+
+def parse_time(data, runs=5):
+    # The best of a few runs of the parsers used at runtime. librsvg is only
+    # measured if it is available at build time.
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        etree.fromstring(data)
+        if Rsvg is not None:
+            Rsvg.Handle.new_from_data(data)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def render_time(data, runs=5):
+    # The best of a few renderings of the Device layer, as MouseMap does.
+    handle = Rsvg.Handle.new_from_data(data)
+    timings = []
+    for _ in range(runs):
+        surface = cairo.ImageSurface(
+            cairo.FORMAT_ARGB32, handle.props.width, handle.props.height
+        )
+        start = time.perf_counter()
+        handle.render_cairo_sub(cairo.Context(surface), "#Device")
+        surface.flush()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+try:
+    import gi
+
+    gi.require_version("Rsvg", "2.0")
+    from gi.repository import Rsvg
+except (ImportError, ValueError):
+    Rsvg = None
+
+try:
+    import cairo
+except ImportError:
+    cairo = None
+
+
+def format_row(name, stats, with_render):
+    bytes_in, bytes_out, nodes_in, nodes_out, parse_in, parse_out = stats[:6]
+    row = (
+        f"{name:<36} {bytes_out:>8} {1 - bytes_out / bytes_in:>6.0%} "
+        f"{f'{nodes_in}>{nodes_out}':>11} "
+        f"{parse_out * 1000:>9.2f} {1 - parse_out / parse_in:>6.0%}"
+    )
+    if with_render:
+        render_in, render_out = stats[6:]
+        row += f" {f'{render_in * 1000:.2f}>{render_out * 1000:.2f}':>13}"
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("svgdir", type=Path)
+    parser.add_argument("outdir", type=Path)
+    parser.add_argument("--decimals", type=int, default=3)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="how far Device outlines may move when simplified, in pixels at "
+        "scale 1, or 0 to disable simplification (default: 0.2)",
+    )
+    parser.add_argument("--stamp", help="a file to touch when done")
+    parser.add_argument("--depfile", help="a depfile for the stamp to write")
+    args = parser.parse_args()
+
+    args.outdir.mkdir(parents=True, exist_ok=True)
+    svgs = sorted(args.svgdir.glob("*.svg"))
+    totals = [0, 0, 0, 0, 0.0, 0.0, 0.0, 0.0]
+    header = f"{'SVG':<36} {'bytes':>8} {'saved':>6} {'nodes':>11} {'parse ms':>9} {'saved':>6}"
+    if Rsvg and cairo:
+        header += f" {'render ms':>13}"
+    print(header)
+    for svg in svgs:
+        data = svg.read_bytes()
+        optimized, (nodes_in, nodes_out) = optimize(data, args.decimals, args.tolerance)
+        (args.outdir / svg.name).write_bytes(optimized)
+
+        stats = [len(data), len(optimized), nodes_in, nodes_out]
+        stats += [parse_time(data), parse_time(optimized)]
+        if Rsvg and cairo:
+            stats += [render_time(data), render_time(optimized)]
+        else:
+            stats += [0.0, 0.0]
+        totals = [t + s for t, s in zip(totals, stats)]
+        print(format_row(svg.name, stats, bool(Rsvg and cairo)))
+    print(format_row("total", totals, bool(Rsvg and cairo)))
+    print(f"Parse times measured with lxml{' and librsvg' if Rsvg else ''}")
+
+    if args.stamp:
+        Path(args.stamp).touch()
+    if args.depfile:
+        with open(args.depfile, "w") as f:
+            deps = " ".join(str(svg).replace(" ", "\\ ") for svg in svgs)
+            f.write(f"{args.stamp}: {deps}\n")
+
+
+if __name__ == "__main__":
+    main()
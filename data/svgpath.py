@@ -0,0 +1,726 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Computes bounding boxes of SVG elements without rendering them, for the
+build scripts that extract device SVG geometry. It understands the subset of
+SVG that the device SVGs use: rects, circles, ellipses, lines, polylines,
+polygons and paths, nested in groups with transforms. Boxes are geometric,
+widened by half the stroke width where a stroke is set; like librsvg they are
+given in the pixel space of the document, i.e. after applying its viewBox.
+Text is not measured."""
+
+import math
+import re
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+Matrix = Tuple[float, float, float, float, float, float]
+Point = Tuple[float, float]
+BBox = Tuple[float, float, float, float]  # x0, y0, x1, y1
+
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+_NUMBER_RE = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_TRANSFORM_RE = re.compile(r"([a-zA-Z]+)\s*\(([^)]*)\)")
+_PATH_TOKEN_RE = re.compile(
+    r"([MmZzLlHhVvCcSsQqTtAa])|([-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)"
+)
+_UNITS = {
+    "": 1.0,
+    "px": 1.0,
+    "pt": 96.0 / 72.0,
+    "pc": 16.0,
+    "mm": 96.0 / 25.4,
+    "cm": 96.0 / 2.54,
+    "in": 96.0,
+}
+_ARC_SAMPLES = 32
+
+
+def multiply(m: Matrix, n: Matrix) -> Matrix:
+    """Returns the matrix m * n, i.e. n applied first, then m."""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a * a2 + c * b2,
+        b * a2 + d * b2,
+        a * c2 + c * d2,
+        b * c2 + d * d2,
+        a * e2 + c * f2 + e,
+        b * e2 + d * f2 + f,
+    )
+
+
+def apply(m: Matrix, point: Point) -> Point:
+    a, b, c, d, e, f = m
+    x, y = point
+    return a * x + c * y + e, b * x + d * y + f
+
+
+def parse_transform(transform: Optional[str]) -> Matrix:
+    """Parses an SVG transform attribute into a matrix."""
+    result = IDENTITY
+    for name, args in _TRANSFORM_RE.findall(transform or ""):
+        v = [float(n) for n in _NUMBER_RE.findall(args)]
+        if name == "matrix":
+            m = tuple(v[:6])
+        elif name == "translate":
+            m = (1.0, 0.0, 0.0, 1.0, v[0], v[1] if len(v) > 1 else 0.0)
+        elif name == "scale":
+            m = (v[0], 0.0, 0.0, v[1] if len(v) > 1 else v[0], 0.0, 0.0)
+        elif name == "rotate":
+            angle = math.radians(v[0])
+            cos, sin = math.cos(angle), math.sin(angle)
+            m = (cos, sin, -sin, cos, 0.0, 0.0)
+            if len(v) == 3:
+                cx, cy = v[1], v[2]
+                m = multiply((1.0, 0.0, 0.0, 1.0, cx, cy), m)
+                m = multiply(m, (1.0, 0.0, 0.0, 1.0, -cx, -cy))
+        elif name == "skewX":
+            m = (1.0, 0.0, math.tan(math.radians(v[0])), 1.0, 0.0, 0.0)
+        elif name == "skewY":
+            m = (1.0, math.tan(math.radians(v[0])), 0.0, 1.0, 0.0, 0.0)
+        else:
+            raise ValueError(f"Unknown transform {name}")
+        result = multiply(result, m)  # type: ignore
+    return result
+
+
+def parse_length(length: Optional[str], default: float = 0.0) -> float:
+    """Parses an SVG length in absolute units into pixels at 96 DPI."""
+    if length is None:
+        return default
+    match = re.fullmatch(r"\s*([-+]?[0-9.eE+-]+)\s*([a-z]*)\s*", length)
+    if match is None or match.group(2) not in _UNITS:
+        raise ValueError(f"Unsupported length {length}")
+    return float(match.group(1)) * _UNITS[match.group(2)]
+
+
+def document_matrix(root: etree._Element) -> Tuple[Matrix, float, float]:
+    """Returns the matrix that maps the root's user space to pixels, and the
+    document's width and height in pixels."""
+    view_box = [float(n) for n in _NUMBER_RE.findall(root.get("viewBox", ""))]
+    width = parse_length(root.get("width"), view_box[2] if view_box else 0.0)
+    height = parse_length(root.get("height"), view_box[3] if view_box else 0.0)
+    if len(view_box) != 4 or not view_box[2] or not view_box[3]:
+        return IDENTITY, width, height
+
+    vx, vy, vw, vh = view_box
+    sx, sy = width / vw, height / vh
+    aspect = root.get("preserveAspectRatio", "xMidYMid meet").split()
+    if aspect[0] == "none":
+        return (sx, 0.0, 0.0, sy, -vx * sx, -vy * sy), width, height
+    s = max(sx, sy) if aspect[-1] == "slice" else min(sx, sy)
+    align = aspect[0]
+    tx = {"xMin": 0.0, "xMid": 0.5, "xMax": 1.0}[align[0:4]] * (width - vw * s)
+    ty = {"YMin": 0.0, "YMid": 0.5, "YMax": 1.0}[align[4:8]] * (height - vh * s)
+    return (s, 0.0, 0.0, s, tx - vx * s, ty - vy * s), width, height
+
+
+def _cubic_extrema(p0: float, p1: float, p2: float, p3: float) -> List[float]:
+    # The parameters in (0, 1) where a cubic Bézier's coordinate has an
+    # extremum, i.e. the roots of its derivative.
+    a = -p0 + 3 * p1 - 3 * p2 + p3
+    b = 2 * (p0 - 2 * p1 + p2)
+    c = p1 - p0
+    if abs(a) < 1e-12:
+        roots = [] if abs(b) < 1e-12 else [-c / b]
+    else:
+        disc = b * b - 4 * a * c
+        if disc < 0:
+            return []
+        sq = math.sqrt(disc)
+        roots = [(-b + sq) / (2 * a), (-b - sq) / (2 * a)]
+    return [t for t in roots if 0 < t < 1]
+
+
+def _cubic_points(p0: Point, p1: Point, p2: Point, p3: Point) -> Iterator[Point]:
+    yield p3
+    ts = _cubic_extrema(p0[0], p1[0], p2[0], p3[0])
+    ts += _cubic_extrema(p0[1], p1[1], p2[1], p3[1])
+    for t in ts:
+        mt = 1 - t
+        yield (
+            mt**3 * p0[0]
+            + 3 * mt**2 * t * p1[0]
+            + 3 * mt * t**2 * p2[0]
+            + t**3 * p3[0],
+            mt**3 * p0[1]
+            + 3 * mt**2 * t * p1[1]
+            + 3 * mt * t**2 * p2[1]
+            + t**3 * p3[1],
+        )
+
+
+def _quad_to_cubic(p0: Point, p1: Point, p2: Point) -> Tuple[Point, Point]:
+    return (
+        (p0[0] + 2 / 3 * (p1[0] - p0[0]), p0[1] + 2 / 3 * (p1[1] - p0[1])),
+        (p2[0] + 2 / 3 * (p1[0] - p2[0]), p2[1] + 2 / 3 * (p1[1] - p2[1])),
+    )
+
+
+def _arc_points(
+    p0: Point, rx: float, ry: float, phi: float, large: bool, sweep: bool, p1: Point
+) -> Iterator[Point]:
+    # Samples an elliptical arc, converted from endpoint to center
+    # parameterization as described in the SVG implementation notes.
+    yield p1
+    rx, ry = abs(rx), abs(ry)
+    if rx == 0 or ry == 0 or p0 == p1:
+        return
+    phi = math.radians(phi)
+    cos, sin = math.cos(phi), math.sin(phi)
+    dx, dy = (p0[0] - p1[0]) / 2, (p0[1] - p1[1]) / 2
+    x1 = cos * dx + sin * dy
+    y1 = -sin * dx + cos * dy
+    scale = x1**2 / rx**2 + y1**2 / ry**2
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    num = rx**2 * ry**2 - rx**2 * y1**2 - ry**2 * x1**2
+    den = rx**2 * y1**2 + ry**2 * x1**2
+    coef = math.sqrt(max(0.0, num / den)) if den else 0.0
+    if large == sweep:
+        coef = -coef
+    cx1, cy1 = coef * rx * y1 / ry, -coef * ry * x1 / rx
+    cx = cos * cx1 - sin * cy1 + (p0[0] + p1[0]) / 2
+    cy = sin * cx1 + cos * cy1 + (p0[1] + p1[1]) / 2
+
+    def angle(ux: float, uy: float, vx: float, vy: float) -> float:
+        return math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+
+    theta = angle(1, 0, (x1 - cx1) / rx, (y1 - cy1) / ry)
+    delta = angle((x1 - cx1) / rx, (y1 - cy1) / ry, (-x1 - cx1) / rx, (-y1 - cy1) / ry)
+    if not sweep and delta > 0:
+        delta -= 2 * math.pi
+    elif sweep and delta < 0:
+        delta += 2 * math.pi
+    for i in range(1, _ARC_SAMPLES):
+        t = theta + delta * i / _ARC_SAMPLES
+        x, y = rx * math.cos(t), ry * math.sin(t)
+        yield cos * x - sin * y + cx, sin * x + cos * y + cy
+
+
+def _path_tokens(d: str) -> Iterator[str]:
+    for command, number in _PATH_TOKEN_RE.findall(d):
+        yield command or number
+
+
+_PATH_ARGS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7}
+
+
+def path_commands(d: str) -> Iterator[Tuple[str, List[float]]]:
+    """Parses SVG path data into its commands, as written. Yields (command,
+    arguments) tuples, one per command: repeated commands are made explicit,
+    and the implicit lineto after a moveto is yielded as L or l."""
+    tokens = list(_path_tokens(d))
+    i = 0
+    command = ""
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+        elif not command:
+            raise ValueError("Path data does not start with a command")
+        c = command.upper()
+        if c == "Z":
+            yield command, []
+            command = ""
+            continue
+        if c not in _PATH_ARGS:
+            raise ValueError(f"Unknown path command {command}")
+        args = []
+        for n in range(_PATH_ARGS[c]):
+            if i >= len(tokens) or tokens[i].isalpha():
+                raise ValueError(f"Missing arguments for path command {command}")
+            token = tokens[i]
+            if c == "A" and n in (3, 4) and len(token) > 1 and token[0] in "01":
+                # Arc flags may be written without separators, e.g.
+                # "a1 1 0 011 1".
+                tokens[i] = token[1:]
+                args.append(float(token[0]))
+                continue
+            args.append(float(token))
+            i += 1
+        yield command, args
+        if c == "M":
+            command = "l" if command == "m" else "L"
+
+
+def path_segments(d: str) -> Iterator[Tuple[str, List[Point], tuple]]:
+    """Parses SVG path data into absolute segments. Yields (kind, points,
+    extra) tuples where kind is M, L, C or A; points are the current point
+    followed by the segment's control and end points, and extra holds the
+    radii, rotation and flags of arcs."""
+    current = start = (0.0, 0.0)
+    last_control: Optional[Point] = None
+    last_command = ""
+    for command, args in path_commands(d):
+        c = command.upper()
+        ox, oy = current if command != c else (0.0, 0.0)
+        points = [(ox + x, oy + y) for x, y in zip(args[0::2], args[1::2])]
+        if c == "Z":
+            yield "L", [current, start], ()
+            current = start
+        elif c == "M":
+            current = start = points[0]
+            yield "M", [current], ()
+        elif c in "LHV":
+            if c == "H":
+                end = (ox + args[0], current[1])
+            elif c == "V":
+                end = (current[0], oy + args[0])
+            else:
+                end = points[0]
+            yield "L", [current, end], ()
+            current = end
+        elif c in "CS":
+            if c == "C":
+                p1, p2, end = points
+            else:
+                p2, end = points
+                if last_control is not None and last_command in "CS":
+                    p1 = (
+                        2 * current[0] - last_control[0],
+                        2 * current[1] - last_control[1],
+                    )
+                else:
+                    p1 = current
+            yield "C", [current, p1, p2, end], ()
+            last_control = p2
+            current = end
+        elif c in "QT":
+            if c == "Q":
+                q, end = points
+            else:
+                (end,) = points
+                if last_control is not None and last_command in "QT":
+                    q = (
+                        2 * current[0] - last_control[0],
+                        2 * current[1] - last_control[1],
+                    )
+                else:
+                    q = current
+            yield "C", [current, *_quad_to_cubic(current, q, end), end], ()
+            last_control = q
+            current = end
+        else:
+            rx, ry, phi, large, sweep, x, y = args
+            end = (ox + x, oy + y)
+            yield "A", [current, end], (rx, ry, phi, bool(large), bool(sweep))
+            current = end
+        last_command = c
+
+
+def format_number(value: float, decimals: int) -> str:
+    """Formats a number as short as possible, rounded to the given number of
+    decimals."""
+    text = f"{value:.{decimals}f}".rstrip("0").rstrip(".")
+    if text in ("", "-0"):
+        return "0"
+    if text.startswith("0."):
+        return text[1:]
+    if text.startswith("-0."):
+        return "-" + text[2:]
+    return text
+
+
+def format_path_commands(
+    commands: Iterable[Tuple[str, List[float]]], decimals: int
+) -> str:
+    """Serializes path commands as yielded by path_commands, rounding
+    coordinates to the given number of decimals and keeping each command's
+    relative or absolute form. Relative coordinates are rounded against the
+    rounded current point, so rounding errors don't add up along the path."""
+    exact = exact_start = rounded = rounded_start = (0.0, 0.0)
+    out: List[str] = []
+    previous_command = ""
+    previous_number = ""
+
+    def r(value: float) -> float:
+        return round(value, decimals)
+
+    for command, args in commands:
+        c = command.upper()
+        relative = command != c
+        numbers: List[float] = []
+        if c == "Z":
+            exact, rounded = exact_start, rounded_start
+        elif c in "HV":
+            axis = 0 if c == "H" else 1
+            target = args[0] + (exact[axis] if relative else 0.0)
+            value = r(target - rounded[axis]) if relative else r(target)
+            numbers.append(value)
+            new_value = rounded[axis] + value if relative else value
+            if axis == 0:
+                exact, rounded = (target, exact[1]), (new_value, rounded[1])
+            else:
+                exact, rounded = (exact[0], target), (rounded[0], new_value)
+        else:
+            if c == "A":
+                numbers += [r(args[0]), r(args[1]), r(args[2]), args[3], args[4]]
+                pairs = [(args[5], args[6])]
+            else:
+                pairs = list(zip(args[0::2], args[1::2]))
+            end_exact, end_rounded = exact, rounded
+            for x, y in pairs:
+                if relative:
+                    tx, ty = exact[0] + x, exact[1] + y
+                    vx, vy = r(tx - rounded[0]), r(ty - rounded[1])
+                    end_rounded = (rounded[0] + vx, rounded[1] + vy)
+                else:
+                    tx, ty = x, y
+                    vx, vy = r(x), r(y)
+                    end_rounded = (vx, vy)
+                numbers += [vx, vy]
+                end_exact = (tx, ty)
+            exact, rounded = end_exact, end_rounded
+            if c == "M":
+                exact_start, rounded_start = exact, rounded
+
+        if command != previous_command or c == "M":
+            out.append(command)
+            previous_number = ""
+        previous_command = command
+        for n, value in enumerate(numbers):
+            is_flag = c == "A" and n in (3, 4)
+            text = str(int(value)) if is_flag else format_number(value, decimals)
+            if previous_number and not (
+                text[0] == "-" or (text[0] == "." and "." in previous_number)
+            ):
+                out.append(" ")
+            out.append(text)
+            previous_number = text
+    return "".join(out)
+
+
+def format_path(d: str, decimals: int) -> str:
+    """Rewrites path data with its coordinates rounded, see
+    format_path_commands."""
+    return format_path_commands(path_commands(d), decimals)
+
+
+Command = Tuple[str, List[float]]
+
+
+def absolute_commands(d: str) -> List[Command]:
+    """Parses SVG path data into commands with absolute coordinates. H and V
+    become L, and S and T become C and Q with explicit control points, so
+    commands can be changed without affecting their neighbours."""
+    result: List[Command] = []
+    current = start = (0.0, 0.0)
+    last_control: Optional[Point] = None
+    last_command = ""
+    for command, args in path_commands(d):
+        c = command.upper()
+        ox, oy = current if command != c else (0.0, 0.0)
+        points = [(ox + x, oy + y) for x, y in zip(args[0::2], args[1::2])]
+        control: Optional[Point] = None
+        if c == "Z":
+            result.append(("Z", []))
+            current = start
+        elif c == "M":
+            current = start = points[0]
+            result.append(("M", list(current)))
+        elif c in "LHV":
+            if c == "H":
+                current = (ox + args[0], current[1])
+            elif c == "V":
+                current = (current[0], oy + args[0])
+            else:
+                current = points[0]
+            result.append(("L", list(current)))
+        elif c in "CS":
+            if c == "C":
+                p1, p2, end = points
+            else:
+                p2, end = points
+                p1 = current
+                if last_control is not None and last_command in "CS":
+                    p1 = (
+                        2 * current[0] - last_control[0],
+                        2 * current[1] - last_control[1],
+                    )
+            result.append(("C", [*p1, *p2, *end]))
+            control, current = p2, end
+        elif c in "QT":
+            if c == "Q":
+                q, end = points
+            else:
+                (end,) = points
+                q = current
+                if last_control is not None and last_command in "QT":
+                    q = (
+                        2 * current[0] - last_control[0],
+                        2 * current[1] - last_control[1],
+                    )
+            result.append(("Q", [*q, *end]))
+            control, current = q, end
+        else:
+            rx, ry, phi, large, sweep, x, y = args
+            current = (ox + x, oy + y)
+            result.append(("A", [rx, ry, phi, large, sweep, *current]))
+        last_control = control
+        last_command = c
+    return result
+
+
+def relative_commands(commands: Iterable[Command]) -> Iterator[Command]:
+    """Converts absolute commands as returned by absolute_commands into
+    relative ones, using h and v for horizontal and vertical lines."""
+    current = start = (0.0, 0.0)
+    for command, args in commands:
+        if command == "Z":
+            yield "z", []
+            current = start
+            continue
+        x0, y0 = current
+        if command == "A":
+            yield "a", [*args[:5], args[5] - x0, args[6] - y0]
+            current = (args[5], args[6])
+            continue
+        rel = [v - (x0 if i % 2 == 0 else y0) for i, v in enumerate(args)]
+        current = (args[-2], args[-1])
+        if command == "M":
+            start = current
+        if command == "L" and rel[1] == 0:
+            yield "h", [rel[0]]
+        elif command == "L" and rel[0] == 0:
+            yield "v", [rel[1]]
+        else:
+            yield command.lower(), rel
+
+
+def _segment_distance(p: Point, a: Point, b: Point) -> float:
+    # The distance from p to the line segment from a to b.
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    length = dx * dx + dy * dy
+    t = 0.0
+    if length > 0:
+        t = max(0.0, min(1.0, ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / length))
+    return math.hypot(p[0] - a[0] - t * dx, p[1] - a[1] - t * dy)
+
+
+def _rdp(points: List[Point], tolerance: float) -> List[Point]:
+    # Ramer-Douglas-Peucker: keeps the points needed so that no removed point
+    # is further than the tolerance from the simplified polyline.
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        first, last = stack.pop()
+        index, distance = 0, 0.0
+        for i in range(first + 1, last):
+            d = _segment_distance(points[i], points[first], points[last])
+            if d > distance:
+                index, distance = i, d
+        if distance > tolerance:
+            keep[index] = True
+            stack += [(first, index), (index, last)]
+    return [p for p, k in zip(points, keep) if k]
+
+
+def simplify_commands(commands: List[Command], tolerance: float) -> List[Command]:
+    """Simplifies absolute path commands as returned by absolute_commands,
+    such that the outline moves by no more than the tolerance. Béziers that
+    are flat within half the tolerance become lines, and runs of lines are
+    reduced with the Ramer-Douglas-Peucker algorithm within the other half.
+    Arcs are kept as they are."""
+    flat: List[Command] = []
+    current = start = (0.0, 0.0)
+    for command, args in commands:
+        if command == "C":
+            p1, p2 = (args[0], args[1]), (args[2], args[3])
+            end = (args[4], args[5])
+            # A cubic stays within 3/4 of its control points' distance from
+            # the chord.
+            deviation = 0.75 * max(
+                _segment_distance(p1, current, end), _segment_distance(p2, current, end)
+            )
+            if deviation <= tolerance / 2:
+                command, args = "L", list(end)
+        elif command == "Q":
+            # A quadratic stays within half its control point's distance.
+            q, end = (args[0], args[1]), (args[2], args[3])
+            if 0.5 * _segment_distance(q, current, end) <= tolerance / 2:
+                command, args = "L", list(end)
+        flat.append((command, args))
+        # Z returns to the start of the subpath, like in absolute_commands.
+        if command == "Z":
+            current = start
+        else:
+            current = (args[-2], args[-1])
+            if command == "M":
+                start = current
+
+    result: List[Command] = []
+    run: List[Point] = []
+
+    def flush() -> None:
+        # Replaces the run of lines from run[0] by its simplification.
+        if len(run) > 1:
+            result.extend(("L", list(p)) for p in _rdp(run, tolerance / 2)[1:])
+        run.clear()
+
+    current = start = (0.0, 0.0)
+    for command, args in flat:
+        if command == "L":
+            if not run:
+                run.append(current)
+            run.append((args[0], args[1]))
+        else:
+            flush()
+            result.append((command, args))
+        if command == "Z":
+            current = start
+        else:
+            current = (args[-2], args[-1])
+            if command == "M":
+                start = current
+    flush()
+    return result
+
+
+def count_nodes(commands: Iterable[Command]) -> int:
+    """Returns the number of nodes of a path, i.e. its drawing commands."""
+    return sum(1 for command, _ in commands if command.upper() != "Z")
+
+
+def _path_points(d: str, m: Matrix) -> Iterator[Point]:
+    # Béziers stay Béziers under affine transforms, so their control points
+    # are transformed before finding the extrema. Arcs are sampled first.
+    for kind, points, extra in path_segments(d):
+        if kind == "M":
+            yield apply(m, points[0])
+        elif kind == "L":
+            yield apply(m, points[0])
+            yield apply(m, points[1])
+        elif kind == "C":
+            yield from _cubic_points(*(apply(m, p) for p in points))
+        else:
+            for p in _arc_points(
+                points[0], *extra[:2], extra[2], extra[3], extra[4], points[1]
+            ):
+                yield apply(m, p)
+
+
+def _style(element: etree._Element, name: str) -> Optional[str]:
+    style = element.get("style", "")
+    for declaration in style.split(";"):
+        key, _, value = declaration.partition(":")
+        if key.strip() == name:
+            return value.strip()
+    return element.get(name)
+
+
+def _inherited_style(element: etree._Element, name: str) -> Optional[str]:
+    while element is not None:
+        value = _style(element, name)
+        if value is not None and value != "inherit":
+            return value
+        element = element.getparent()
+    return None
+
+
+def _bbox_of(points: Iterable[Point]) -> Optional[BBox]:
+    points = list(points)
+    if not points:
+        return None
+    xs = [p[0] for p in points]
+    ys = [p[1] for p in points]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def union(a: Optional[BBox], b: Optional[BBox]) -> Optional[BBox]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])
+
+
+def _shape_points(element: etree._Element, m: Matrix) -> Iterator[Point]:
+    tag = etree.QName(element).localname
+    if tag == "rect":
+        x, y = parse_length(element.get("x")), parse_length(element.get("y"))
+        w = parse_length(element.get("width"))
+        h = parse_length(element.get("height"))
+        for p in ((x, y), (x + w, y), (x, y + h), (x + w, y + h)):
+            yield apply(m, p)
+    elif tag in ("circle", "ellipse"):
+        cx, cy = parse_length(element.get("cx")), parse_length(element.get("cy"))
+        if tag == "circle":
+            rx = ry = parse_length(element.get("r"))
+        else:
+            rx, ry = parse_length(element.get("rx")), parse_length(element.get("ry"))
+        for i in range(_ARC_SAMPLES):
+            t = 2 * math.pi * i / _ARC_SAMPLES
+            yield apply(m, (cx + rx * math.cos(t), cy + ry * math.sin(t)))
+        # The samples are inscribed, add the axis extremes exactly.
+        a, b, c, d, _, _ = m
+        hx, hy = math.hypot(a * rx, c * ry), math.hypot(b * rx, d * ry)
+        center = apply(m, (cx, cy))
+        yield center[0] - hx, center[1] - hy
+        yield center[0] + hx, center[1] + hy
+    elif tag == "line":
+        for axis in ("1", "2"):
+            x = parse_length(element.get(f"x{axis}"))
+            y = parse_length(element.get(f"y{axis}"))
+            yield apply(m, (x, y))
+    elif tag in ("polyline", "polygon"):
+        v = [float(n) for n in _NUMBER_RE.findall(element.get("points", ""))]
+        for x, y in zip(v[0::2], v[1::2]):
+            yield apply(m, (x, y))
+    elif tag == "path":
+        yield from _path_points(element.get("d", ""), m)
+
+
+def element_bbox(element: etree._Element, m: Matrix) -> Optional[BBox]:
+    """Returns the bounding box of the element and its descendants.
+
+    @param element The element, as lxml element
+    @param m The matrix that maps the element's parent's user space to pixels,
+             see document_matrix
+
+    @returns the box as (x0, y0, x1, y1) or None for elements without
+             geometry, such as empty groups, hidden elements or text.
+    """
+    if not isinstance(element.tag, str):
+        return None
+    if _style(element, "display") == "none":
+        return None
+    m = multiply(m, parse_transform(element.get("transform")))
+    tag = etree.QName(element).localname
+    if tag in ("g", "svg", "a", "switch"):
+        box = None
+        for child in element:
+            box = union(box, element_bbox(child, m))
+        return box
+
+    box = _bbox_of(_shape_points(element, m))
+    if box is None:
+        return None
+    stroke = _inherited_style(element, "stroke")
+    if stroke is not None and stroke != "none":
+        width = _inherited_style(element, "stroke-width")
+        try:
+            half = (
+                parse_length(width, 1.0) / 2 * math.sqrt(abs(m[0] * m[3] - m[1] * m[2]))
+            )
+        except ValueError:
+            half = 0.0
+        box = (box[0] - half, box[1] - half, box[2] + half, box[3] + half)
+    return box
+
+
+def ancestor_matrix(element: etree._Element, root_matrix: Matrix) -> Matrix:
+    """Returns the matrix mapping the user space of the element's parent to
+    pixels, accumulating the transforms of all its ancestors."""
+    ancestors = []
+    parent = element.getparent()
+    while parent is not None and parent.getparent() is not None:
+        ancestors.append(parent)
+        parent = parent.getparent()
+    m = root_matrix
+    for ancestor in reversed(ancestors):
+        m = multiply(m, parse_transform(ancestor.get("transform")))
+    return m
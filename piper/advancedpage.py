@@ -1,12 +1,12 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 import sys
-from typing import Optional
+from typing import Iterator, Optional
 import gi
 
 from .mousemap import MouseMap
 from .ratbagd import RatbagdDevice, RatbagdProfile
-from .util.gobject import connect_signal_with_weak_ref
+from .util.gobject import SignalGroup
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import GObject, Gtk  # noqa: E402
@@ -29,43 +29,22 @@ class AdvancedPage(Gtk.Box):
     rate_button_box: Gtk.ButtonBox = Gtk.Template.Child()  # type: ignore
 
     def __init__(
-        self, device: RatbagdDevice, profile: RatbagdProfile, *args, **kwargs
+        self, device: RatbagdDevice, profile: Optional[RatbagdProfile], *args, **kwargs
     ) -> None:
-        """Instantiates a new AdvancedPage."""
-        Gtk.Box.__init__(self, *args, **kwargs)
+        """Instantiates a new AdvancedPage.
 
-        self._profile = profile
+        @param profile The profile to configure, as ratbagd.RatbagdProfile, or
+                       None to show one later with set_profile()
+        """
+        Gtk.Box.__init__(self, *args, **kwargs)
 
         cell = Gtk.CellRendererText()
         self.debounce.pack_start(cell, True)
         self.debounce.add_attribute(cell, "text", 0)
 
-        model = Gtk.ListStore(str)
-        for ms in profile.debounces:
-            model.append([str(ms)])
-        self.debounce.set_model(model)
-
         self._handler_debounce = self.debounce.connect(
             "changed", self._on_debounce_combo_changed
         )
-
-        self._profile_debounce_time_changed_handler = connect_signal_with_weak_ref(
-            self,
-            self._profile,
-            "notify::debounce",
-            self._on_profile_debounce_time_changed,
-        )
-        self._update_widget_debounce_time()
-
-        are_report_rates_supported = (
-            profile.report_rate != 0 and len(profile.report_rates) != 0
-        )
-        self.rate_button_box.set_sensitive(are_report_rates_supported)
-        self.rate_125.set_sensitive(125 in profile.report_rates)
-        self.rate_250.set_sensitive(250 in profile.report_rates)
-        self.rate_500.set_sensitive(500 in profile.report_rates)
-        self.rate_1000.set_sensitive(1000 in profile.report_rates)
-
         self._handler_125 = self.rate_125.connect(
             "toggled", self._on_report_rate_toggled, 125
         )
@@ -78,35 +57,68 @@ class AdvancedPage(Gtk.Box):
         self._handler_1000 = self.rate_1000.connect(
             "toggled", self._on_report_rate_toggled, 1000
         )
-
-        self._profile_report_rate_changed_handler = connect_signal_with_weak_ref(
-            self,
-            self._profile,
-            "notify::report-rate",
-            self._on_profile_report_rate_changed,
+        self._angle_snapping_switch_handler = self.angle_snapping.connect(
+            "state-set", self._on_angle_snapping_switch_state_set
         )
-        self._update_widget_report_rate()
-
-        profile = self._profile
 
         self._mousemap = MouseMap("#Buttons", device, spacing=20, border_width=20)
         self.pack_start(self._mousemap, True, True, 0)
 
-        self._angle_snapping_switch_handler = self.angle_snapping.connect(
-            "state-set", self._on_angle_snapping_switch_state_set
+        self._profile_signals = SignalGroup(self)
+        if profile is not None:
+            self.set_profile(profile)
+
+        self.show_all()
+
+    def set_profile(self, profile: RatbagdProfile) -> None:
+        """Shows the given profile of the device on this page, replacing the
+        one shown before.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        self._profile_signals.disconnect_all()
+        self._profile = profile
+
+        model = Gtk.ListStore(str)
+        for ms in profile.debounces:
+            model.append([str(ms)])
+        with self.debounce.handler_block(self._handler_debounce):
+            self.debounce.set_model(model)
+
+        self._profile_debounce_time_changed_handler = self._profile_signals.connect(
+            profile, "notify::debounce", self._on_profile_debounce_time_changed
         )
+        self._update_widget_debounce_time()
+
+        are_report_rates_supported = (
+            profile.report_rate != 0 and len(profile.report_rates) != 0
+        )
+        self.rate_button_box.set_sensitive(are_report_rates_supported)
+        self.rate_125.set_sensitive(125 in profile.report_rates)
+        self.rate_250.set_sensitive(250 in profile.report_rates)
+        self.rate_500.set_sensitive(500 in profile.report_rates)
+        self.rate_1000.set_sensitive(1000 in profile.report_rates)
+
+        self._profile_report_rate_changed_handler = self._profile_signals.connect(
+            profile, "notify::report-rate", self._on_profile_report_rate_changed
+        )
+        self._update_widget_report_rate()
 
         self.angle_snapping.set_sensitive(profile.angle_snapping != -1)
 
-        self._profile_angle_snapping_changed_handler = connect_signal_with_weak_ref(
-            self,
-            self._profile,
-            "notify::angle-snapping",
-            self._on_profile_angle_snapping_changed,
+        self._profile_angle_snapping_changed_handler = self._profile_signals.connect(
+            profile, "notify::angle-snapping", self._on_profile_angle_snapping_changed
         )
         self._update_widget_angle_snapping()
 
-        self.show_all()
+    def set_profile_steps(self, profile: RatbagdProfile) -> Iterator[None]:
+        """Like set_profile(), for showing a profile in steps as the other
+        pages do. This page has no widgets per button, so it is a single step.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        self.set_profile(profile)
+        yield
 
     def _on_profile_debounce_time_changed(
         self, profile: RatbagdProfile, pspec: Optional[GObject.ParamSpec]
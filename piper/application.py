@@ -1,8 +1,19 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
+import sys
+
 from typing import Optional
 
-from .ratbagd import Ratbagd
+from .deviceconfig import ConfigFormatError, ConfigReader, find_section
+from .provision import (
+    DEFAULT_JOBS,
+    ProgressPrinter,
+    matching_devices,
+    print_report,
+    provision_devices,
+)
+from .ratbagd import Ratbagd, RatbagdIncompatibleError, RatbagdUnavailableError
+from .verify import print_results, verify_devices
 from .window import Window
 
 import gi
@@ -28,6 +39,86 @@ class Application(Gtk.Application):
         GLib.set_application_name("Piper")
         self._required_ratbagd_version = ratbagd_api_version
 
+        self.add_main_option(
+            "provision",
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.STRING,
+            "Apply a configuration file to every connected device of its model, then exit",
+            "FILE",
+        )
+        self.add_main_option(
+            "jobs",
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.INT,
+            f"Number of devices to provision concurrently (default: {DEFAULT_JOBS})",
+            "N",
+        )
+        self.add_main_option(
+            "verify",
+            0,
+            GLib.OptionFlags.NONE,
+            GLib.OptionArg.NONE,
+            "Read the configuration back from the provisioned devices once committed",
+            None,
+        )
+
+    def do_handle_local_options(self, options: GLib.VariantDict) -> int:
+        """Handles the command line options. Provisioning runs here, before
+        the application registers or opens any window."""
+        path = options.lookup_value("provision", GLib.VariantType("s"))
+        if path is None:
+            return -1
+        jobs = options.lookup_value("jobs", GLib.VariantType("i"))
+        return self._provision(
+            path.get_string(),
+            DEFAULT_JOBS if jobs is None else jobs.get_int32(),
+            options.contains("verify"),
+        )
+
+    def _provision(self, path: str, jobs: int, verify: bool) -> int:
+        # Applies the first device section of the given file to all matching
+        # devices and prints the progress. Returns the exit status.
+        try:
+            ratbag = Ratbagd(self._required_ratbagd_version)
+        except (RatbagdUnavailableError, RatbagdIncompatibleError) as e:
+            print(f"Cannot connect to ratbagd: {e}", file=sys.stderr)
+            return 1
+
+        try:
+            with open(path, encoding="utf-8") as f:
+                section = find_section(ConfigReader(f))
+                if section is None:
+                    raise ConfigFormatError("The file contains no devices")
+                model = section.model
+                # Every device needs the full configuration, keep it around.
+                records = list(section)
+        except (OSError, ConfigFormatError) as e:
+            print(f"Cannot read {path}: {e}", file=sys.stderr)
+            return 1
+
+        devices = matching_devices(ratbag.devices, model)
+        if not devices:
+            print(f"No connected devices match {model}", file=sys.stderr)
+            return 1
+
+        print(f"Provisioning {len(devices)} device(s) of model {model}")
+        report = provision_devices(
+            devices, records, jobs, on_progress=ProgressPrinter(len(devices))
+        )
+        print_report(report)
+        if not verify:
+            return 0 if not report.failed else 1
+
+        print("Verifying provisioned devices")
+        results = verify_devices(
+            [(result.device, records) for result in report.succeeded], jobs
+        )
+        print_results(results)
+        ok = not report.failed and all(result.ok for result in results)
+        return 0 if ok else 1
+
     def do_startup(self) -> None:
         """This function is called when the application is first started. All
         initialization should be done here, to prevent doing duplicate work in
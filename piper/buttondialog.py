@@ -1,11 +1,14 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 import sys
+import weakref
 
+from functools import lru_cache
 from gettext import gettext as _
-from typing import List, Optional, Tuple, Union
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
-from .ratbagd import RatbagdButton, RatbagdMacro, RatbagDeviceType
+from .ratbagd import RatbagdButton, RatbagdDevice, RatbagdMacro, RatbagDeviceType
+from .util.search import SearchIndex
 
 import gi
 
@@ -13,6 +16,76 @@ gi.require_version("Gtk", "3.0")
 from gi.repository import Gdk, GdkX11, GObject, Gtk  # noqa
 
 
+class _ButtonAction:
+    # A helper class describing one action a button can be mapped to, shown
+    # as a ButtonRow in the ButtonDialog. Searching matches both the
+    # translated and the untranslated description.
+
+    def __init__(
+        self,
+        description: str,
+        untranslated: str,
+        section: str,
+        action_type: RatbagdButton.ActionType,
+        value: Union[int, RatbagdButton.ActionSpecial, None],
+    ) -> None:
+        self.description = description
+        self.search_text = " ".join(
+            dict.fromkeys([description.casefold(), untranslated.casefold()])
+        )
+        self.section = section
+        self.action_type = action_type
+        self.value = value
+
+
+@lru_cache(maxsize=None)
+def _get_button_actions(button_indices: Tuple[int, ...]) -> List[_ButtonAction]:
+    # The actions the buttons of a device can be mapped to, given the indices
+    # of its buttons. They are the same for all buttons and profiles of a
+    # device, so they are only built once.
+    actions = []
+    for index in button_indices:
+        if index in RatbagdButton.BUTTON_DESCRIPTION:
+            untranslated = RatbagdButton.BUTTON_DESCRIPTION[index]
+            description = _(untranslated)
+        else:
+            untranslated = f"Button {index} click"
+            # Translators: the {} will be replaced with the button index, e.g.
+            # "Button 1 click".
+            description = _("Button {} click").format(index)
+        actions.append(
+            _ButtonAction(
+                description,
+                untranslated,
+                # Translators: section header for mapping one button's click to
+                # another.
+                _("Button mapping"),
+                RatbagdButton.ActionType.BUTTON,
+                index + 1,
+            )
+        )
+    for key, name in RatbagdButton.SPECIAL_DESCRIPTION.items():
+        if name in ["Unknown", "Invalid"]:
+            continue
+        actions.append(
+            _ButtonAction(
+                _(name),
+                name,
+                # Translators: section header for assigning special functions to
+                # buttons.
+                _("Special mapping"),
+                RatbagdButton.ActionType.SPECIAL,
+                key,
+            )
+        )
+    actions.append(
+        _ButtonAction(
+            _("Disable"), "Disable", _("Other"), RatbagdButton.ActionType.NONE, None
+        )
+    )
+    return actions
+
+
 @Gtk.Template(resource_path="/org/freedesktop/Piper/ui/ButtonRow.ui")
 class ButtonRow(Gtk.ListBoxRow):
     """A Gtk.ListBoxRow subclass to implement the rows that show up in the
@@ -79,6 +152,11 @@ class ButtonDialog(Gtk.Dialog):
     search_entry: Gtk.SearchEntry = Gtk.Template.Child()  # type: ignore
     stack: Gtk.Stack = Gtk.Template.Child()  # type: ignore
 
+    # The pooled dialogs, see get_for_device.
+    _pool: "weakref.WeakKeyDictionary[RatbagdDevice, ButtonDialog]" = (
+        weakref.WeakKeyDictionary()
+    )
+
     def __init__(
         self,
         ratbagd_button: RatbagdButton,
@@ -96,8 +174,70 @@ class ButtonDialog(Gtk.Dialog):
         Gtk.Dialog.__init__(self, *args, **kwargs)
         self._grab_pointer: Optional[Gdk.Device] = None
         self._current_macro: Optional[RatbagdMacro] = None
-        self._button = ratbagd_button
         self._device_type = device_type
+        # The casefolded search and the rows matching it, or None when not
+        # searching.
+        self._search = ""
+        self._matches: Optional[Set[Gtk.ListBoxRow]] = None
+        self._search_index = SearchIndex()
+
+        self.listbox.set_header_func(self._listbox_header_func)
+        self.listbox.set_filter_func(self._listbox_filter_func)
+        self.listbox.set_placeholder(self.empty_search_placeholder)
+        self.search_entry.connect("notify::text", self._on_search_text_changed)
+        # The dialog is hidden rather than destroyed when it is pooled, which
+        # must not keep the keyboard grabbed.
+        self.connect("hide", lambda _: self._release_grab())
+
+        # The row of every action, to find the one to select in O(1).
+        self._rows: Dict[Tuple[RatbagdButton.ActionType, Any], ButtonRow] = {}
+        actions = _get_button_actions(tuple(button.index for button in buttons))
+        for i, action in enumerate(actions):
+            row = ButtonRow(
+                action.description, action.section, action.action_type, action.value
+            )
+            self.listbox.insert(row, i)
+            self._rows[(action.action_type, action.value)] = row
+            self._search_index.add(row, action.search_text)
+
+        self.set_button(ratbagd_button)
+
+    @classmethod
+    def get_for_device(
+        cls,
+        device: RatbagdDevice,
+        ratbagd_button: RatbagdButton,
+        buttons: List[RatbagdButton],
+    ) -> "ButtonDialog":
+        """Returns the ButtonDialog of the given device, set to the given
+        button. There is one dialog per device that is created on first use
+        and reused afterwards, so hide it rather than destroying it once it
+        got a response.
+
+        @param device The device to configure, as ratbagd.RatbagdDevice.
+        @param ratbagd_button The button to configure, as ratbagd.RatbagdButton.
+        @param buttons The buttons on this device, as [ratbagd.RatbagdButton].
+        """
+        dialog = cls._pool.get(device)
+        if dialog is None:
+            dialog = cls(
+                ratbagd_button, buttons, device.device_type, use_header_bar=True
+            )
+            dialog.connect("delete-event", Gtk.Widget.hide_on_delete)
+            cls._pool[device] = dialog
+            weakref.finalize(device, dialog.destroy)
+        else:
+            dialog.set_button(ratbagd_button)
+        return dialog
+
+    def set_button(self, ratbagd_button: RatbagdButton) -> None:
+        """Sets the button to configure, resetting the dialog to the button's
+        current mapping.
+
+        @param ratbagd_button The button to configure, as ratbagd.RatbagdButton.
+        """
+        self._release_grab()
+        self._button = ratbagd_button
         self._action_type = self._button.action_type
 
         if self.action_type == RatbagdButton.ActionType.NONE:
@@ -113,17 +253,21 @@ class ButtonDialog(Gtk.Dialog):
         else:
             self._mapping = -1
 
-        self._init_ui(buttons)
+        self.search_entry.set_text("")
+        self.search_bar.set_search_mode(False)
+        self._init_ui()
 
-    def _init_ui(self, buttons: List[RatbagdButton]) -> None:
+    def _init_ui(self) -> None:
         if self._device_type is RatbagDeviceType.MOUSE and self._button.index in [0, 1]:
             self._init_primary_buttons_ui()
         else:
-            self._init_other_buttons_ui(buttons)
+            self._init_other_buttons_ui()
 
     def _init_primary_buttons_ui(self) -> None:
         # Shows the listbox to swap the primary buttons.
         self.stack.set_visible_child_name("handedness")
+        # A pooled dialog may still hold the macro of the previous button.
+        self._release_current_macro()
         # Left mouse button (index 0) is mapped to right mouse button, where
         # mappings are 1-indexed and thus right mouse click has value 2.
         # Or, right mouse button (index 1) is mapped to left mouse button,
@@ -134,57 +278,31 @@ class ButtonDialog(Gtk.Dialog):
             or self._button.index == 1
             and self._mapping == 1
         ):
-            self.radio_left_handed.set_active(True)
+            toggle = self.radio_left_handed
         else:
-            self.radio_right_handed.set_active(True)
+            toggle = self.radio_right_handed
+        toggle.set_active(True)
+        # The radio button may have been active already for another button.
+        self._on_primary_mode_toggled(toggle)
 
-    def _init_other_buttons_ui(self, buttons: List[RatbagdButton]) -> None:
+    def _init_other_buttons_ui(self) -> None:
         # Shows the listbox to map non-primary buttons.
-        self.listbox.set_header_func(self._listbox_header_func)
-        self.listbox.set_filter_func(self._listbox_filter_func)
-        self.listbox.set_placeholder(self.empty_search_placeholder)
-        self.search_entry.connect(
-            "notify::text", lambda o, p: self.listbox.invalidate_filter()
+        self.stack.set_visible_child_name("overview")
+
+        disable_row = self._rows[(RatbagdButton.ActionType.NONE, None)]
+        disable_row.set_sensitive(
+            RatbagdButton.ActionType.NONE in self._button.action_types
         )
 
-        i = 0
-        for button in buttons:
-            key, name = self._get_button_name_and_description(button)
-            # Translators: section header for mapping one button's click to another.
-            row = ButtonRow(
-                name,
-                _("Button mapping"),
-                RatbagdButton.ActionType.BUTTON,
-                button.index + 1,
-            )
-            self.listbox.insert(row, i)
-            if (
-                self._action_type == RatbagdButton.ActionType.BUTTON
-                and button.index + 1 == self._button.mapping
-            ):
-                self.listbox.select_row(row)
-            i += 1
-        for key, name in RatbagdButton.SPECIAL_DESCRIPTION.items():
-            if name in ["Unknown", "Invalid"]:
-                continue
-            # Translators: section header for assigning special functions to buttons.
-            row = ButtonRow(
-                _(name), _("Special mapping"), RatbagdButton.ActionType.SPECIAL, key
-            )
-            self.listbox.insert(row, i)
-            if (
-                self._action_type == RatbagdButton.ActionType.SPECIAL
-                and key == self._mapping
-            ):
+        self.listbox.unselect_all()
+        if self._action_type in (
+            RatbagdButton.ActionType.BUTTON,
+            RatbagdButton.ActionType.SPECIAL,
+            RatbagdButton.ActionType.NONE,
+        ):
+            row = self._rows.get((self._action_type, self._mapping))
+            if row is not None:
                 self.listbox.select_row(row)
-            i += 1
-
-        row = ButtonRow(_("Disable"), _("Other"), RatbagdButton.ActionType.NONE, None)
-        row.set_sensitive(RatbagdButton.ActionType.NONE in self._button.action_types)
-        self.listbox.insert(row, i)
-        i += 1
-        if self._action_type == RatbagdButton.ActionType.NONE:
-            self.listbox.select_row(row)
 
         if self._action_type == RatbagdButton.ActionType.MACRO:
             self._create_current_macro(macro=self._mapping)
@@ -194,9 +312,10 @@ class ButtonDialog(Gtk.Dialog):
             macro.append(RatbagdButton.Macro.KEY_RELEASE, self._mapping)
             self._create_current_macro(macro=macro)
         else:
-            self._create_current_macro()
+            self._create_current_macro(macro=RatbagdMacro())
 
     def _create_current_macro(self, macro: Optional[RatbagdMacro] = None) -> None:
+        self._release_current_macro()
         if macro is not None:
             self._current_macro = macro
             self._on_macro_updated(macro, None)
@@ -205,6 +324,15 @@ class ButtonDialog(Gtk.Dialog):
         self._current_macro.connect("macro-set", self._on_macro_set)
         self._current_macro.connect("notify::keys", self._on_macro_updated)
 
+    def _release_current_macro(self) -> None:
+        # Stops following the current macro, which may be the macro of a
+        # button this dialog was set to before.
+        if self._current_macro is None:
+            return
+        self._current_macro.disconnect_by_func(self._on_macro_set)
+        self._current_macro.disconnect_by_func(self._on_macro_updated)
+        self._current_macro = None
+
     def _listbox_header_func(self, row: ButtonRow, before: ButtonRow) -> None:
         # Adds headers to those rows where a new category starts, to separate
         # different kinds of mappings.
@@ -237,29 +365,38 @@ class ButtonDialog(Gtk.Dialog):
         box.show_all()
 
     def _listbox_filter_func(self, row: Gtk.ListBoxRow) -> bool:
-        # Filters the list box with the text from the search entry.
-        if self.search_entry.get_text_length() == 0:
-            return True
+        # Filters the list box with the rows matching the search entry's text.
+        return self._matches is None or row in self._matches
 
-        if row is not self.row_keystroke:
-            description = row.description.casefold()
-        else:
-            description = self.row_keystroke_label.get_label().casefold()
+    def _on_search_text_changed(
+        self, entry: Gtk.SearchEntry, pspec: Optional[GObject.ParamSpec]
+    ) -> None:
+        # Updates the rows matching the search. When text was added to the
+        # previous search, only the rows matching that can match the new one.
         search = self.search_entry.get_text().casefold()
-
-        return all(term in description for term in search.split(" "))
-
-    def _get_button_name_and_description(
-        self, button: RatbagdButton
-    ) -> Tuple[str, str]:
-        # Translators: the {} will be replaced with the button index, e.g.
-        # "Button 1 click".
-        name = _("Button {} click").format(button.index)
-        if button.index in RatbagdButton.BUTTON_DESCRIPTION:
-            description = _(RatbagdButton.BUTTON_DESCRIPTION[button.index])
+        old_matches = self._matches
+        if not search:
+            matches = None
         else:
-            description = name
-        return name, description
+            terms = search.split(" ")
+            if old_matches is not None and search.startswith(self._search):
+                candidates = old_matches - {self.row_keystroke}
+            else:
+                candidates = None
+            matches = self._search_index.search(terms, candidates)
+            # The keystroke row shows the current macro, so it isn't indexed.
+            description = self.row_keystroke_label.get_label().casefold()
+            if all(term in description for term in terms):
+                matches.add(self.row_keystroke)
+        self._search = search
+        self._matches = matches
+
+        # Only filter the rows whose visibility changed again.
+        all_rows = self._search_index.items | {self.row_keystroke}
+        visible = all_rows if old_matches is None else old_matches
+        now_visible = all_rows if matches is None else matches
+        for row in visible ^ now_visible:
+            row.changed()
 
     def _grab_seat(self) -> bool:
         """
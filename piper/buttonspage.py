@@ -1,7 +1,7 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 from gettext import gettext as _
-from typing import Optional
+from typing import Iterator, List, Optional
 
 from .buttondialog import ButtonDialog
 from .mousemap import MouseMap
@@ -12,7 +12,7 @@ from .ratbagd import (
     RatbagdProfile,
     evcode_to_str,
 )
-from .util.gobject import connect_signal_with_weak_ref
+from .util.gobject import SignalGroup
 
 import gi
 
@@ -26,64 +26,73 @@ class ButtonsPage(Gtk.Box):
     __gtype_name__ = "ButtonsPage"
 
     def __init__(
-        self, ratbagd_device: RatbagdDevice, profile: RatbagdProfile, *args, **kwargs
+        self,
+        ratbagd_device: RatbagdDevice,
+        profile: Optional[RatbagdProfile],
+        *args,
+        **kwargs,
     ) -> None:
         """Instantiates a new ButtonsPage.
 
         @param ratbag_device The ratbag device to configure, as
                              ratbagd.RatbagdDevice
+        @param profile The profile to configure, as ratbagd.RatbagdProfile, or
+                       None to show one later with set_profile()
         """
         Gtk.Box.__init__(self, *args, **kwargs)
 
         self._device = ratbagd_device
-        self._profile = profile
 
         self._mousemap = MouseMap("#Buttons", self._device, spacing=20, border_width=20)
         self.pack_start(self._mousemap, True, True, 0)
         self._sizegroup = Gtk.SizeGroup(mode=Gtk.SizeGroupMode.HORIZONTAL)
+        self._optionbuttons: List[OptionButton] = []
+        self._profile_signals = SignalGroup(self)
+        self._dialog_response_handler = 0
+
+        if profile is not None:
+            self.set_profile(profile)
+
+    def set_profile(self, profile: RatbagdProfile) -> None:
+        """Shows the given profile of the device on this page, replacing the
+        one shown before. The option buttons are reused for the new profile's
+        buttons.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        for _step in self.set_profile_steps(profile):
+            pass
 
-        for ratbagd_button in profile.buttons:
-            button = OptionButton()
+    def set_profile_steps(self, profile: RatbagdProfile) -> Iterator[None]:
+        """Like set_profile(), but yields after creating each option button, so
+        showing a profile can be spread over several main loop iterations.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        self._profile_signals.disconnect_all()
+        self._profile = profile
+
+        if len(self._optionbuttons) != len(profile.buttons):
+            self._mousemap.foreach(Gtk.Widget.destroy)
+            self._optionbuttons = []
+            for i, ratbagd_button in enumerate(profile.buttons):
+                button = OptionButton()
+                button.connect("clicked", self._on_button_clicked, i)
+                self._mousemap.add(button, f"#button{ratbagd_button.index}")
+                self._sizegroup.add_widget(button)
+                self._optionbuttons.append(button)
+                yield
+
+        for ratbagd_button, button in zip(profile.buttons, self._optionbuttons):
             # Set the correct label in the option button.
             self._on_button_mapping_changed(ratbagd_button, None, button)
-            button.connect("clicked", self._on_button_clicked, ratbagd_button)
-            connect_signal_with_weak_ref(
-                self,
-                ratbagd_button,
-                "notify::mapping",
-                self._on_button_mapping_changed,
-                button,
-            )
-            connect_signal_with_weak_ref(
-                self,
-                ratbagd_button,
-                "notify::special",
-                self._on_button_mapping_changed,
-                button,
-            )
-            connect_signal_with_weak_ref(
-                self,
-                ratbagd_button,
-                "notify::macro",
-                self._on_button_mapping_changed,
-                button,
-            )
-            connect_signal_with_weak_ref(
-                self,
-                ratbagd_button,
-                "notify::key",
-                self._on_button_mapping_changed,
-                button,
-            )
-            connect_signal_with_weak_ref(
-                self,
-                ratbagd_button,
-                "notify::action-type",
-                self._on_button_mapping_changed,
-                button,
-            )
-            self._mousemap.add(button, f"#button{ratbagd_button.index}")
-            self._sizegroup.add_widget(button)
+            for prop in ("mapping", "special", "macro", "key", "action-type"):
+                self._profile_signals.connect(
+                    ratbagd_button,
+                    f"notify::{prop}",
+                    self._on_button_mapping_changed,
+                    button,
+                )
 
         self.show_all()
 
@@ -117,22 +126,17 @@ class ButtonsPage(Gtk.Box):
             label = _("Unknown")
         optionbutton.set_label(label)
 
-    def _on_button_clicked(
-        self, button: OptionButton, ratbagd_button: RatbagdButton
-    ) -> None:
+    def _on_button_clicked(self, button: OptionButton, i: int) -> None:
         # Presents the ButtonDialog to configure the mouse button corresponding
         # to the clicked button.
         buttons = self._profile.buttons
-        device_type = self._device.device_type
-        dialog = ButtonDialog(
-            ratbagd_button,
-            buttons,
-            device_type,
-            title=_("Configure button {}").format(ratbagd_button.index),
-            use_header_bar=True,
-            transient_for=self.get_toplevel(),
+        ratbagd_button = buttons[i]
+        dialog = ButtonDialog.get_for_device(self._device, ratbagd_button, buttons)
+        dialog.set_title(_("Configure button {}").format(ratbagd_button.index))
+        dialog.set_transient_for(self.get_toplevel())
+        self._dialog_response_handler = dialog.connect(
+            "response", self._on_dialog_response, ratbagd_button
         )
-        dialog.connect("response", self._on_dialog_response, ratbagd_button)
         dialog.present()
 
     def _on_dialog_response(
@@ -142,7 +146,10 @@ class ButtonsPage(Gtk.Box):
         ratbagd_button: RatbagdButton,
     ) -> None:
         # The user either pressed cancel or apply. If it's apply, apply the
-        # changes before closing the dialog, otherwise just close the dialog.
+        # changes after closing the dialog, otherwise just close the dialog.
+        # The dialog is kept for the next button to configure.
+        dialog.disconnect(self._dialog_response_handler)
+        dialog.hide()
         if response == Gtk.ResponseType.APPLY:
             if dialog.action_type == RatbagdButton.ActionType.NONE:
                 ratbagd_button.disable()
@@ -177,7 +184,6 @@ class ButtonsPage(Gtk.Box):
                         if profile is self._profile:
                             continue
                         profile.buttons[index].special = dialog.mapping
-        dialog.destroy()
 
     def _find_button_type(self, button_type: int) -> Optional[RatbagdButton]:
         for button in self._profile.buttons:
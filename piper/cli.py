@@ -0,0 +1,359 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Piper's command line interface. It only builds on the ratbagd bindings and
+the configuration modules and must never import Gtk, so scripts don't pay for
+the GUI's startup."""
+
+import argparse
+import gettext
+import json
+import locale
+import sys
+
+from typing import List, Optional
+
+from evdev import ecodes
+
+from .deviceconfig import (
+    ConfigFormatError,
+    ConfigIncompatibleError,
+    ConfigReader,
+    ConfigWriter,
+    Record,
+    apply_records,
+    find_section,
+)
+from .provision import (
+    DEFAULT_JOBS,
+    ProgressPrinter,
+    matching_devices,
+    print_report,
+    provision_devices,
+)
+from .ratbagd import (
+    Ratbagd,
+    RatbagError,
+    RatbagdDevice,
+    RatbagdIncompatibleError,
+    RatbagdProfile,
+    RatbagdUnavailableError,
+)
+from .verify import print_results, verify_devices
+
+
+class CliError(Exception):
+    """An error to be reported to the user, without a backtrace."""
+
+
+def _find_device(ratbag: Ratbagd, name: Optional[str]) -> RatbagdDevice:
+    # Finds a device by a prefix of its ID, or returns the only device if no
+    # name is given.
+    devices = ratbag.devices
+    if name is None:
+        if len(devices) != 1:
+            raise CliError(
+                f"{len(devices)} devices connected, select one with --device"
+            )
+        return devices[0]
+    matches = [d for d in devices if d.id.startswith(name)]
+    if len(matches) != 1:
+        raise CliError(f"No unique device matches `{name}`, see `list`")
+    return matches[0]
+
+
+def _find_profile(device: RatbagdDevice, index: Optional[int]) -> RatbagdProfile:
+    if index is None:
+        profile = device.active_profile
+        if profile is None:
+            raise CliError("The device has no active profile")
+        return profile
+    if not 0 <= index < len(device.profiles):
+        raise CliError(f"The device has no profile {index}")
+    return device.profiles[index]
+
+
+def _remap_profile(records: List[Record], profile: RatbagdProfile) -> List[Record]:
+    # Mirrors what apply_records does with its profile argument, so the
+    # remapped configuration can be verified. Which profile is active is left
+    # alone then, but the active resolution is still applied.
+    first = next((r["profile"] for r in records if "profile" in r), None)
+    remapped = []
+    for record in records:
+        if "profile" not in record or record["profile"] != first:
+            continue
+        record = dict(record, profile=profile.index)
+        if record.get("type") == "profile":
+            record.pop("active", None)
+        remapped.append(record)
+    return remapped
+
+
+def _apply_and_commit(
+    device: RatbagdDevice,
+    records: List[Record],
+    commit: bool,
+    verify: bool,
+    profile: Optional[RatbagdProfile] = None,
+    strict: bool = True,
+) -> int:
+    problems = apply_records(records, device, profile=profile, strict=strict)
+    for problem in problems:
+        print(f"Skipped {problem}", file=sys.stderr)
+    if not commit:
+        return 0
+    device.commit()
+    if verify:
+        if profile is not None:
+            records = _remap_profile(records, profile)
+        results = verify_devices([(device, records)], jobs=1)
+        print_results(results)
+        if not all(result.ok for result in results):
+            return 1
+    return 0
+
+
+def _cmd_list(ratbag: Ratbagd, args: argparse.Namespace) -> int:
+    for device in ratbag.devices:
+        print(f"{device.id[:12]}  {device.model:<24}  {device.name}")
+    return 0
+
+
+def _cmd_dump(ratbag: Ratbagd, args: argparse.Namespace) -> int:
+    device = _find_device(ratbag, args.device)
+    profiles = None
+    if args.profile is not None:
+        profiles = [_find_profile(device, args.profile)]
+    if args.output is None:
+        ConfigWriter(sys.stdout).write_device(device, profiles)
+    else:
+        with open(args.output, "w", encoding="utf-8") as f:
+            ConfigWriter(f).write_device(device, profiles)
+    return 0
+
+
+def _cmd_set_dpi(ratbag: Ratbagd, args: argparse.Namespace) -> int:
+    device = _find_device(ratbag, args.device)
+    profile = _find_profile(device, args.profile)
+    if not 0 <= args.resolution < len(profile.resolutions):
+        raise CliError(f"The profile has no resolution {args.resolution}")
+    resolution = profile.resolutions[args.resolution]
+    dpi = args.dpi
+    if len(resolution.resolution) == 2 and len(dpi) == 1:
+        dpi = dpi * 2
+    record = {
+        "type": "resolution",
+        "profile": profile.index,
+        "index": resolution.index,
+        "resolution": dpi,
+        "disabled": resolution.is_disabled,
+    }
+    return _apply_and_commit(device, [record], args.commit, args.verify)
+
+
+def _cmd_set_button(ratbag: Ratbagd, args: argparse.Namespace) -> int:
+    device = _find_device(ratbag, args.device)
+    profile = _find_profile(device, args.profile)
+    record: Record = {
+        "type": "button",
+        "profile": profile.index,
+        "index": args.button,
+        "action": args.action,
+    }
+    if args.action != "none" and args.value is None:
+        raise CliError(f"A value is required for {args.action} actions")
+    if args.action == "button":
+        record["button"] = int(args.value)
+    elif args.action == "special":
+        record["special"] = args.value.replace("-", "_")
+    elif args.action == "key":
+        try:
+            record["key"] = int(args.value)
+        except ValueError:
+            key = args.value.upper()
+            if not key.startswith("KEY_"):
+                key = f"KEY_{key}"
+            if key not in ecodes.ecodes:
+                raise CliError(f"Unknown key `{args.value}`") from None
+            record["key"] = ecodes.ecodes[key]
+    elif args.action == "macro":
+        try:
+            record["macro"] = json.loads(args.value)
+        except ValueError as e:
+            raise CliError(f"Invalid macro: {e}") from e
+    return _apply_and_commit(device, [record], args.commit, args.verify)
+
+
+def _load_records(path: str, model: Optional[str]) -> List[Record]:
+    # Returns the records of the first device section matching the model,
+    # falling back to the file's first section, which can be applied to any
+    # compatible device.
+    with open(path, encoding="utf-8") as f:
+        section = find_section(ConfigReader(f), model)
+        if section is not None:
+            return list(section)
+    with open(path, encoding="utf-8") as f:
+        section = find_section(ConfigReader(f))
+        if section is None:
+            raise CliError(f"{path} contains no devices")
+        return list(section)
+
+
+def _cmd_import(ratbag: Ratbagd, args: argparse.Namespace) -> int:
+    device = _find_device(ratbag, args.device)
+    profile = None
+    if args.profile is not None:
+        profile = _find_profile(device, args.profile)
+    records = _load_records(args.file, device.model)
+    return _apply_and_commit(
+        device, records, args.commit, args.verify, profile, strict=False
+    )
+
+
+def _cmd_apply(ratbag: Ratbagd, args: argparse.Namespace) -> int:
+    with open(args.file, encoding="utf-8") as f:
+        section = find_section(ConfigReader(f))
+        if section is None:
+            raise CliError(f"{args.file} contains no devices")
+        model = section.model
+        records = list(section)
+    devices = matching_devices(ratbag.devices, model)
+    if not devices:
+        raise CliError(f"No connected devices match {model}")
+    report = provision_devices(
+        devices, records, args.jobs, on_progress=ProgressPrinter(len(devices))
+    )
+    print_report(report)
+    ok = not report.failed
+    if args.verify:
+        results = verify_devices(
+            [(result.device, records) for result in report.succeeded], args.jobs
+        )
+        print_results(results)
+        ok = ok and all(result.ok for result in results)
+    return 0 if ok else 1
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="piper-cli", description="Configure gaming devices through ratbagd"
+    )
+    subparsers = parser.add_subparsers(dest="command", metavar="COMMAND")
+    subparsers.required = True
+
+    def add_command(name, func, help, device=True, profile=False, commit=False):
+        sub = subparsers.add_parser(name, help=help, description=help)
+        sub.set_defaults(func=func)
+        if device:
+            sub.add_argument(
+                "-d",
+                "--device",
+                help="a prefix of the device ID, see `list`. Required if more "
+                "than one device is connected",
+            )
+        if profile:
+            sub.add_argument(
+                "-p",
+                "--profile",
+                type=int,
+                help="the profile index, defaults to the active profile",
+            )
+        if commit:
+            sub.add_argument(
+                "--no-commit",
+                dest="commit",
+                action="store_false",
+                help="do not commit the changes to the device",
+            )
+            sub.add_argument(
+                "--verify",
+                action="store_true",
+                help="read the configuration back once committed",
+            )
+        return sub
+
+    add_command("list", _cmd_list, "list the connected devices", device=False)
+
+    sub = add_command("dump", _cmd_dump, "print a device's configuration", profile=True)
+    sub.add_argument("-o", "--output", help="write to this file instead")
+
+    sub = add_command(
+        "set-dpi", _cmd_set_dpi, "set a resolution", profile=True, commit=True
+    )
+    sub.add_argument("resolution", type=int, help="the resolution index")
+    sub.add_argument("dpi", type=int, nargs="+", help="the DPI, or x and y DPI")
+
+    sub = add_command(
+        "set-button",
+        _cmd_set_button,
+        "set a button mapping",
+        profile=True,
+        commit=True,
+    )
+    sub.add_argument("button", type=int, help="the button index")
+    sub.add_argument("action", choices=["none", "button", "special", "key", "macro"])
+    sub.add_argument(
+        "value",
+        nargs="?",
+        help="a button number, special action name (e.g. wheel-up), key name "
+        '(e.g. KEY_A) or JSON macro (e.g. [["key_press", 30], ["key_release", 30]])',
+    )
+
+    sub = add_command(
+        "import",
+        _cmd_import,
+        "apply a configuration file to a device",
+        profile=True,
+        commit=True,
+    )
+    sub.add_argument("file")
+
+    sub = add_command(
+        "apply",
+        _cmd_apply,
+        "apply a configuration file to all connected devices of its model",
+        device=False,
+    )
+    sub.add_argument("file")
+    sub.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=DEFAULT_JOBS,
+        help=f"devices to configure concurrently (default: {DEFAULT_JOBS})",
+    )
+    sub.add_argument(
+        "--verify",
+        action="store_true",
+        help="read the configuration back once committed",
+    )
+    return parser
+
+
+def main(argv: List[str], ratbagd_api_version: int, localedir: str) -> int:
+    """Runs the command line interface and returns the exit status.
+
+    @param argv The command line arguments, including the program name
+    @param ratbagd_api_version The ratbagd API version we require
+    @param localedir The directory with the translations
+    """
+    locale.bindtextdomain("piper", localedir)
+    locale.textdomain("piper")
+    gettext.bindtextdomain("piper", localedir)
+    gettext.textdomain("piper")
+
+    args = _build_parser().parse_args(argv[1:])
+    try:
+        ratbag = Ratbagd(ratbagd_api_version)
+    except (RatbagdUnavailableError, RatbagdIncompatibleError) as e:
+        print(f"Cannot connect to ratbagd: {e}", file=sys.stderr)
+        return 1
+
+    try:
+        return args.func(ratbag, args)
+    except (CliError, ConfigFormatError, ConfigIncompatibleError) as e:
+        print(e, file=sys.stderr)
+    except OSError as e:
+        print(f"{e.filename}: {e.strerror}", file=sys.stderr)
+    except RatbagError as e:
+        print(f"ratbagd error: {type(e).__name__}", file=sys.stderr)
+    return 1
@@ -0,0 +1,460 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""This module implements Piper's configuration file format, used to export a
+device's configuration and to import it again onto the same or another
+compatible device.
+
+A configuration file is a UTF-8 text file with one JSON object per line. The
+first line is a header carrying the format name and version, followed by any
+number of device sections. A device section starts with a `device` record and
+is followed by one record per profile, resolution, button and LED:
+
+    {"format": "piper-configuration", "version": 1}
+    {"type": "device", "model": "usb:046d:c08b:0", "name": "..."}
+    {"type": "profile", "profile": 0, "active": true, ...}
+    {"type": "resolution", "profile": 0, "index": 0, "resolution": [800], ...}
+    {"type": "button", "profile": 0, "index": 0, "action": "button", ...}
+    {"type": "led", "profile": 0, "index": 0, "mode": "on", ...}
+
+Every record is small and self-contained, so files are read one line at a time
+and applied as they are read. Memory use is bounded by the largest single
+record (usually the longest macro), no matter how many profiles or devices the
+file holds.
+"""
+
+import json
+
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional
+
+from .ratbagd import (
+    RatbagdButton,
+    RatbagdDevice,
+    RatbagdLed,
+    RatbagdMacro,
+    RatbagdProfile,
+    RatbagdResolution,
+)
+
+FORMAT_NAME = "piper-configuration"
+FORMAT_VERSION = 1
+
+Record = Dict[str, Any]
+
+
+class ConfigFormatError(Exception):
+    """The configuration file is malformed or has an unsupported version."""
+
+
+class ConfigIncompatibleError(Exception):
+    """A configuration record cannot be applied to the target device."""
+
+
+def _enum_to_str(value: int, enum) -> str:
+    return enum(value).name.lower()
+
+
+def _str_to_enum(value: str, enum):
+    try:
+        return enum[value.upper()]
+    except KeyError as e:
+        raise ConfigFormatError(f"Unknown {enum.__name__} value `{value}`") from e
+
+
+def profile_records(profile: RatbagdProfile) -> Iterator[Record]:
+    """Generates the records describing the given profile, starting with the
+    profile record itself followed by its resolutions, buttons and LEDs.
+
+    @param profile The profile to describe, as ratbagd.RatbagdProfile
+    """
+    index = profile.index
+    record: Record = {
+        "type": "profile",
+        "profile": index,
+        "name": profile.name,
+        "active": profile.is_active,
+        "disabled": profile.disabled,
+    }
+    if profile.report_rate != 0 and profile.report_rates:
+        record["report_rate"] = profile.report_rate
+    if profile.angle_snapping != -1:
+        record["angle_snapping"] = profile.angle_snapping
+    if profile.debounces:
+        record["debounce"] = profile.debounce
+    yield record
+
+    for resolution in profile.resolutions:
+        yield {
+            "type": "resolution",
+            "profile": index,
+            "index": resolution.index,
+            "resolution": list(resolution.resolution),
+            "active": resolution.is_active,
+            "default": resolution.is_default,
+            "disabled": resolution.is_disabled,
+        }
+
+    for button in profile.buttons:
+        yield _button_record(index, button)
+
+    for led in profile.leds:
+        yield {
+            "type": "led",
+            "profile": index,
+            "index": led.index,
+            "mode": _enum_to_str(led.mode, RatbagdLed.Mode),
+            "color": list(led.color),
+            "brightness": led.brightness,
+            "effect_duration": led.effect_duration,
+        }
+
+
+def _button_record(profile_index: int, button: RatbagdButton) -> Record:
+    record: Record = {"type": "button", "profile": profile_index, "index": button.index}
+    action_type = button.action_type
+    try:
+        record["action"] = _enum_to_str(action_type, RatbagdButton.ActionType)
+    except ValueError:
+        # A newer ratbagd may expose action types we don't know about.
+        record["action"] = "unknown"
+        return record
+
+    if action_type == RatbagdButton.ActionType.BUTTON:
+        record["button"] = button.mapping
+    elif action_type == RatbagdButton.ActionType.SPECIAL:
+        try:
+            record["special"] = _enum_to_str(
+                button.special, RatbagdButton.ActionSpecial
+            )
+        except ValueError:
+            # Just as with action types, a newer ratbagd may expose special
+            # actions we don't know about.
+            record["special"] = "unknown"
+    elif action_type == RatbagdButton.ActionType.KEY:
+        record["key"] = button.key
+    elif action_type == RatbagdButton.ActionType.MACRO:
+        record["macro"] = [
+            [_enum_to_str(t, RatbagdButton.Macro), v] for t, v in button.macro.keys
+        ]
+    return record
+
+
+def device_records(
+    device: RatbagdDevice, profiles: Optional[List[RatbagdProfile]] = None
+) -> Iterator[Record]:
+    """Generates the records of a device section for the given device.
+
+    @param device The device to describe, as ratbagd.RatbagdDevice
+    @param profiles The profiles to include, as [ratbagd.RatbagdProfile], or
+                    None to include all of the device's profiles.
+    """
+    yield {"type": "device", "model": device.model, "name": device.name}
+    for profile in device.profiles if profiles is None else profiles:
+        yield from profile_records(profile)
+
+
+class ConfigWriter:
+    """Writes configuration records to a text stream. The header is written
+    on construction, after which any number of device sections may follow."""
+
+    def __init__(self, stream: IO[str]) -> None:
+        self._stream = stream
+        self.write({"format": FORMAT_NAME, "version": FORMAT_VERSION})
+
+    def write(self, record: Record) -> None:
+        """Writes a single record."""
+        self._stream.write(json.dumps(record, ensure_ascii=False))
+        self._stream.write("\n")
+
+    def write_device(
+        self, device: RatbagdDevice, profiles: Optional[List[RatbagdProfile]] = None
+    ) -> None:
+        """Writes a device section for the given device. See device_records."""
+        for record in device_records(device, profiles):
+            self.write(record)
+
+
+class DeviceSection:
+    """A device section of a configuration file. Its records are read lazily
+    from the underlying stream, so a section can only be iterated once and only
+    while it is the current section of its ConfigReader."""
+
+    def __init__(self, reader: "ConfigReader", record: Record) -> None:
+        self._reader = reader
+        self.model: str = record.get("model", "")
+        self.name: str = record.get("name", "")
+
+    def __iter__(self) -> Iterator[Record]:
+        return self._reader._section_records(self)
+
+
+class ConfigReader:
+    """Reads a configuration file from a text stream, one record at a time.
+
+    Iterating a ConfigReader yields one DeviceSection per device in the file.
+    Records of a section that is not iterated are skipped when advancing to
+    the next section.
+
+    @raises ConfigFormatError when the header is missing or the file has an
+                              unsupported version.
+    """
+
+    def __init__(self, stream: IO[str]) -> None:
+        self._lines = enumerate(stream, start=1)
+        self._pending: Optional[Record] = None
+        self._current: Optional[DeviceSection] = None
+
+        header = self._next_record()
+        if header is None or header.get("format") != FORMAT_NAME:
+            raise ConfigFormatError("Not a Piper configuration file")
+        version = header.get("version")
+        if not isinstance(version, int) or version > FORMAT_VERSION:
+            raise ConfigFormatError(f"Unsupported configuration version {version}")
+        self.version: int = version
+
+    def _next_record(self) -> Optional[Record]:
+        for lineno, line in self._lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                raise ConfigFormatError(f"Line {lineno}: {e}") from e
+            if not isinstance(record, dict):
+                raise ConfigFormatError(f"Line {lineno}: expected a JSON object")
+            return record
+        return None
+
+    def _section_records(self, section: DeviceSection) -> Iterator[Record]:
+        while self._current is section:
+            record = self._next_record()
+            if record is None or record.get("type") == "device":
+                self._pending = record
+                self._current = None
+                return
+            yield record
+
+    def __iter__(self) -> Iterator[DeviceSection]:
+        while True:
+            # Skip whatever remains of the previous section.
+            if self._current is not None:
+                for _ in self._section_records(self._current):
+                    pass
+            record = self._pending if self._pending is not None else self._next_record()
+            self._pending = None
+            if record is None:
+                return
+            if record.get("type") != "device":
+                raise ConfigFormatError("Expected a device record")
+            self._current = DeviceSection(self, record)
+            yield self._current
+
+
+def _require(condition: bool, message: str) -> None:
+    if not condition:
+        raise ConfigIncompatibleError(message)
+
+
+def _lookup(objects: list, index: Any, what: str):
+    _require(
+        isinstance(index, int) and 0 <= index < len(objects),
+        f"device has no {what} {index}",
+    )
+    return objects[index]
+
+
+def _apply_profile(profile: RatbagdProfile, record: Record, activate: bool) -> None:
+    if "disabled" in record and record["disabled"] != profile.disabled:
+        _require(
+            RatbagdProfile.CAP_DISABLE in profile.capabilities,
+            f"profile {profile.index} cannot be disabled",
+        )
+        profile.disabled = record["disabled"]
+    name = record.get("name")
+    if (
+        name
+        and name != profile.name
+        and RatbagdProfile.CAP_WRITABLE_NAME in profile.capabilities
+    ):
+        profile.name = name
+    if "report_rate" in record:
+        rate = record["report_rate"]
+        _require(rate in profile.report_rates, f"report rate {rate}Hz is not supported")
+        profile.report_rate = rate
+    if "angle_snapping" in record:
+        _require(profile.angle_snapping != -1, "angle snapping is not supported")
+        profile.angle_snapping = record["angle_snapping"]
+    if "debounce" in record:
+        debounce = record["debounce"]
+        _require(
+            debounce in profile.debounces,
+            f"debounce time {debounce}ms is not supported",
+        )
+        profile.debounce = debounce
+    if activate and record.get("active") and not profile.is_active:
+        profile.set_active()
+
+
+def _apply_resolution(resolution: RatbagdResolution, record: Record) -> None:
+    value = tuple(record.get("resolution", ()))
+    current = resolution.resolution
+    _require(
+        len(value) == len(current),
+        f"resolution {resolution.index} expects {len(current)} value(s)",
+    )
+    _require(
+        all(v in resolution.resolutions for v in value),
+        f"resolution {value} is not supported",
+    )
+    disabled = record.get("disabled", False)
+    can_disable = RatbagdResolution.CAP_DISABLE in resolution.capabilities
+    _require(
+        can_disable or not disabled,
+        f"resolution {resolution.index} cannot be disabled",
+    )
+    if can_disable and not disabled and resolution.is_disabled:
+        resolution.set_disabled(False)
+    if value != current:
+        resolution.resolution = value
+    if record.get("default") and not resolution.is_default:
+        resolution.set_default()
+    if record.get("active") and not resolution.is_active:
+        resolution.set_active()
+    if disabled and not resolution.is_disabled:
+        resolution.set_disabled(True)
+
+
+def _apply_button(button: RatbagdButton, record: Record) -> None:
+    action = record.get("action")
+    if action == "unknown" or (
+        action == "special" and record.get("special") == "unknown"
+    ):
+        # Actions exported from a newer ratbagd are left as they are.
+        return
+    action_type = _str_to_enum(str(action), RatbagdButton.ActionType)
+    _require(
+        action_type in (button.action_types or []),
+        f"button {button.index} does not support {action} actions",
+    )
+    if action_type == RatbagdButton.ActionType.NONE:
+        button.disable()
+    elif action_type == RatbagdButton.ActionType.BUTTON:
+        button.mapping = record["button"]
+    elif action_type == RatbagdButton.ActionType.SPECIAL:
+        button.special = _str_to_enum(record["special"], RatbagdButton.ActionSpecial)
+    elif action_type == RatbagdButton.ActionType.KEY:
+        button.key = record["key"]
+    elif action_type == RatbagdButton.ActionType.MACRO:
+        macro = [(_str_to_enum(t, RatbagdButton.Macro), v) for t, v in record["macro"]]
+        button.macro = RatbagdMacro.from_ratbag(macro)
+
+
+def _apply_led(led: RatbagdLed, record: Record) -> None:
+    mode = _str_to_enum(record.get("mode", "off"), RatbagdLed.Mode)
+    _require(
+        mode in (led.modes or []),
+        f"LED {led.index} does not support mode {mode.name.lower()}",
+    )
+    led.mode = mode
+    if "color" in record:
+        led.color = tuple(record["color"])
+    if "brightness" in record:
+        led.brightness = record["brightness"]
+    if "effect_duration" in record:
+        led.effect_duration = record["effect_duration"]
+
+
+def _describe(record: Record, message: str) -> str:
+    what = f"profile {record.get('profile')}"
+    if record.get("type") != "profile":
+        what += f" {record.get('type')} {record.get('index')}"
+    return f"{what}: {message}"
+
+
+def apply_records(
+    records: Iterable[Record],
+    device: RatbagdDevice,
+    profile: Optional[RatbagdProfile] = None,
+    strict: bool = True,
+) -> List[str]:
+    """Applies configuration records to the given device as they are read.
+    The changes are not committed; call RatbagdDevice.commit() afterwards.
+
+    Records are matched to the device's profiles, resolutions, buttons and
+    LEDs by index, so any device with enough of them and support for the
+    configured values can be targeted, regardless of its model.
+
+    @param records The records to apply, e.g. a DeviceSection
+    @param device The device to configure, as ratbagd.RatbagdDevice
+    @param profile If not None, the records of the first profile in the
+                   records are applied to this profile instead and those of any
+                   other profiles are skipped, as ratbagd.RatbagdProfile.
+                   Which profile is active is left unchanged then.
+    @param strict Whether to raise on the first record that cannot be applied
+
+    @returns A list of messages describing the records that were skipped.
+    @raises ConfigIncompatibleError in strict mode, when a record cannot be
+                                    applied to the device.
+    @raises ConfigFormatError in strict mode, when a record is malformed.
+    """
+    problems: List[str] = []
+    source_profile: Optional[int] = None
+
+    for record in records:
+        record_type = record.get("type")
+        if record_type not in ("profile", "resolution", "button", "led"):
+            # Skip record types we don't know about.
+            continue
+        try:
+            index = record.get("profile")
+            if profile is not None:
+                if source_profile is None:
+                    source_profile = index
+                if index != source_profile:
+                    continue
+                target = profile
+            else:
+                target = _lookup(device.profiles, index, "profile")
+
+            if record_type == "profile":
+                # The source profile being active says nothing about the
+                # profile it is applied to instead.
+                _apply_profile(target, record, activate=profile is None)
+            elif record_type == "resolution":
+                resolution = _lookup(
+                    target.resolutions, record.get("index"), "resolution"
+                )
+                _apply_resolution(resolution, record)
+            elif record_type == "button":
+                button = _lookup(target.buttons, record.get("index"), "button")
+                _apply_button(button, record)
+            elif record_type == "led":
+                led = _lookup(target.leds, record.get("index"), "LED")
+                _apply_led(led, record)
+        except ConfigIncompatibleError as e:
+            if strict:
+                raise
+            problems.append(_describe(record, str(e)))
+        except (ConfigFormatError, KeyError, TypeError, ValueError) as e:
+            if strict:
+                raise ConfigFormatError(
+                    _describe(record, f"invalid record: {e}")
+                ) from e
+            problems.append(_describe(record, f"invalid record: {e}"))
+    return problems
+
+
+def find_section(
+    reader: ConfigReader, model: Optional[str] = None
+) -> Optional[DeviceSection]:
+    """Returns the first device section for the given model, or the first
+    section of the file if model is None. Sections before the returned one are
+    skipped and can no longer be read.
+
+    @param reader The reader to search, as ConfigReader
+    @param model The model to look for, as str, see RatbagdDevice.model
+    """
+    for section in reader:
+        if model is None or section.model == model:
+            return section
+    return None
@@ -1,6 +1,6 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
-from piper.svg import get_svg
+from piper.thumbnail import get_thumbnail
 
 import sys
 
@@ -9,7 +9,7 @@ import gi
 from .ratbagd import RatbagdDevice
 
 gi.require_version("Gtk", "3.0")
-from gi.repository import GdkPixbuf, GObject, Gtk, Rsvg  # noqa
+from gi.repository import GLib, GObject, Gtk  # noqa
 
 
 @Gtk.Template(resource_path="/org/freedesktop/Piper/ui/DeviceRow.ui")
@@ -34,31 +34,31 @@ class DeviceRow(Gtk.ListBoxRow):
         else:
             self.title.set_text(device.name)
 
+        self.connect("notify::scale-factor", self._on_scale_factor_changed)
+        self._update_image()
+
+        self.show_all()
+
+    def _update_image(self) -> None:
+        # Thumbnails are rendered for the row's scale factor, which changes
+        # when the window moves to another monitor.
         try:
-            svg_bytes = get_svg(device.model)
-            assert svg_bytes is not None
-            handle = Rsvg.Handle.new_from_data(svg_bytes)
-            assert handle is not None
-            svg = handle.get_pixbuf_sub("#Device")
-            handle.close()
-            if svg is None:
-                print(
-                    f"Device {device.name}'s SVG is incompatible",
-                    file=sys.stderr,
-                )
-            else:
-                svg = svg.scale_simple(50, 50, GdkPixbuf.InterpType.BILINEAR)
-                if svg is None:
-                    print("Cannot resize device SVG", file=sys.stderr)
-                else:
-                    self.image.set_from_pixbuf(svg)
-        except FileNotFoundError:
+            thumbnail = get_thumbnail(self._device.model, self.get_scale_factor())
+        except GLib.Error as e:
             print(
-                f"Device {device.name} has no image or its path is invalid",
+                f"Device {self._device.name} has no image or its path is invalid: {e}",
                 file=sys.stderr,
             )
+            return
+        if thumbnail is None:
+            print(f"Device {self._device.name}'s SVG is incompatible", file=sys.stderr)
+            return
+        self.image.set_from_surface(thumbnail)
 
-        self.show_all()
+    def _on_scale_factor_changed(
+        self, row: Gtk.ListBoxRow, pspec: GObject.ParamSpec
+    ) -> None:
+        self._update_image()
 
     @GObject.Property
     def device(self) -> RatbagdDevice:
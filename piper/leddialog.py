@@ -1,8 +1,10 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
-from typing import Tuple
+import weakref
 
-from .ratbagd import RatbagdLed
+from typing import Optional, Tuple
+
+from .ratbagd import RatbagdDevice, RatbagdLed
 
 import gi
 
@@ -25,45 +27,86 @@ class LedDialog(Gtk.Dialog):
     stack: Gtk.Stack = Gtk.Template.Child()  # type: ignore
     titlebar: Gtk.HeaderBar = Gtk.Template.Child()  # type: ignore
 
+    # The pooled dialogs, see get_for_device.
+    _pool: "weakref.WeakKeyDictionary[RatbagdDevice, LedDialog]" = (
+        weakref.WeakKeyDictionary()
+    )
+    # The style of the image shown for LEDs that are off, shared by all
+    # dialogs.
+    _led_off_provider: Optional[Gtk.CssProvider] = None
+
+    _modes = {
+        "solid": RatbagdLed.Mode.ON,
+        "cycle": RatbagdLed.Mode.CYCLE,
+        "breathing": RatbagdLed.Mode.BREATHING,
+        "off": RatbagdLed.Mode.OFF,
+    }
+
     def __init__(self, ratbagd_led: RatbagdLed, *args, **kwargs) -> None:
         """Instantiates a new LedDialog.
 
         @param ratbagd_led The LED to configure, as ratbagd.RatbagdLed.
         """
         Gtk.Dialog.__init__(self, *args, **kwargs)
-        self._led = ratbagd_led
-        self._modes = {
-            "solid": RatbagdLed.Mode.ON,
-            "cycle": RatbagdLed.Mode.CYCLE,
-            "breathing": RatbagdLed.Mode.BREATHING,
-            "off": RatbagdLed.Mode.OFF,
-        }
 
         # FIXME: why is this needed if this child's type is `titlebar` already?
         self.set_titlebar(self.titlebar)
 
+        if LedDialog._led_off_provider is None:
+            LedDialog._led_off_provider = Gtk.CssProvider()
+            LedDialog._led_off_provider.load_from_data(b"* { background: #565854}")
+        Gtk.StyleContext.add_provider(
+            self.led_off_image.get_style_context(),
+            LedDialog._led_off_provider,
+            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
+        )
+
+        self.set_led(ratbagd_led)
+
+    @classmethod
+    def get_for_device(
+        cls, device: RatbagdDevice, ratbagd_led: RatbagdLed
+    ) -> "LedDialog":
+        """Returns the LedDialog of the given device, set to the given LED.
+        There is one dialog per device that is created on first use and
+        reused afterwards, so hide it rather than destroying it once it got a
+        response.
+
+        @param device The device to configure, as ratbagd.RatbagdDevice.
+        @param ratbagd_led The LED to configure, as ratbagd.RatbagdLed.
+        """
+        dialog = cls._pool.get(device)
+        if dialog is None:
+            dialog = cls(ratbagd_led)
+            dialog.connect("delete-event", Gtk.Widget.hide_on_delete)
+            cls._pool[device] = dialog
+            weakref.finalize(device, dialog.destroy)
+        else:
+            dialog.set_led(ratbagd_led)
+        return dialog
+
+    def set_led(self, ratbagd_led: RatbagdLed) -> None:
+        """Sets the LED to configure, resetting the dialog to the LED's
+        current settings.
+
+        @param ratbagd_led The LED to configure, as ratbagd.RatbagdLed.
+        """
+        self._led = ratbagd_led
+
+        for k, v in self._modes.items():
+            child = self.stack.get_child_by_name(k)
+            assert child is not None
+            child.set_visible(v in self._led.modes)
         mode = self._led.mode
         for k, v in self._modes.items():
             if mode == v:
                 self.stack.set_visible_child_name(k)
-            if v not in self._led.modes:
-                child = self.stack.get_child_by_name(k)
-                assert child is not None
-                child.set_visible(False)
         rgba = self._get_led_color_as_rgba()
         self.colorchooser.set_rgba(rgba)
         self.colorbutton.set_rgba(rgba)
         self.adjustment_brightness.set_value(self._led.brightness)
         self.adjustment_effect_duration.set_value(self._led.effect_duration)
 
-        sp = Gtk.CssProvider()
-        sp.load_from_data(b"* { background: #565854}")
-        Gtk.StyleContext.add_provider(
-            self.led_off_image.get_style_context(),
-            sp,
-            Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION,
-        )
-
     @Gtk.Template.Callback("_on_change_value")
     def _on_change_value(
         self, scale: Gtk.Scale, scroll: Gtk.ScrollType, value: float
@@ -1,13 +1,13 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 from gettext import gettext as _
-from typing import Optional
+from typing import Iterator, List, Optional
 
 from .leddialog import LedDialog
 from .mousemap import MouseMap
 from .optionbutton import OptionButton
 from .ratbagd import RatbagdDevice, RatbagdLed, RatbagdProfile
-from .util.gobject import connect_signal_with_weak_ref
+from .util.gobject import SignalGroup
 
 import gi
 
@@ -21,33 +21,67 @@ class LedsPage(Gtk.Box):
     __gtype_name__ = "LedsPage"
 
     def __init__(
-        self, ratbagd_device: RatbagdDevice, profile: RatbagdProfile, *args, **kwargs
+        self,
+        ratbagd_device: RatbagdDevice,
+        profile: Optional[RatbagdProfile],
+        *args,
+        **kwargs,
     ) -> None:
         """Instantiates a new LedsPage.
 
         @param ratbag_device The ratbag device to configure, as
                              ratbagd.RatbagdDevice
+        @param profile The profile to configure, as ratbagd.RatbagdProfile, or
+                       None to show one later with set_profile()
         """
         Gtk.Box.__init__(self, *args, **kwargs)
         self._device = ratbagd_device
 
-        self._profile = profile
-
         self._mousemap = MouseMap("#Leds", self._device, spacing=20, border_width=20)
         self.pack_start(self._mousemap, True, True, 0)
         self._sizegroup = Gtk.SizeGroup(mode=Gtk.SizeGroupMode.HORIZONTAL)
+        self._optionbuttons: List[OptionButton] = []
+        self._profile_signals = SignalGroup(self)
+        self._dialog_response_handler = 0
 
-        for led in profile.leds:
-            mode = _(RatbagdLed.LED_DESCRIPTION[led.mode])
-            button = OptionButton(mode)
-            button.connect("clicked", self._on_button_clicked, led)
+        if profile is not None:
+            self.set_profile(profile)
 
-            connect_signal_with_weak_ref(
-                self, led, "notify::mode", self._on_led_mode_changed, button
-            )
+    def set_profile(self, profile: RatbagdProfile) -> None:
+        """Shows the given profile of the device on this page, replacing the
+        one shown before. The option buttons are reused for the new profile's
+        LEDs.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        for _step in self.set_profile_steps(profile):
+            pass
 
-            self._mousemap.add(button, f"#led{led.index}")
-            self._sizegroup.add_widget(button)
+    def set_profile_steps(self, profile: RatbagdProfile) -> Iterator[None]:
+        """Like set_profile(), but yields after creating each option button, so
+        showing a profile can be spread over several main loop iterations.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        self._profile_signals.disconnect_all()
+        self._profile = profile
+
+        if len(self._optionbuttons) != len(profile.leds):
+            self._mousemap.foreach(Gtk.Widget.destroy)
+            self._optionbuttons = []
+            for i, led in enumerate(profile.leds):
+                button = OptionButton()
+                button.connect("clicked", self._on_button_clicked, i)
+                self._mousemap.add(button, f"#led{led.index}")
+                self._sizegroup.add_widget(button)
+                self._optionbuttons.append(button)
+                yield
+
+        for led, button in zip(profile.leds, self._optionbuttons):
+            self._on_led_mode_changed(led, None, button)
+            self._profile_signals.connect(
+                led, "notify::mode", self._on_led_mode_changed, button
+            )
 
         self.show_all()
 
@@ -57,21 +91,27 @@ class LedsPage(Gtk.Box):
         mode = _(RatbagdLed.LED_DESCRIPTION[led.mode])
         button.set_label(mode)
 
-    def _on_button_clicked(self, button: OptionButton, led: RatbagdLed) -> None:
+    def _on_button_clicked(self, button: OptionButton, i: int) -> None:
         # Presents the LedDialog to configure the LED corresponding to the
         # clicked button.
-        dialog = LedDialog(led, transient_for=self.get_toplevel())
-        dialog.connect("response", self._on_dialog_response, led)
+        led = self._profile.leds[i]
+        dialog = LedDialog.get_for_device(self._device, led)
+        dialog.set_transient_for(self.get_toplevel())
+        self._dialog_response_handler = dialog.connect(
+            "response", self._on_dialog_response, led
+        )
         dialog.present()
 
     def _on_dialog_response(
         self, dialog: LedDialog, response: Gtk.ResponseType, led: RatbagdLed
     ) -> None:
         # The user either pressed cancel or apply. If it's apply, apply the
-        # changes before closing the dialog, otherwise just close the dialog.
+        # changes after closing the dialog, otherwise just close the dialog.
+        # The dialog is kept for the next LED to configure.
+        dialog.disconnect(self._dialog_response_handler)
+        dialog.hide()
         if response == Gtk.ResponseType.APPLY:
             led.mode = dialog.mode
             led.color = dialog.color
             led.brightness = dialog.brightness
             led.effect_duration = dialog.effect_duration
-        dialog.destroy()
@@ -1,14 +1,16 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
-from typing import Any, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import cairo
 import gi
+import math
 import sys
-from lxml import etree
 
-from piper.svg import get_svg
 from .ratbagd import RatbagdDevice
+from .svg import get_svg_geometry, get_svg_resource_path
+from .svgdocument import SvgDocument, acquire_document_async, release_document
+from .util.timing import timed
 
 gi.require_version("Gdk", "3.0")
 gi.require_version("Gtk", "3.0")
@@ -18,7 +20,20 @@ from gi.repository import Gdk, GLib, Gtk, GObject, Rsvg  # noqa
 """This module contains the MouseMap widget (and its helper class
 _MouseMapChild), which is central to the button and LED configuration stack
 pages. The MouseMap widget draws the device SVG in the center and lays out a
-bunch of child widgets relative to the leaders in the device SVG."""
+bunch of child widgets relative to the leaders in the device SVG.
+
+The SVG is loaded on a worker thread. Until it is ready a placeholder is
+drawn in its place, laid out with the geometry extracted at build time so
+nothing moves once the SVG arrives. If it fails to load, the placeholder is
+dropped and the children are shown without the SVG."""
+
+"""Maps with more children than this, such as keyboards, pack the children
+into several columns per side instead of placing each next to its leader,
+see MouseMap._pack_column."""
+PACKED_LAYOUT_THRESHOLD = 32
+
+"""The maximum number of columns per side in the packed layout."""
+PACKED_LAYOUT_MAX_COLUMNS = 4
 
 
 class _MouseMapChild:
@@ -30,6 +45,7 @@ class _MouseMapChild:
         self._svg_id = svg_id
         self._svg_leader = f"{svg_id}-leader"
         self._svg_path = f"{svg_id}-path"
+        self._is_pending = False
 
     @property
     def widget(self) -> Gtk.Widget:
@@ -59,6 +75,107 @@ class _MouseMapChild:
         # True iff this child's widget is allocated to the left of the SVG.
         return self._is_left
 
+    @is_left.setter
+    def is_left(self, is_left: bool) -> None:
+        self._is_left = is_left
+
+    @property
+    def is_pending(self) -> bool:
+        # True iff this child's element could not be looked up yet, because
+        # the SVG is still loading. Pending children are not shown.
+        return self._is_pending
+
+    @is_pending.setter
+    def is_pending(self, is_pending: bool) -> None:
+        self._is_pending = is_pending
+
+
+class _Bounds:
+    # A helper class for the bounding boxes drawing is clipped against, as
+    # the coordinates of their top left and bottom right corners.
+
+    def __init__(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        self.x1 = x1
+        self.y1 = y1
+        self.x2 = x2
+        self.y2 = y2
+
+    @classmethod
+    def from_rectangle(cls, rect: Gdk.Rectangle) -> "_Bounds":
+        return cls(rect.x, rect.y, rect.x + rect.width, rect.y + rect.height)
+
+    def translated(self, dx: float, dy: float) -> "_Bounds":
+        return _Bounds(self.x1 + dx, self.y1 + dy, self.x2 + dx, self.y2 + dy)
+
+    def intersects(self, other: "_Bounds") -> bool:
+        return (
+            self.x1 < other.x2
+            and other.x1 < self.x2
+            and self.y1 < other.y2
+            and other.y1 < self.y2
+        )
+
+
+class _HitIndex:
+    # A helper class to find the elements whose bounding box contains a
+    # point. The boxes are bucketed into a uniform grid, so a lookup only
+    # looks at the few elements sharing the point's cell.
+
+    CELL_SIZE = 32
+
+    def __init__(self, boxes: Dict[str, Gdk.Rectangle]) -> None:
+        self._boxes = boxes
+        self._cells: Dict[Tuple[int, int], List[str]] = {}
+        for svg_id, box in boxes.items():
+            for cx in range(
+                box.x // self.CELL_SIZE, (box.x + box.width) // self.CELL_SIZE + 1
+            ):
+                for cy in range(
+                    box.y // self.CELL_SIZE, (box.y + box.height) // self.CELL_SIZE + 1
+                ):
+                    self._cells.setdefault((cx, cy), []).append(svg_id)
+        # Smaller elements first, they are usually drawn on top of larger
+        # ones.
+        for cell in self._cells.values():
+            cell.sort(key=lambda i: boxes[i].width * boxes[i].height)
+
+    def candidates(self, x: float, y: float) -> List[str]:
+        # Returns the elements whose bounding box contains the point, smallest
+        # first.
+        cell = self._cells.get((int(x // self.CELL_SIZE), int(y // self.CELL_SIZE)))
+        if cell is None:
+            return []
+        hits = []
+        for svg_id in cell:
+            box = self._boxes[svg_id]
+            if box.x <= x < box.x + box.width and box.y <= y < box.y + box.height:
+                hits.append(svg_id)
+        return hits
+
+
+class _MouseMapLayout:
+    # A helper class holding the result of the size negotiation: the natural
+    # size of the map, the width of the column of children left of the SVG,
+    # how far children stick out above the SVG and the rectangle of every
+    # laid out child, relative to the SVG. The natural sizes of the children
+    # it was computed from tell whether a child has been resized since.
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        width_left: int,
+        height_above: int,
+        child_rects: Dict[Gtk.Widget, Gdk.Rectangle],
+        child_sizes: Dict[Gtk.Widget, Tuple[int, int]],
+    ) -> None:
+        self.width = width
+        self.height = height
+        self.width_left = width_left
+        self.height_above = height_above
+        self.child_rects = child_rects
+        self.child_sizes = child_sizes
+
 
 class MouseMap(Gtk.Container):
     """A Gtk.Container subclass to draw a device SVG with child widgets that
@@ -70,6 +187,17 @@ class MouseMap(Gtk.Container):
 
     __gtype_name__ = "MouseMap"
 
+    __gsignals__ = {
+        # Emitted with the element's identifier, such as `#button0`, when the
+        # element is clicked in the SVG. By default the widget paired with the
+        # element is activated.
+        "element-activated": (
+            GObject.SignalFlags.RUN_LAST,
+            None,
+            (str,),
+        ),
+    }
+
     __gproperties__ = {
         "spacing": (
             int,
@@ -99,39 +227,56 @@ class MouseMap(Gtk.Container):
         @param spacing The spacing to place between the SVG's leaders and the
                        widgets, as int
 
-        @raises ValueError when an argument is invalid, or when the given device
-                           has no image registered.
-        @raises GLib.Error when the SVG cannot be loaded.
+        @raises ValueError when an argument is invalid.
         """
         if layer is None:
             raise ValueError("Layer cannot be None")
         if ratbagd_device is None:
             raise ValueError("Device cannot be None")
-        try:
-            svg_bytes = get_svg(ratbagd_device.model)
-            assert svg_bytes is not None
-            handle = Rsvg.Handle.new_from_data(svg_bytes)
-            assert handle is not None
-            self._handle: Rsvg.Handle = handle
-            self._svg_data = etree.fromstring(svg_bytes)
-        except FileNotFoundError as e:
-            raise ValueError("Device has no image or its path is invalid") from e
 
         Gtk.Container.__init__(self, *args, **kwargs)
         self.set_has_window(False)
+        self.connect("destroy", self._on_destroy)
 
         self.spacing = spacing
         self._layer = layer
         self._device = ratbagd_device
-        self._children: List[_MouseMapChild] = []
+        # Keyed by widget, in the order they were added.
+        self._children: Dict[Gtk.Widget, _MouseMapChild] = {}
+        # The first child added for each element, keyed by its identifier.
+        self._children_by_id: Dict[str, _MouseMapChild] = {}
         self._highlight_element: Optional[str] = None
+        self._is_destroyed = False
+        # Whether the document failed to load. The map then draws no SVG and
+        # shows all children, see _on_document_loaded.
+        self._load_failed = False
+        # The static parts of the SVG rasterized for the current scale
+        # factor, see _get_layers.
+        self._layers: Optional[Tuple[cairo.ImageSurface, cairo.ImageSurface]] = None
+        self._layers_scale = 0
+        # The highlight masks of elements that have been hovered, keyed by
+        # their identifier, see _get_mask.
+        self._masks: Dict[str, Tuple[cairo.ImageSurface, int, int]] = {}
+        # The layout of the children, see _get_layout.
+        self._layout: Optional[_MouseMapLayout] = None
+        # Pointer events on the SVG itself go to an input-only window covering
+        # just the SVG, see do_realize, and are resolved to elements with the
+        # hit index.
+        self._event_window: Optional[Gdk.Window] = None
+        self._hit_index: Optional[_HitIndex] = None
+        self._hover_element: Optional[str] = None
+        self._pressed_element: Optional[str] = None
+        self.connect("notify::scale-factor", lambda *_: self._invalidate_layers())
 
-        # TODO: remove this when we're out of the transition to toned down SVGs
-        device = self._handle.has_sub("#Device")
-        buttons = self._handle.has_sub("#Buttons")
-        leds = self._handle.has_sub("#LEDs")
-        if not device or not buttons or not leds:
-            print("Device SVG is incompatible", file=sys.stderr)
+        # The geometry extracted at build time lays out the children while the
+        # document is loading. SVGs without one get their layout once loaded.
+        self._geometry = get_svg_geometry(get_svg_resource_path(ratbagd_device.model))
+        # The document is shared with all other MouseMaps of the same device
+        # and released again when this widget is destroyed. Cached documents
+        # arrive right away.
+        self._document: Optional[SvgDocument] = None
+        self._handle: Optional[Rsvg.Handle] = None
+        acquire_document_async(ratbagd_device.model, self._on_document_loaded)
 
     def add(self, widget: Gtk.Widget, svg_id: str) -> None:
         """Adds the given widget to the map, bound to the given SVG element
@@ -142,18 +287,31 @@ class MouseMap(Gtk.Container):
         @param svg_id The identifier of the SVG element with which this widget
                       is to be paired, as str
         """
+        if widget is None or svg_id is None:
+            return
         svg_leader = f"{svg_id}-leader"
-        if (
-            widget is None
-            or svg_id is None
-            or not self._handle.has_sub(svg_id)
-            or not self._handle.has_sub(svg_leader)
+        document = self._document
+        if document is not None:
+            if not (document.has_element(svg_id) and document.has_element(svg_leader)):
+                return
+            child = _MouseMapChild(widget, document.is_left_leader(svg_leader), svg_id)
+        elif self._geometry is not None and all(
+            element in self._geometry["elements"] for element in (svg_id, svg_leader)
         ):
-            return
-
-        is_left = self._xpath_has_style(svg_leader[1:], "text-align:end")
-        child = _MouseMapChild(widget, is_left, svg_id)
-        self._children.append(child)
+            child = _MouseMapChild(widget, svg_leader in self._geometry["left"], svg_id)
+        elif self._load_failed:
+            child = _MouseMapChild(widget, False, svg_id)
+        else:
+            # Elements missing from the build-time geometry can only be looked
+            # up once the document is loaded, the child waits until then.
+            child = _MouseMapChild(widget, False, svg_id)
+            child.is_pending = True
+            widget.set_child_visible(False)
+        self._children[widget] = child
+        self._children_by_id.setdefault(svg_id, child)
+        self._invalidate_layers()
+        self._layout = None
+        widget.connect("notify::visible", self._on_child_notify_visible)
         widget.connect("enter-notify-event", self._on_enter, child)
         widget.connect("leave-notify-event", self._on_leave)
         widget.set_parent(self)
@@ -163,12 +321,14 @@ class MouseMap(Gtk.Container):
 
         @param widget The widget to remove, as Gtk.Widget
         """
-        if widget is not None:
-            for child in self._children:
-                if child.widget == widget:
-                    self._children.remove(child)
-                    child.widget.unparent()
-                    break
+        child = self._children.pop(widget, None)
+        if child is not None:
+            if self._children_by_id.get(child.svg_id) is child:
+                del self._children_by_id[child.svg_id]
+            child.widget.disconnect_by_func(self._on_child_notify_visible)
+            child.widget.unparent()
+            self._invalidate_layers()
+            self._layout = None
 
     def do_forall(
         self, include_internals: bool, callback: "Gtk.Callback", *parameters
@@ -184,7 +344,7 @@ class MouseMap(Gtk.Container):
         """
         try:
             if callback is not None:
-                for child in self._children:
+                for child in self._children.values():
                     callback(child.widget, *parameters)
         except AttributeError:
             # See https://bugzilla.gnome.org/show_bug.cgi?id=722562.
@@ -200,15 +360,12 @@ class MouseMap(Gtk.Container):
         """Calculates the container's initial minimum and natural height. While
         this call is specific to width-for-height requests (that we requested
         not to get) we cannot be certain that our wishes are granted and hence
-        we must implement this method as well. We just return the SVG's height
-        plus the border widths.
+        we must implement this method as well. We return the height of the SVG
+        and the children sticking out above or below it, plus the border
+        widths.
         """
-        # TODO: account for children sticking out under or above the SVG, if
-        # they exist. At the moment we cannot reliably do so because the
-        # y-coordinates of the leaders can have any arbitrary value. For now,
-        # we assume that the SVG is high enough to fit all children and do not
-        # worry about setups beyond the default GNOME Adwaita.
-        height = self._handle.props.height + 2 * self.props.border_width
+        self._check_layout()
+        height = self._get_layout().height
         return height, height
 
     def do_get_preferred_width(self) -> Tuple[int, int]:
@@ -219,23 +376,8 @@ class MouseMap(Gtk.Container):
         width, the natural child widths (left and right), spacing and border
         width.
         """
-        width = 2 * self.props.border_width
-        width_svg = self._handle.props.width
-        width_left = [
-            child.widget.get_preferred_width()[1]
-            for child in self._children
-            if child.is_left
-        ]
-        width_right = [
-            child.widget.get_preferred_width()[1]
-            for child in self._children
-            if not child.is_left
-        ]
-        width_left = max(width_left, default=0)
-        width_right = max(width_right, default=0)
-        width += width_left + width_svg + width_right + self.spacing
-        if width_left > 0:
-            width += self.spacing
+        self._check_layout()
+        width = self._get_layout().width
         return width, width
 
     def do_get_preferred_height_for_width(self, width: int) -> Tuple[int, int]:
@@ -270,24 +412,28 @@ class MouseMap(Gtk.Container):
         @param allocation The position and size allocated to this container, as
                           Gdk.Rectangle
         """
+        # A new allocation is laid out afresh, in case a child's size changed
+        # without this container being asked for its size again.
+        old_allocation = self.get_allocation()
+        if (old_allocation.width, old_allocation.height) != (
+            allocation.width,
+            allocation.height,
+        ):
+            self._layout = None
         self.set_allocation(allocation)
+        if self._event_window is not None:
+            self._event_window.move_resize(*self._get_event_window_rect())
         x, y = self._translate_to_origin()
         child_allocation = Gdk.Rectangle()
 
-        for child in self._children:
-            if not child.widget.get_visible():
+        for child in self._children.values():
+            rect = self._get_layout().child_rects.get(child.widget)
+            if rect is None or not child.widget.get_visible():
                 continue
-            svg_geom = self._get_svg_sub_geometry(child.svg_leader)[1]
-            nat_size = child.widget.get_preferred_size()[1]
-            if child.is_left:
-                child_allocation.x = x + svg_geom.x - self.spacing - nat_size.width
-            else:
-                child_allocation.x = x + svg_geom.x + self.spacing
-            child_allocation.y = (
-                y + svg_geom.y + 0.5 * svg_geom.height - 0.5 * nat_size.height
-            )
-            child_allocation.width = nat_size.width
-            child_allocation.height = nat_size.height
+            child_allocation.x = x + rect.x
+            child_allocation.y = y + rect.y
+            child_allocation.width = rect.width
+            child_allocation.height = rect.height
             if not child.widget.get_has_window():
                 child_allocation.x += allocation.x
                 child_allocation.y += allocation.y
@@ -305,13 +451,122 @@ class MouseMap(Gtk.Container):
         target = cr.get_target()
         target.set_device_scale(scale_factor, scale_factor)
 
-        cr.save()
-        x, y = self._translate_to_origin()
-        cr.translate(x, y)
-        self._draw_device(cr)
-        cr.restore()
-        for child in self._children:
-            self.propagate_draw(child.widget, cr)
+        # Hover changes only queue the area around an element, so anything
+        # outside the clip is skipped.
+        clip = _Bounds(*cr.clip_extents())
+        with timed("MouseMap.do_draw"):
+            cr.save()
+            x, y = self._translate_to_origin()
+            cr.translate(x, y)
+            self._draw_device(cr, clip.translated(-x, -y))
+            cr.restore()
+            allocation = self.get_allocation()
+            for child in self._children.values():
+                bounds = _Bounds.from_rectangle(child.widget.get_allocation())
+                if child.widget.get_has_window() or bounds.translated(
+                    -allocation.x, -allocation.y
+                ).intersects(clip):
+                    self.propagate_draw(child.widget, cr)
+
+    def do_realize(self) -> None:
+        """Realizes the container. MouseMap draws onto its parent's window,
+        but gets an input-only window of its own to receive pointer events on
+        the SVG. It only covers the SVG, so windowless children next to it
+        get their events from the parent's window. Children with a window are
+        realized later and hence stacked above it."""
+        Gtk.Container.do_realize(self)
+        attributes = Gdk.WindowAttr()
+        attributes.window_type = Gdk.WindowType.CHILD
+        attributes.wclass = Gdk.WindowWindowClass.INPUT_ONLY
+        (
+            attributes.x,
+            attributes.y,
+            attributes.width,
+            attributes.height,
+        ) = self._get_event_window_rect()
+        attributes.event_mask = (
+            self.get_events()
+            | Gdk.EventMask.POINTER_MOTION_MASK
+            | Gdk.EventMask.BUTTON_PRESS_MASK
+            | Gdk.EventMask.BUTTON_RELEASE_MASK
+            | Gdk.EventMask.LEAVE_NOTIFY_MASK
+        )
+        self._event_window = Gdk.Window.new(
+            self.get_parent_window(),
+            attributes,
+            Gdk.WindowAttributesType.X | Gdk.WindowAttributesType.Y,
+        )
+        self.register_window(self._event_window)
+
+    def do_unrealize(self) -> None:
+        """Unrealizes the container, destroying its input-only window."""
+        if self._event_window is not None:
+            self.unregister_window(self._event_window)
+            self._event_window.destroy()
+            self._event_window = None
+        Gtk.Container.do_unrealize(self)
+
+    def do_map(self) -> None:
+        """Maps the container and its input-only window, without raising it
+        above the children's windows."""
+        Gtk.Container.do_map(self)
+        if self._event_window is not None:
+            self._event_window.show_unraised()
+
+    def do_unmap(self) -> None:
+        """Unmaps the container and its input-only window."""
+        if self._event_window is not None:
+            self._event_window.hide()
+        Gtk.Container.do_unmap(self)
+
+    def do_motion_notify_event(self, event: Gdk.EventMotion) -> bool:
+        """Highlights the element under the pointer, as hovering its widget
+        does."""
+        svg_id = self._get_element_at_event(event)
+        if svg_id != self._hover_element:
+            self._hover_element = svg_id
+            self._set_highlight(svg_id)
+            cursor = None
+            if svg_id is not None:
+                cursor = Gdk.Cursor.new_from_name(self.get_display(), "pointer")
+            if self._event_window is not None:
+                self._event_window.set_cursor(cursor)
+        return Gdk.EVENT_PROPAGATE
+
+    def do_leave_notify_event(self, event: Gdk.EventCrossing) -> bool:
+        """Removes the highlight when the pointer leaves the SVG."""
+        if self._hover_element is not None:
+            self._hover_element = None
+            self._set_highlight(None)
+        return Gdk.EVENT_PROPAGATE
+
+    def do_button_press_event(self, event: Gdk.EventButton) -> bool:
+        """Remembers the element pressed, see do_button_release_event."""
+        if (
+            event.button != Gdk.BUTTON_PRIMARY
+            or event.type != Gdk.EventType.BUTTON_PRESS
+        ):
+            return Gdk.EVENT_PROPAGATE
+        self._pressed_element = self._get_element_at_event(event)
+        return self._pressed_element is not None
+
+    def do_button_release_event(self, event: Gdk.EventButton) -> bool:
+        """Emits element-activated if the pointer is released over the same
+        element it was pressed on."""
+        if event.button != Gdk.BUTTON_PRIMARY:
+            return Gdk.EVENT_PROPAGATE
+        pressed, self._pressed_element = self._pressed_element, None
+        if pressed is None or pressed != self._get_element_at_event(event):
+            return Gdk.EVENT_PROPAGATE
+        self.emit("element-activated", pressed)
+        return Gdk.EVENT_STOP
+
+    def do_element_activated(self, svg_id: str) -> None:
+        """The default handler of element-activated, activating the widget
+        paired with the element."""
+        child = self._children_by_id.get(svg_id)
+        if child is not None:
+            child.widget.activate()
 
     def do_get_property(self, prop: GObject.ParamSpec) -> Any:
         """Gets a property value.
@@ -323,43 +578,151 @@ class MouseMap(Gtk.Container):
 
         raise AttributeError(f"Unknown property {prop.name}")
 
+    def _on_destroy(self, widget: Gtk.Widget) -> None:
+        # Hands the document back to the cache, so it can be evicted once no
+        # MouseMap uses it anymore.
+        self._is_destroyed = True
+        if self._document is not None:
+            release_document(self._document)
+            self._document = None
+            self._handle = None
+        self._invalidate_layers()
+
+    def _on_document_loaded(
+        self, document: Optional[SvgDocument], error: Optional[GLib.Error]
+    ) -> None:
+        # Called once the document is loaded, see acquire_document_async.
+        # Errors are presented by the MousePerspective, which loads the same
+        # document.
+        if document is None:
+            print(f"Cannot load device SVG: {error}", file=sys.stderr)
+            if not self._is_destroyed:
+                self._show_without_document()
+            return
+        if self._is_destroyed:
+            release_document(document)
+            return
+
+        self._document = document
+        self._handle = document.handle
+        self._invalidate_layers()
+        self._layout = None
+        # TODO: remove this when we're out of the transition to toned down SVGs
+        if not document.is_compatible:
+            print("Device SVG is incompatible", file=sys.stderr)
+
+        for child in list(self._children.values()):
+            if not child.is_pending:
+                continue
+            if not (
+                document.has_element(child.svg_id)
+                and document.has_element(child.svg_leader)
+            ):
+                self.remove(child.widget)
+                continue
+            child.is_left = document.is_left_leader(child.svg_leader)
+            child.is_pending = False
+            child.widget.set_child_visible(True)
+        self.queue_resize()
+
+    def _show_without_document(self) -> None:
+        # Drops the placeholder and shows the children waiting for the
+        # document. Their elements cannot be looked up, so they are stacked
+        # next to the SVG's place instead, see _get_layout.
+        self._load_failed = True
+        for child in self._children.values():
+            if child.is_pending:
+                child.is_pending = False
+                child.widget.set_child_visible(True)
+        self._layout = None
+        self._invalidate_layers()
+        self.queue_resize()
+
     def _on_enter(
         self, widget: Gtk.Widget, event: Gdk.EventCrossing, child: _MouseMapChild
     ) -> None:
         # Highlights the element in the SVG to which the given widget belongs.
-        self._highlight_element = child.svg_id
-        self._redraw_svg_element(child.svg_id)
+        self._set_highlight(child.svg_id)
 
     def _on_leave(self, widget: Gtk.Widget, event: Gdk.EventCrossing) -> None:
         # Restores the device SVG to its original state.
-        old_highlight = self._highlight_element
+        self._set_highlight(None)
 
-        if old_highlight is None:
+    def _set_highlight(self, svg_id: Optional[str]) -> None:
+        # Highlights the given element, or none, redrawing only what changed.
+        old_highlight = self._highlight_element
+        if old_highlight == svg_id:
             return
+        self._highlight_element = svg_id
+        if old_highlight is not None:
+            self._redraw_svg_element(old_highlight)
+        if svg_id is not None:
+            self._redraw_svg_element(svg_id)
 
-        self._highlight_element = None
-        self._redraw_svg_element(old_highlight)
-
-    def _xpath_has_style(self, svg_id: str, style: str) -> bool:
-        # Checks if the SVG element with the given identifier has the given
-        # style attribute set.
-        namespaces = {
-            "sodipodi": "http://sodipodi.sourceforge.net/DTD/sodipodi-0.dtd",
-            "cc": "http://web.resource.org/cc/",
-            "svg": "http://www.w3.org/2000/svg",
-            "dc": "http://purl.org/dc/elements/1.1/",
-            "xlink": "http://www.w3.org/1999/xlink",
-            "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
-            "inkscape": "http://www.inkscape.org/namespaces/inkscape",
-        }
-        query = f'//svg:rect[@id="{svg_id}"][contains(@style, "{style}")]'
-        element = self._svg_data.xpath(query, namespaces=namespaces)
-        return element is not None and len(element) == 1 and element[0] is not None
+    def _get_event_window_rect(self) -> Tuple[int, int, int, int]:
+        # The position and size of the input-only window, which covers the
+        # SVG, in the coordinates of the parent's window.
+        allocation = self.get_allocation()
+        x, y = self._translate_to_origin()
+        width, height = self._get_svg_size()
+        return allocation.x + x, allocation.y + y, max(width, 1), max(height, 1)
+
+    def _get_element_at_event(self, event: Gdk.Event) -> Optional[str]:
+        # Returns the identifier of the children's element under the pointer
+        # of the given event. Only events on the input-only window are on the
+        # SVG, and their coordinates are already relative to it.
+        if self._event_window is None or event.window != self._event_window:
+            return None
+        return self._get_element_at(event.x, event.y)
+
+    def _get_element_at(self, x: float, y: float) -> Optional[str]:
+        # Returns the identifier of the children's element at the given point
+        # in SVG coordinates, if any. The hit index narrows it down to the
+        # elements whose bounding box contains the point, and their masks
+        # decide whether the point is on the element's shape.
+        if self._handle is None:
+            return None
+        scale_factor = self.get_scale_factor()
+        for svg_id in self._get_hit_index().candidates(x, y):
+            mask, mask_x, mask_y = self._get_mask(svg_id)
+            px = int((x - mask_x) * scale_factor)
+            py = int((y - mask_y) * scale_factor)
+            inside = 0 <= px < mask.get_width() and 0 <= py < mask.get_height()
+            if inside and mask.get_data()[py * mask.get_stride() + px] > 0:
+                return svg_id
+        return None
+
+    def _get_hit_index(self) -> _HitIndex:
+        # Returns the hit index of the children's elements, building it if it
+        # was dropped along with the layers.
+        if self._hit_index is None:
+            boxes = {}
+            for child in self._children.values():
+                if child.is_pending:
+                    continue
+                ok, geometry = self._get_svg_sub_geometry(child.svg_id)
+                if ok:
+                    boxes[child.svg_id] = geometry
+            self._hit_index = _HitIndex(boxes)
+        return self._hit_index
 
     def _get_svg_sub_geometry(self, svg_id: str) -> Tuple[bool, Gdk.Rectangle]:
         # Helper method to get an SVG element's x- and y-coordinates, width and
-        # height.
+        # height. They come from the build-time geometry table if possible,
+        # measuring the element is expensive.
         ret = Gdk.Rectangle()
+        if self._document is not None:
+            geometry = self._document.get_element_geometry(svg_id)
+        elif self._geometry is not None:
+            geometry = self._geometry["elements"].get(svg_id)
+        else:
+            geometry = None
+        if geometry is not None:
+            ret.x, ret.y, ret.width, ret.height = geometry
+            return True, ret
+        if self._handle is None:
+            return False, ret
+
         ok, svg_pos = self._handle.get_position_sub(svg_id)
         if not ok:
             print(
@@ -388,8 +751,7 @@ class MouseMap(Gtk.Container):
         x, y = self._translate_to_origin()
         ok, svg_geom = self._get_svg_sub_geometry(svg_id)
         if not ok:
-            svg_width = self._handle.props.width
-            svg_height = self._handle.props.height
+            svg_width, svg_height = self._get_svg_size()
             self.queue_draw_area(x, y, svg_width, svg_height)
         else:
             self.queue_draw_area(
@@ -399,48 +761,318 @@ class MouseMap(Gtk.Container):
                 svg_geom.height + 20,
             )
 
+    def _get_layout(self) -> _MouseMapLayout:
+        # Returns the layout of the children, computing it if it was
+        # invalidated. It only changes when children are added, removed,
+        # shown, hidden or resized, when the allocation changes or when the
+        # SVG arrives, see _check_layout.
+        if self._layout is not None:
+            return self._layout
+
+        width_svg, height_svg = self._get_svg_size()
+        width_left = width_right = 0
+        anchored = []
+        unanchored = []
+        child_sizes = {}
+        for child in self._children.values():
+            nat_size = child.widget.get_preferred_size()[1]
+            child_sizes[child.widget] = (nat_size.width, nat_size.height)
+            if child.is_left:
+                width_left = max(width_left, nat_size.width)
+            else:
+                width_right = max(width_right, nat_size.width)
+            if child.is_pending:
+                continue
+            ok, svg_geom = self._get_svg_sub_geometry(child.svg_leader)
+            if not ok and self._load_failed:
+                unanchored.append((child, nat_size))
+                continue
+            y = round(svg_geom.y + 0.5 * svg_geom.height - 0.5 * nat_size.height)
+            anchored.append((y, child, nat_size, svg_geom))
+
+        if len(anchored) > PACKED_LAYOUT_THRESHOLD:
+            child_rects: Dict[Gtk.Widget, Gdk.Rectangle] = {}
+            width_left = self._pack_column(anchored, True, child_rects)
+            width_right = self._pack_column(anchored, False, child_rects)
+        else:
+            child_rects = {}
+            for y, child, nat_size, svg_geom in anchored:
+                rect = Gdk.Rectangle()
+                if child.is_left:
+                    rect.x = svg_geom.x - self.spacing - nat_size.width
+                else:
+                    rect.x = svg_geom.x + self.spacing
+                rect.y = y
+                rect.width = nat_size.width
+                rect.height = nat_size.height
+                child_rects[child.widget] = rect
+
+        if unanchored:
+            # Children without a leader, as the SVG failed to load, are
+            # stacked top to bottom right of everything else.
+            x = max(
+                (rect.x + rect.width for rect in child_rects.values()),
+                default=width_svg,
+            )
+            x += self.spacing
+            y = 0
+            for child, nat_size in unanchored:
+                rect = Gdk.Rectangle()
+                rect.x = x
+                rect.y = y
+                rect.width = nat_size.width
+                rect.height = nat_size.height
+                child_rects[child.widget] = rect
+                y += nat_size.height + self.spacing // 4
+                width_right = max(
+                    width_right, x + nat_size.width - width_svg - self.spacing
+                )
+
+        if width_left > 0:
+            width_left += self.spacing
+        width = (
+            2 * self.props.border_width
+            + width_left
+            + width_svg
+            + width_right
+            + self.spacing
+        )
+        # Children next to the top or bottom of the SVG, or pushed down in a
+        # packed column, may stick out above or below it.
+        top = min((rect.y for rect in child_rects.values()), default=0)
+        bottom = max((rect.y + rect.height for rect in child_rects.values()), default=0)
+        height_above = max(0, -top)
+        height = height_above + max(height_svg, bottom) + 2 * self.props.border_width
+        self._layout = _MouseMapLayout(
+            width, height, width_left, height_above, child_rects, child_sizes
+        )
+        return self._layout
+
+    def _check_layout(self) -> None:
+        # Drops the layout if a child's natural size changed since it was
+        # computed. GTK only asks for this container's size again after a
+        # child queued a resize, so this runs on the size requests instead of
+        # on every draw.
+        layout = self._layout
+        if layout is None:
+            return
+        for widget, size in layout.child_sizes.items():
+            nat_size = widget.get_preferred_size()[1]
+            if (nat_size.width, nat_size.height) != size:
+                self._layout = None
+                return
+
+    def _pack_column(
+        self,
+        anchored: List[Tuple[int, _MouseMapChild, Gtk.Requisition, Gdk.Rectangle]],
+        is_left: bool,
+        child_rects: Dict[Gtk.Widget, Gdk.Rectangle],
+    ) -> int:
+        # Lays out the children on one side of the SVG for maps with many
+        # children, whose leaders are too close together to place every child
+        # next to its leader. Children are swept top to bottom and put into
+        # the innermost sub-column where they fit at their leader's height.
+        # If none has room, a new sub-column is opened, up to
+        # PACKED_LAYOUT_MAX_COLUMNS. After that, the child is pushed down
+        # below the sub-column that ends highest. Returns the width of the
+        # side.
+        gap = self.spacing // 4
+        bottoms: List[int] = []
+        widths: List[int] = []
+        placed = []
+        for y, child, nat_size, svg_geom in sorted(
+            (a for a in anchored if a[1].is_left == is_left), key=lambda a: a[0]
+        ):
+            column = next(
+                (i for i, bottom in enumerate(bottoms) if bottom + gap <= y), None
+            )
+            if column is None and len(bottoms) < PACKED_LAYOUT_MAX_COLUMNS:
+                column = len(bottoms)
+                bottoms.append(y)
+                widths.append(0)
+            elif column is None:
+                column = min(range(len(bottoms)), key=bottoms.__getitem__)
+                y = bottoms[column] + gap
+            bottoms[column] = y + nat_size.height
+            widths[column] = max(widths[column], nat_size.width)
+            placed.append((y, child, nat_size, svg_geom, column))
+
+        # Columns are numbered from the SVG outwards.
+        offsets = [sum(widths[:i]) + i * self.spacing for i in range(len(widths))]
+        for y, child, nat_size, svg_geom, column in placed:
+            rect = Gdk.Rectangle()
+            if is_left:
+                rect.x = svg_geom.x - self.spacing - offsets[column] - nat_size.width
+            else:
+                rect.x = svg_geom.x + self.spacing + offsets[column]
+            rect.y = y
+            rect.width = nat_size.width
+            rect.height = nat_size.height
+            child_rects[child.widget] = rect
+        return sum(widths) + max(len(widths) - 1, 0) * self.spacing
+
+    def _on_child_notify_visible(
+        self, widget: Gtk.Widget, pspec: GObject.ParamSpec
+    ) -> None:
+        # Hidden children are not allocated, GTK queues the resize itself.
+        self._layout = None
+
+    def _get_svg_size(self) -> Tuple[int, int]:
+        # The size of the SVG, which is known from the build-time geometry
+        # before the document is loaded.
+        if self._handle is not None:
+            return self._handle.props.width, self._handle.props.height
+        if self._geometry is not None:
+            return self._geometry["size"][0], self._geometry["size"][1]
+        return 0, 0
+
     def _translate_to_origin(self) -> Tuple[int, int]:
         # Translates the coordinate system such that the SVG and its buttons
         # will be drawn in the center of the allocated space. The returned x-
         # and y-coordinates will be the top left corner of the centered SVG.
         allocation = self.get_allocation()
-        width = self.get_preferred_width()[1]
-        height = self.get_preferred_height()[1]
-
-        width_left = [
-            child.widget.get_preferred_width()[1]
-            for child in self._children
-            if child.is_left
-        ]
-        width_left = max(width_left, default=0)
-        if width_left > 0:
-            width_left += self.spacing
+        layout = self._get_layout()
 
-        x = (allocation.width - width) / 2 + self.props.border_width + width_left
-        y = (allocation.height - height) / 2 + self.props.border_width
+        x = (
+            (allocation.width - layout.width) / 2
+            + self.props.border_width
+            + layout.width_left
+        )
+        y = (
+            (allocation.height - layout.height) / 2
+            + self.props.border_width
+            + layout.height_above
+        )
         return round(x), round(y)
 
-    def _draw_device(self, cr: cairo.Context) -> None:
+    def _draw_device(self, cr: cairo.Context, clip: _Bounds) -> None:
         # Draws the SVG into the Cairo context. If there is an element to be
         # highlighted, it will do as such in a separate surface which will be
-        # used as a mask over the device surface.
+        # used as a mask over the device surface. Only what intersects the
+        # given clip, in SVG coordinates, is drawn.
         style_context = self.get_style_context()
         style_context.save()
         color = style_context.get_color(Gtk.StateFlags.LINK)
         style_context.restore()
         cr.set_source_rgba(color.red, color.green, color.blue, 0.5)
 
-        self._handle.render_cairo_sub(cr, id="#Device")
+        if self._handle is None:
+            if not self._load_failed:
+                self._draw_placeholder(cr)
+            return
+
+        width, height = self._handle.props.width, self._handle.props.height
+        if not clip.intersects(_Bounds(0, 0, width, height)):
+            return
+
+        device, overlay = self._get_layers(cr.get_target())
+        cr.save()
+        cr.set_source_surface(device, 0, 0)
+        cr.paint()
+        cr.restore()
         if self._highlight_element is not None:
-            svg_surface = cr.get_target()
-            highlight_surface = svg_surface.create_similar(
-                cairo.CONTENT_COLOR_ALPHA,
-                self._handle.props.width,
-                self._handle.props.height,
+            mask, mask_x, mask_y = self._get_mask(self._highlight_element)
+            scale_factor = self.get_scale_factor()
+            mask_bounds = _Bounds(
+                mask_x,
+                mask_y,
+                mask_x + mask.get_width() / scale_factor,
+                mask_y + mask.get_height() / scale_factor,
             )
-            highlight_context = cairo.Context(highlight_surface)
-            self._handle.render_cairo_sub(highlight_context, self._highlight_element)
-            cr.mask_surface(highlight_surface, 0, 0)
-        for child in self._children:
-            self._handle.render_cairo_sub(cr, id=child.svg_path)
-            self._handle.render_cairo_sub(cr, id=child.svg_leader)
+            if mask_bounds.intersects(clip):
+                cr.mask_surface(mask, mask_x, mask_y)
+        cr.set_source_surface(overlay, 0, 0)
+        cr.paint()
+
+    def _get_layers(
+        self, target: cairo.Surface
+    ) -> Tuple[cairo.ImageSurface, cairo.ImageSurface]:
+        # Returns the Device layer and the children's paths and leaders, each
+        # rasterized once for the current scale factor. The highlight is
+        # drawn between the two, so they cannot be merged.
+        scale_factor = self.get_scale_factor()
+        if self._layers is not None and self._layers_scale == scale_factor:
+            return self._layers
+
+        assert self._handle is not None
+        self._masks.clear()
+        with timed("MouseMap._get_layers"):
+            width, height = self._handle.props.width, self._handle.props.height
+            device = self._create_layer(target, width, height, scale_factor)
+            self._handle.render_cairo_sub(cairo.Context(device), id="#Device")
+            overlay = self._create_layer(target, width, height, scale_factor)
+            overlay_context = cairo.Context(overlay)
+            for child in self._children.values():
+                if child.is_pending:
+                    continue
+                self._handle.render_cairo_sub(overlay_context, id=child.svg_path)
+                self._handle.render_cairo_sub(overlay_context, id=child.svg_leader)
+        self._layers = (device, overlay)
+        self._layers_scale = scale_factor
+        return self._layers
+
+    def _get_mask(self, svg_id: str) -> Tuple[cairo.ImageSurface, int, int]:
+        # Returns the alpha mask of the given element, clipped to its bounding
+        # box, and its position. Masks are rendered once and dropped along
+        # with the layers.
+        mask = self._masks.get(svg_id)
+        if mask is not None:
+            return mask
+
+        assert self._handle is not None
+        scale_factor = self.get_scale_factor()
+        ok, geometry = self._get_svg_sub_geometry(svg_id)
+        if ok:
+            # Leave a pixel for antialiasing around the whole-pixel box.
+            x, y = geometry.x - 1, geometry.y - 1
+            width, height = geometry.width + 2, geometry.height + 2
+        else:
+            x, y = 0, 0
+            width, height = self._handle.props.width, self._handle.props.height
+        surface = cairo.ImageSurface(
+            cairo.FORMAT_A8, width * scale_factor, height * scale_factor
+        )
+        surface.set_device_scale(scale_factor, scale_factor)
+        mask_context = cairo.Context(surface)
+        mask_context.translate(-x, -y)
+        self._handle.render_cairo_sub(mask_context, svg_id)
+        surface.flush()
+        self._masks[svg_id] = (surface, x, y)
+        return self._masks[svg_id]
+
+    def _create_layer(
+        self, target: cairo.Surface, width: int, height: int, scale_factor: int
+    ) -> cairo.ImageSurface:
+        # An image surface of the given size in application pixels, in the
+        # format best suited to be painted onto the target.
+        layer = target.create_similar_image(
+            cairo.FORMAT_ARGB32, width * scale_factor, height * scale_factor
+        )
+        layer.set_device_scale(scale_factor, scale_factor)
+        return layer
+
+    def _invalidate_layers(self) -> None:
+        # Drops the rasterized layers and masks, so the next draw renders them
+        # again.
+        self._layers = None
+        self._masks.clear()
+        self._hit_index = None
+        self.queue_draw()
+
+    def _draw_placeholder(self, cr: cairo.Context) -> None:
+        # Draws a faint rounded rectangle in place of the SVG while it is
+        # loading.
+        width, height = self._get_svg_size()
+        if width <= 0 or height <= 0:
+            return
+        radius = min(width, height) / 8
+        cr.new_sub_path()
+        cr.arc(width - radius, radius, radius, -math.pi / 2, 0)
+        cr.arc(width - radius, height - radius, radius, 0, math.pi / 2)
+        cr.arc(radius, height - radius, radius, math.pi / 2, math.pi)
+        cr.arc(radius, radius, radius, math.pi, 3 * math.pi / 2)
+        cr.close_path()
+        cr.save()
+        cr.clip()
+        cr.paint_with_alpha(0.2)
+        cr.restore()
@@ -1,7 +1,11 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 from gettext import gettext as _
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
+
+import os
+import sys
+import time
 
 from .buttonspage import ButtonsPage
 from .profilerow import ProfileRow
@@ -9,13 +13,141 @@ from .ratbagd import RatbagdDevice, RatbagdProfile
 from .resolutionspage import ResolutionsPage
 from .advancedpage import AdvancedPage
 from .ledspage import LedsPage
+from .svgdocument import SvgDocument, acquire_document_async, release_document
 from .util.gobject import connect_signal_with_weak_ref
+from .util.timing import timed
 
 import gi
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import GLib, GObject, Gtk  # noqa
 
+"""How many profiles besides the active one keep their pages built, so
+switching to them only swaps the pages in the stack. The pages are built
+ahead in idle time. Set by PIPER_PREFETCH_PROFILES in the environment, 0
+disables building pages ahead."""
+try:
+    PREFETCH_PROFILES = max(0, int(os.environ.get("PIPER_PREFETCH_PROFILES", "2")))
+except ValueError:
+    print("PIPER_PREFETCH_PROFILES must be a number", file=sys.stderr)
+    PREFETCH_PROFILES = 2
+
+"""How long building pages ahead may take per main loop iteration, in
+seconds, so it doesn't delay drawing the next frame. Pages are built ahead
+one step at a time, a step being the empty page or one of its child widgets,
+so an iteration overruns this by at most one such step."""
+PREFETCH_FRAME_BUDGET = 0.008
+
+
+class _LazyPage(Gtk.Box):
+    # A stack page that only builds the actual page the first time it is
+    # shown. Until then it is an empty box that remembers the profile to
+    # build the page for.
+
+    def __init__(
+        self, page_type: type, device: RatbagdDevice, profile: RatbagdProfile
+    ) -> None:
+        Gtk.Box.__init__(self)
+        self._page_type = page_type
+        self._device = device
+        self.profile = profile
+        self._page: Optional[Gtk.Widget] = None
+        self._steps: Optional[Iterator[None]] = None
+
+    @property
+    def is_built(self) -> bool:
+        return self._page is not None
+
+    def build(self) -> None:
+        # Builds the page at once, finishing any build started in steps.
+        if self._page is not None:
+            return
+        with timed(f"Building {self._page_type.__name__}"):
+            for _step in self._get_steps():
+                pass
+
+    def build_step(self) -> bool:
+        # Runs the next step of building the page, returns True once the
+        # page is built.
+        try:
+            next(self._get_steps())
+        except StopIteration:
+            return True
+        return False
+
+    def _get_steps(self) -> Iterator[None]:
+        if self._steps is None:
+            self._steps = self._build_steps()
+        return self._steps
+
+    def _build_steps(self) -> Iterator[None]:
+        # The profile may change between the steps, the page is bound again
+        # until it is built for the latest one.
+        page = self._page_type(self._device, None)
+        profile = None
+        while profile is not self.profile:
+            yield
+            profile = self.profile
+            yield from page.set_profile_steps(profile)
+        self._page = page
+        self.pack_start(page, True, True, 0)
+        page.show()
+
+    def set_profile(self, profile: RatbagdProfile) -> None:
+        if profile is self.profile:
+            return
+        self.profile = profile
+        if self._page is not None:
+            self._page.set_profile(profile)
+
+
+class _PageSet:
+    # The stack pages of one profile, as name, title and page. Only the
+    # active profile's pages are in the stack, the others are kept to swap
+    # them in when switching profiles.
+
+    def __init__(
+        self,
+        device: RatbagdDevice,
+        profile: RatbagdProfile,
+        page_types: List[Tuple[str, str, type]],
+    ) -> None:
+        self._device = device
+        self.profile = profile
+        self.pages: List[Tuple[str, str, _LazyPage]] = []
+        self.set_profile(profile, page_types)
+
+    def set_profile(
+        self, profile: RatbagdProfile, page_types: List[Tuple[str, str, type]]
+    ) -> None:
+        # Profiles of a device have the same features, so the pages are
+        # rebound to the new profile. Pages are only created or destroyed
+        # when a profile has a feature the previous one did not.
+        self.profile = profile
+        pages = {name: page for name, _title, page in self.pages}
+        self.pages = []
+        for name, title, page_type in page_types:
+            page = pages.pop(name, None)
+            if page is None:
+                page = _LazyPage(page_type, self._device, profile)
+                page.show()
+            else:
+                page.set_profile(profile)
+            self.pages.append((name, title, page))
+        for page in pages.values():
+            page.destroy()
+
+    def get_unbuilt_page(self) -> Optional[_LazyPage]:
+        for _name, _title, page in self.pages:
+            if not page.is_built:
+                return page
+        return None
+
+    def destroy(self) -> None:
+        for _name, _title, page in self.pages:
+            page.destroy()
+        self.pages = []
+
 
 @Gtk.Template(resource_path="/org/freedesktop/Piper/ui/MousePerspective.ui")
 class MousePerspective(Gtk.Overlay):
@@ -23,6 +155,15 @@ class MousePerspective(Gtk.Overlay):
 
     __gtype_name__ = "MousePerspective"
 
+    __gsignals__ = {
+        # Emitted with the GLib.Error when the device SVG cannot be loaded.
+        "svg-load-failed": (
+            GObject.SignalFlags.RUN_FIRST,
+            None,
+            (GObject.TYPE_PYOBJECT,),
+        ),
+    }
+
     _titlebar: Gtk.HeaderBar = Gtk.Template.Child()  # type: ignore
     add_profile_button: Gtk.Button = Gtk.Template.Child()  # type: ignore
     button_commit: Gtk.Button = Gtk.Template.Child()  # type: ignore
@@ -38,6 +179,17 @@ class MousePerspective(Gtk.Overlay):
         self._device: Optional[RatbagdDevice] = None
         self._profile: Optional[RatbagdProfile] = None
         self._notification_error_timeout_id = 0
+        # The device SVG, held for as long as the device is shown so profile
+        # switches don't have to load it again.
+        self._document: Optional[SvgDocument] = None
+        # The page sets of the profiles, least recently shown first. The last
+        # one is in the stack.
+        self._page_sets: List[_PageSet] = []
+        self._prefetch_source = 0
+        self.connect("destroy", self._on_destroy)
+        self._stack_visible_child_handler = self.stack.connect(
+            "notify::visible-child", self._on_stack_visible_child
+        )
 
     @GObject.Property
     def name(self) -> str:
@@ -69,7 +221,16 @@ class MousePerspective(Gtk.Overlay):
         return self._device
 
     def set_device(self, device: RatbagdDevice) -> None:
+        self._release_document()
+        # The pages are only reused between profiles of the same device.
+        self._clear_page_sets()
         self._device = device
+        # The pages' MouseMaps load the SVG on a worker thread and share this
+        # load, so this is where errors loading it are reported from.
+        acquire_document_async(
+            device.model,
+            lambda document, error: self._on_document_loaded(device, document, error),
+        )
         connect_signal_with_weak_ref(
             self, device, "resync", lambda _: self._show_notification_error()
         )
@@ -101,6 +262,40 @@ class MousePerspective(Gtk.Overlay):
 
         self._select_profile_row(active_profile)
 
+    def _on_destroy(self, _widget: Gtk.Widget) -> None:
+        self._release_document()
+        self._clear_page_sets()
+
+    def _clear_page_sets(self) -> None:
+        if self._prefetch_source != 0:
+            GLib.Source.remove(self._prefetch_source)
+            self._prefetch_source = 0
+        with self.stack.handler_block(self._stack_visible_child_handler):
+            for page_set in self._page_sets:
+                page_set.destroy()
+        self._page_sets = []
+
+    def _release_document(self) -> None:
+        if self._document is not None:
+            release_document(self._document)
+            self._document = None
+
+    def _on_document_loaded(
+        self,
+        device: RatbagdDevice,
+        document: Optional[SvgDocument],
+        error: Optional[GLib.Error],
+    ) -> None:
+        if document is None:
+            if device is self._device:
+                self.emit("svg-load-failed", error)
+            return
+        if device is not self._device:
+            # Another device was set while the SVG was loading.
+            release_document(document)
+            return
+        self._document = document
+
     def _select_profile_row(self, profile: RatbagdProfile) -> None:
         for row in self.listbox_profiles.get_children():
             if row.profile is profile:
@@ -115,17 +310,113 @@ class MousePerspective(Gtk.Overlay):
 
         self._profile = profile
 
-        self.stack.foreach(Gtk.Widget.destroy)
-        if profile.resolutions:
-            self.stack.add_titled(
-                ResolutionsPage(self._device, profile), "resolutions", _("Resolutions")
+        with timed(f"Showing profile {profile.index}"):
+            self._show_page_set(self._get_page_set(profile))
+        self._schedule_prefetch()
+
+        self._on_profile_notify_dirty(profile, None)
+
+    def _get_page_set(self, profile: RatbagdProfile) -> _PageSet:
+        # Returns the page set for the profile and moves it to the end of the
+        # page sets. Without one, the least recently shown page set is rebound
+        # to the profile once there are as many as allowed.
+        assert self._device is not None
+        page_types = self._get_page_types(profile)
+        for page_set in self._page_sets:
+            if page_set.profile is profile:
+                self._page_sets.remove(page_set)
+                page_set.set_profile(profile, page_types)
+                break
+        else:
+            if len(self._page_sets) > PREFETCH_PROFILES:
+                page_set = self._page_sets.pop(0)
+                page_set.set_profile(profile, page_types)
+            else:
+                page_set = _PageSet(self._device, profile, page_types)
+        self._page_sets.append(page_set)
+        return page_set
+
+    def _show_page_set(self, page_set: _PageSet) -> None:
+        # Replaces the pages in the stack with the page set's, keeping the
+        # visible tab.
+        visible_name = self.stack.get_visible_child_name()
+        pages = [page for _name, _title, page in page_set.pages]
+        with self.stack.handler_block(self._stack_visible_child_handler):
+            for page in self.stack.get_children():
+                if page not in pages:
+                    self.stack.remove(page)
+            for position, (name, title, page) in enumerate(page_set.pages):
+                if page.get_parent() is None:
+                    self.stack.add_titled(page, name, title)
+                self.stack.child_set_property(page, "position", position)
+            if visible_name is not None and self.stack.get_child_by_name(visible_name):
+                self.stack.set_visible_child_full(
+                    visible_name, Gtk.StackTransitionType.NONE
+                )
+        self._on_stack_visible_child(self.stack, None)
+
+    def _schedule_prefetch(self) -> None:
+        if PREFETCH_PROFILES > 0 and self._prefetch_source == 0:
+            self._prefetch_source = GLib.idle_add(
+                self._on_prefetch_idle, priority=GLib.PRIORITY_LOW
             )
+
+    def _on_prefetch_idle(self) -> bool:
+        # Builds pages ahead until the frame budget is used up. A page is
+        # built in steps, so a page that doesn't fit in the budget is
+        # finished in the next iterations.
+        deadline = time.perf_counter() + PREFETCH_FRAME_BUDGET
+        while time.perf_counter() < deadline:
+            page = self._get_prefetch_page()
+            if page is None:
+                self._prefetch_source = 0
+                return GLib.SOURCE_REMOVE
+            page.build_step()
+        return GLib.SOURCE_CONTINUE
+
+    def _get_prefetch_page(self) -> Optional[_LazyPage]:
+        # The next page to build ahead: the active profile's hidden tabs
+        # first, then the pages of the other enabled profiles, as long as
+        # there is room for their page sets.
+        assert self._device is not None
+        for page_set in reversed(self._page_sets):
+            page = page_set.get_unbuilt_page()
+            if page is not None:
+                return page
+        for profile in self._device.profiles:
+            if len(self._page_sets) > PREFETCH_PROFILES:
+                break
+            if profile.disabled or any(
+                page_set.profile is profile for page_set in self._page_sets
+            ):
+                continue
+            page_set = _PageSet(self._device, profile, self._get_page_types(profile))
+            # Pages built ahead are the first to be rebound if another profile
+            # needs a page set.
+            self._page_sets.insert(0, page_set)
+            page = page_set.get_unbuilt_page()
+            if page is not None:
+                return page
+        return None
+
+    def _on_stack_visible_child(
+        self, stack: Gtk.Stack, pspec: Optional[GObject.ParamSpec]
+    ) -> None:
+        # Removing the pages while the stack is destroyed shows the remaining
+        # ones, there is no point in building them then.
+        page = stack.get_visible_child()
+        if page is not None and not stack.in_destruction():
+            page.build()
+
+    def _get_page_types(self, profile: RatbagdProfile) -> List[Tuple[str, str, type]]:
+        # The name, title and type of each stack page the profile needs.
+        pages: List[Tuple[str, str, type]] = []
+        if profile.resolutions:
+            pages.append(("resolutions", _("Resolutions"), ResolutionsPage))
         if profile.buttons:
-            self.stack.add_titled(
-                ButtonsPage(self._device, profile), "buttons", _("Buttons")
-            )
+            pages.append(("buttons", _("Buttons"), ButtonsPage))
         if profile.leds:
-            self.stack.add_titled(LedsPage(self._device, profile), "leds", _("LEDs"))
+            pages.append(("leds", _("LEDs"), LedsPage))
         # TODO: get rid of this duplicated logic.
         are_report_rates_supported = (
             profile.report_rate != 0 and len(profile.report_rates) != 0
@@ -135,11 +426,8 @@ class MousePerspective(Gtk.Overlay):
             or profile.debounces
             or are_report_rates_supported
         ):
-            self.stack.add_titled(
-                AdvancedPage(self._device, profile), "advanced", _("Advanced")
-            )
-
-        self._on_profile_notify_dirty(profile, None)
+            pages.append(("advanced", _("Advanced"), AdvancedPage))
+        return pages
 
     def _hide_notification_error(self) -> None:
         if self._notification_error_timeout_id != 0:
@@ -156,7 +444,6 @@ class MousePerspective(Gtk.Overlay):
     def _on_active_profile_changed(
         self, _device: RatbagdDevice, profile: RatbagdProfile
     ) -> None:
-        # TODO: preserve the active tab.
         self._set_profile(profile)
 
     def _on_notification_error_timeout(self) -> bool:
@@ -0,0 +1,148 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Applies one configuration to many devices at once. This is meant for
+setting up a batch of identical devices: every connected device whose model
+matches the configuration gets it applied and committed, with a bounded
+number of devices being configured concurrently so ratbagd isn't flooded."""
+
+import sys
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+from .deviceconfig import Record, apply_records
+from .ratbagd import RatbagdDevice
+
+"""The default number of devices configured concurrently."""
+DEFAULT_JOBS = 4
+
+ProgressCallback = Callable[[RatbagdDevice, str, Optional[str]], None]
+
+
+class ProvisionResult:
+    """The outcome of provisioning a single device."""
+
+    def __init__(
+        self, device: RatbagdDevice, error: Optional[str], duration: float
+    ) -> None:
+        self.device = device
+        self.error = error
+        self.duration = duration
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class ProvisionReport:
+    """The outcome of provisioning a set of devices."""
+
+    def __init__(self, results: List[ProvisionResult], elapsed: float) -> None:
+        self.results = results
+        self.elapsed = elapsed
+
+    @property
+    def succeeded(self) -> List[ProvisionResult]:
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[ProvisionResult]:
+        return [r for r in self.results if not r.ok]
+
+    @property
+    def devices_per_minute(self) -> float:
+        """The throughput of successfully provisioned devices."""
+        if self.elapsed <= 0:
+            return 0.0
+        return len(self.succeeded) * 60.0 / self.elapsed
+
+
+def matching_devices(devices: List[RatbagdDevice], model: str) -> List[RatbagdDevice]:
+    """Returns the devices of the given model, see RatbagdDevice.model."""
+    return [d for d in devices if d.model == model]
+
+
+def _provision_one(
+    device: RatbagdDevice,
+    records: List[Record],
+    on_progress: Optional[ProgressCallback],
+) -> ProvisionResult:
+    start = time.monotonic()
+
+    def progress(stage: str, detail: Optional[str] = None) -> None:
+        if on_progress is not None:
+            on_progress(device, stage, detail)
+
+    try:
+        progress("applying")
+        apply_records(records, device)
+        progress("committing")
+        device.commit()
+    except Exception as e:
+        # Any failure only affects this device, keep going with the others.
+        message = str(e) or type(e).__name__
+        progress("failed", message)
+        return ProvisionResult(device, message, time.monotonic() - start)
+    progress("done")
+    return ProvisionResult(device, None, time.monotonic() - start)
+
+
+def provision_devices(
+    devices: List[RatbagdDevice],
+    records: List[Record],
+    jobs: int = DEFAULT_JOBS,
+    on_progress: Optional[ProgressCallback] = None,
+) -> ProvisionReport:
+    """Applies the given configuration records to every device and commits
+    them, configuring at most `jobs` devices at the same time.
+
+    @param devices The devices to configure, as [ratbagd.RatbagdDevice]
+    @param records The configuration of one device, e.g. a list made from a
+                   deviceconfig.DeviceSection
+    @param jobs The maximum number of devices to configure concurrently
+    @param on_progress Called with the device, the stage name and an optional
+                       detail message whenever a device changes stage. Note
+                       that it is called from worker threads.
+    """
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [
+            executor.submit(_provision_one, device, records, on_progress)
+            for device in devices
+        ]
+        results = [f.result() for f in futures]
+    return ProvisionReport(results, time.monotonic() - start)
+
+
+class ProgressPrinter:
+    """A progress callback for provision_devices that prints one line per
+    stage change, numbering the devices in the order they were started."""
+
+    def __init__(self, total: int, file=sys.stdout) -> None:
+        self._total = total
+        self._file = file
+        self._lock = threading.Lock()
+        self._numbers: Dict[str, int] = {}
+
+    def __call__(
+        self, device: RatbagdDevice, stage: str, detail: Optional[str]
+    ) -> None:
+        with self._lock:
+            number = self._numbers.setdefault(device.id, len(self._numbers) + 1)
+            line = f"[{number}/{self._total}] {device.name} ({device.id[:8]}): {stage}"
+            if detail:
+                line += f": {detail}"
+            print(line, file=self._file, flush=True)
+
+
+def print_report(report: ProvisionReport, file=sys.stdout) -> None:
+    """Prints a summary of the given report, including per-device errors."""
+    for result in report.failed:
+        print(f"FAILED {result.device.name}: {result.error}", file=file)
+    print(
+        f"Provisioned {len(report.succeeded)} of {len(report.results)} devices "
+        f"in {report.elapsed:.1f}s ({report.devices_per_minute:.1f} devices/min)",
+        file=file,
+    )
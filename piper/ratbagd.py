@@ -210,6 +210,23 @@ class _RatbagdDBus(GObject.GObject):
             raise ValueError(f"D-Bus API returned `None` for property {property}")
         return p
 
+    def _get_dbus_property_uncached(self, property):
+        # Retrieves a property from the daemon, bypassing the proxy's cache.
+        val = GLib.Variant("(ss)", (self._interface, property))
+        try:
+            res = self._proxy.call_sync(
+                "org.freedesktop.DBus.Properties.Get",
+                val,
+                Gio.DBusCallFlags.NO_AUTO_START,
+                2000,
+                None,
+            )
+        except GLib.Error as e:
+            if e.code == Gio.IOErrorEnum.TIMED_OUT:
+                raise RatbagdDBusTimeoutError(e.message) from e
+            raise
+        return res.unpack()[0]
+
     def _set_dbus_property(self, property, type, value, readwrite=True):
         # Sets a cached property on the bus.
 
@@ -259,6 +276,9 @@ class _RatbagdDBus(GObject.GObject):
     def __eq__(self, other):
         return other and self._object_path == other._object_path
 
+    def __hash__(self):
+        return hash(self._object_path)
+
 
 class Ratbagd(_RatbagdDBus):
     """The ratbagd top-level object. Provides a list of devices available
@@ -426,6 +446,20 @@ class RatbagdDevice(_RatbagdDBus):
         """
         self._dbus_call("Commit", "")
 
+    def is_committed(self) -> bool:
+        """Asks ratbagd whether all profiles have been written to the device,
+        i.e. none of them is dirty. Unlike the dirty property of the profiles,
+        this bypasses the cached state and queries the daemon directly."""
+        return not any(
+            profile._get_dbus_property_uncached("IsDirty") for profile in self._profiles
+        )
+
+    def reload(self) -> "RatbagdDevice":
+        """Returns a new RatbagdDevice for the same object path, with all of
+        its properties and those of its profiles, resolutions, buttons and
+        leds freshly read from ratbagd."""
+        return RatbagdDevice(self._object_path)
+
 
 class RatbagdProfile(_RatbagdDBus):
     """Represents a ratbagd profile."""
@@ -1,7 +1,7 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
 from gettext import gettext as _
-from typing import Optional
+from typing import Iterator, List, Optional
 
 from .mousemap import MouseMap
 from .ratbagd import RatbagdButton, RatbagdDevice, RatbagdProfile
@@ -33,23 +33,53 @@ class ResolutionsPage(Gtk.Box):
     listbox: Gtk.ListBox = Gtk.Template.Child()  # type: ignore
 
     def __init__(
-        self, ratbagd_device: RatbagdDevice, profile: RatbagdProfile, *args, **kwargs
+        self,
+        ratbagd_device: RatbagdDevice,
+        profile: Optional[RatbagdProfile],
+        *args,
+        **kwargs,
     ) -> None:
         """Instantiates a new ResolutionsPage.
 
         @param ratbag_device The ratbag device to configure, as
                              ratbagd.RatbagdDevice
+        @param profile The profile to configure, as ratbagd.RatbagdProfile, or
+                       None to show one later with set_profile()
         """
         Gtk.Box.__init__(self, *args, **kwargs)
 
         self._device = ratbagd_device
         self._last_activated_row: Optional[ResolutionRow] = None
-        self._profile = profile
 
-        mousemap = MouseMap("#Buttons", self._device, spacing=20, border_width=20)
-        self.pack_start(mousemap, True, True, 0)
+        self._mousemap = MouseMap("#Buttons", self._device, spacing=20, border_width=20)
+        self.pack_start(self._mousemap, True, True, 0)
         # Place the MouseMap on the left
-        self.reorder_child(mousemap, 0)
+        self.reorder_child(self._mousemap, 0)
+        self.listbox.foreach(Gtk.Widget.destroy)
+        self._rows: List[ResolutionRow] = []
+
+        if profile is not None:
+            self.set_profile(profile)
+
+    def set_profile(self, profile: RatbagdProfile) -> None:
+        """Shows the given profile of the device on this page, replacing the
+        one shown before. The rows are reused for the new profile's
+        resolutions.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        for _step in self.set_profile_steps(profile):
+            pass
+
+    def set_profile_steps(self, profile: RatbagdProfile) -> Iterator[None]:
+        """Like set_profile(), but yields after creating each row, so
+        showing a profile can be spread over several main loop iterations.
+
+        @param profile The profile to configure, as ratbagd.RatbagdProfile
+        """
+        self._profile = profile
+
+        self._mousemap.foreach(Gtk.Widget.destroy)
         for button in profile.buttons:
             if (
                 button.action_type == RatbagdButton.ActionType.SPECIAL
@@ -58,13 +88,22 @@ class ResolutionsPage(Gtk.Box):
                 label = Gtk.Label(
                     label=_(RatbagdButton.SPECIAL_DESCRIPTION[button.special])
                 )
-                mousemap.add(label, f"#button{button.index}")
-        mousemap.show_all()
+                self._mousemap.add(label, f"#button{button.index}")
+        self._mousemap.show_all()
 
-        self.listbox.foreach(Gtk.Widget.destroy)
-        for resolution in profile.resolutions:
-            row = ResolutionRow(resolution, self)
-            self.listbox.insert(row, resolution.index)
+        if len(self._rows) != len(profile.resolutions):
+            for row in self._rows:
+                row.destroy()
+            self._rows = []
+            self._last_activated_row = None
+        for i, resolution in enumerate(profile.resolutions):
+            if i < len(self._rows):
+                self._rows[i].set_resolution(resolution)
+            else:
+                row = ResolutionRow(resolution, self)
+                self.listbox.insert(row, resolution.index)
+                self._rows.append(row)
+                yield
 
     @Gtk.Template.Callback("on_row_activated")
     def on_row_activated(self, _listbox: Gtk.ListBox, row: ResolutionRow) -> None:
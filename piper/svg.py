@@ -1,38 +1,108 @@
 # SPDX-License-Identifier: GPL-2.0-or-later
 
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
 from gi.repository import Gio  # noqa
 
-import configparser
+import ast
+import json
 
+_SVG_RESOURCE_DIR = "/org/freedesktop/Piper/svgs"
 
-def get_svg(model: str) -> Optional[bytes]:
+
+@lru_cache(maxsize=None)
+def _get_lookup() -> Dict[str, Any]:
+    # Loads the trie of DeviceMatch patterns the build compiled from
+    # svg-lookup.ini, see data/generate-svg-lookup-table.py. It is keyed by
+    # bus, vendor ID, product ID and finally version, with "*" as wildcard.
     resource = Gio.resources_lookup_data(
-        "/org/freedesktop/Piper/svgs/svg-lookup.ini", Gio.ResourceLookupFlags.NONE
+        f"{_SVG_RESOURCE_DIR}/svg-lookup.table", Gio.ResourceLookupFlags.NONE
     )
 
     data = resource.get_data()
     assert data is not None
-    config = configparser.ConfigParser()
-    config.read_string(data.decode("utf-8"), source="svg-lookup.ini")
-    assert config.sections()
+    lookup = ast.literal_eval(data.decode("utf-8"))
+    assert lookup
+    return lookup
+
+
+def _children(node: Dict[str, Any], key: str) -> Iterator[Dict[str, Any]]:
+    # Exact matches are more specific than wildcards, so they are tried first.
+    if key in node:
+        yield node[key]
+    if "*" in node:
+        yield node["*"]
+
 
-    filename = "fallback.svg"
+def _match_version(versions: Dict[Any, str], version: int) -> Optional[str]:
+    if version in versions:
+        return versions[version]
+    for key, filename in versions.items():
+        if isinstance(key, tuple) and key[0] <= version <= key[1]:
+            return filename
+    return versions.get("*")
+
+
+def _match(bus: str, vid: str, pid: str, version: int) -> Optional[str]:
+    # Walks the trie one component at a time, backtracking to the wildcard
+    # branch if the exact branch has no match further down. Components are
+    # compared left to right, so e.g. an exact product ID beats any pattern
+    # with a wildcard product ID.
+    for pids in _children(_get_lookup().get(bus, {}), vid):
+        for versions in _children(pids, pid):
+            filename = _match_version(versions, version)
+            if filename is not None:
+                return filename
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_svg_resource_path(model: str) -> str:
+    """Returns the resource path of the SVG for the given model, see
+    RatbagdDevice.model. Devices without an SVG get the fallback SVG."""
+    filename = None
 
     if model.startswith(("usb:", "bluetooth:")):
         bus, vid, pid, version = model.split(":")
-        # Where the version is 0 (virtually all devices) we drop it. This
-        # way the DeviceMatch lines are less confusing.
-        usbid = ":".join([bus, vid, pid]) if int(version) == 0 else model
+        filename = _match(bus, vid, pid, int(version))
+
+    return f"{_SVG_RESOURCE_DIR}/{filename or 'fallback.svg'}"
 
-        for s in config.sections():
-            matches = config[s]["DeviceMatch"].split(";")
-            if usbid in matches:
-                filename = config[s]["Svg"]
-                break
 
+@lru_cache(maxsize=None)
+def _get_geometry_table() -> Dict[str, Any]:
+    # Loads the geometry the build extracted from the SVGs, see
+    # data/generate-svg-geometry.py.
     resource = Gio.resources_lookup_data(
-        f"/org/freedesktop/Piper/svgs/{filename}", Gio.ResourceLookupFlags.NONE
+        f"{_SVG_RESOURCE_DIR}/svg-geometry.json", Gio.ResourceLookupFlags.NONE
     )
 
+    data = resource.get_data()
+    assert data is not None
+    return json.loads(data)
+
+
+def get_svg_geometry(path: str) -> Optional[Dict[str, Any]]:
+    """Returns the geometry extracted at build time for the SVG with the given
+    resource path, see get_svg_resource_path. It is a dict with the SVG's
+    "size" as [width, height], the bounding boxes of its button and LED
+    "elements" as {svg_id: [x, y, width, height]} and a list of the leaders
+    that point "left". Returns None if there is no geometry for the SVG."""
+    return _get_geometry_table().get(path.rsplit("/", 1)[-1])
+
+
+def get_svg_data(path: str) -> Optional[bytes]:
+    """Returns the SVG with the given resource path, see
+    get_svg_resource_path. The bytes are deliberately not memoized: the
+    gresource already holds them, and the parsed documents that are actually
+    reused are kept by the memory-bounded cache in piper.svgdocument. Callers
+    only hold the bytes while they parse or render them."""
+    resource = Gio.resources_lookup_data(path, Gio.ResourceLookupFlags.NONE)
     return resource.get_data()
+
+
+def get_svg(model: str) -> Optional[bytes]:
+    """Returns the SVG for the given model. The lookup table is parsed once
+    and the model's resource path is memoized, see get_svg_resource_path. The
+    bytes are not, see get_svg_data."""
+    return get_svg_data(get_svg_resource_path(model))
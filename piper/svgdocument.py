@@ -0,0 +1,262 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""A process-wide cache of parsed device SVGs. Every MouseMap of a device uses
+the same SVG and all of them are rebuilt on every profile switch, so the SVG
+is parsed once and the resulting document is shared between them.
+
+Documents are reference counted: a document that is in use is never evicted.
+Unused documents are kept around until the cache exceeds its memory budget,
+at which point the least recently used ones are dropped.
+
+Documents can be loaded on a worker thread with acquire_document_async, so
+large SVGs don't block the main loop. Only the parsing happens on the worker
+thread; the cache itself is only ever touched from the main thread."""
+
+from typing import Callable, Dict, FrozenSet, List, Optional, OrderedDict, Tuple
+
+import gi
+import sys
+import threading
+import traceback
+from lxml import etree
+
+from .svg import get_svg_geometry, get_svg_resource_path
+
+gi.require_version("Rsvg", "2.0")
+from gi.repository import Gio, GLib, Rsvg  # noqa
+
+"""A callback receiving the document, or None and the error if it could not
+be loaded, see SvgDocumentCache.acquire_async."""
+DocumentCallback = Callable[[Optional["SvgDocument"], Optional[GLib.Error]], None]
+
+"""The memory budget of the cache, in bytes of SVG source. Parsed documents
+are a small multiple of their source size, which varies between about 5 and
+150 KiB per device."""
+DEFAULT_MAX_SIZE = 4 * 1024 * 1024
+
+_NAMESPACES = {"svg": "http://www.w3.org/2000/svg"}
+
+
+class SvgDocument:
+    """A parsed device SVG, holding its Rsvg handle, its lxml tree and
+    metadata derived from it. Documents are shared and must be treated as
+    read-only; get them through acquire_document.
+
+    Element geometry comes from the table extracted at build time, see
+    data/generate-svg-geometry.py. Only elements missing from it are looked
+    up in the SVG itself."""
+
+    def __init__(self, path: str, data: GLib.Bytes) -> None:
+        """Parses a new SvgDocument. Use acquire_document instead.
+
+        @param path The resource path of the SVG, as str
+        @param data The SVG, as GLib.Bytes. librsvg reads it in place.
+
+        @raises GLib.Error when the SVG cannot be parsed.
+        """
+        self._path = path
+        self._size = data.get_size()
+
+        stream = Gio.MemoryInputStream.new_from_bytes(data)
+        handle = Rsvg.Handle.new_from_stream_sync(
+            stream, None, Rsvg.HandleFlags.FLAGS_NONE, None
+        )
+        assert handle is not None
+        self._handle: Rsvg.Handle = handle
+        self._data = data
+        self._tree: Optional[etree._Element] = None
+
+        geometry = get_svg_geometry(path)
+        if geometry is not None:
+            self._elements: Dict[str, Tuple[int, int, int, int]] = {
+                svg_id: tuple(box) for svg_id, box in geometry["elements"].items()
+            }
+            self._left_leaders: FrozenSet[str] = frozenset(geometry["left"])
+        else:
+            self._elements = {}
+            # Leaders pointing to the left are marked with text-align:end, see
+            # data/svgs/README.md.
+            query = '//svg:rect[contains(@style, "text-align:end")]/@id'
+            self._left_leaders = frozenset(
+                f"#{svg_id}"
+                for svg_id in self.tree.xpath(query, namespaces=_NAMESPACES)
+            )
+        self._is_compatible = all(
+            handle.has_sub(svg_id) for svg_id in ("#Device", "#Buttons", "#LEDs")
+        )
+
+    @property
+    def path(self) -> str:
+        """The resource path of this document's SVG."""
+        return self._path
+
+    @property
+    def size(self) -> int:
+        """The size of this document's SVG source, in bytes."""
+        return self._size
+
+    @property
+    def handle(self) -> Rsvg.Handle:
+        """The Rsvg.Handle to render this document with."""
+        return self._handle
+
+    @property
+    def tree(self) -> etree._Element:
+        """The root element of this document's lxml tree, parsed on first
+        use."""
+        if self._tree is None:
+            self._tree = etree.fromstring(self._data.get_data())
+        return self._tree
+
+    @property
+    def is_compatible(self) -> bool:
+        """Whether the SVG has the Device, Buttons and LEDs layers."""
+        return self._is_compatible
+
+    def has_element(self, svg_id: str) -> bool:
+        """Returns whether the SVG has an element with the given identifier,
+        such as `#button0`."""
+        return svg_id in self._elements or self._handle.has_sub(svg_id)
+
+    def get_element_geometry(self, svg_id: str) -> Optional[Tuple[int, int, int, int]]:
+        """Returns the bounding box of the element with the given identifier
+        as (x, y, width, height) in pixels, or None if it is not in the
+        build-time table and has to be measured with librsvg."""
+        return self._elements.get(svg_id)
+
+    def is_left_leader(self, svg_leader: str) -> bool:
+        """Returns whether the leader with the given identifier, such as
+        `#button0-leader`, points to the left of the device."""
+        return svg_leader in self._left_leaders
+
+
+class SvgDocumentCache:
+    """A reference-counted cache of SvgDocuments, see the module docs."""
+
+    def __init__(self, max_size: int = DEFAULT_MAX_SIZE) -> None:
+        """@param max_size The memory budget of unused documents, in bytes of
+        SVG source"""
+        self._max_size = max_size
+        self._documents: OrderedDict[str, SvgDocument] = OrderedDict()
+        self._refcounts: Dict[str, int] = {}
+        self._total_size = 0
+        # The callbacks waiting for documents being loaded on a worker thread.
+        self._loading: Dict[str, List[DocumentCallback]] = {}
+
+    def acquire(self, path: str) -> SvgDocument:
+        """Returns the document for the given resource path, parsing it if it
+        isn't cached. Every call must be paired with a call to release.
+
+        @raises GLib.Error when the SVG cannot be found or parsed.
+        """
+        document = self._documents.get(path)
+        if document is None:
+            data = Gio.resources_lookup_data(path, Gio.ResourceLookupFlags.NONE)
+            document = SvgDocument(path, data)
+            self._documents[path] = document
+            self._refcounts[path] = 0
+            self._total_size += document.size
+        self._documents.move_to_end(path)
+        self._refcounts[path] += 1
+        self._evict()
+        return document
+
+    def acquire_async(self, path: str, callback: DocumentCallback) -> None:
+        """Like acquire, but parses the document on a worker thread. The
+        callback is invoked on the main loop with the document, or with None
+        and the GLib.Error if it could not be loaded. Cached documents are
+        passed to the callback before this method returns. Every successful
+        load must be paired with a call to release, even if the caller is no
+        longer interested in the document by the time it arrives.
+        """
+        if path in self._documents:
+            callback(self.acquire(path), None)
+            return
+        if path in self._loading:
+            # Another caller already started loading this document.
+            self._loading[path].append(callback)
+            return
+        self._loading[path] = [callback]
+        thread = threading.Thread(target=self._load, args=(path,), daemon=True)
+        thread.start()
+
+    def _load(self, path: str) -> None:
+        # Runs on the worker thread and hands the result to the main loop.
+        # The main loop must hear back in any case, or the callbacks waiting
+        # for this path would never be called. Other errors, such as a
+        # malformed SVG, are passed on as GLib.Error too.
+        document, error = None, None
+        try:
+            data = Gio.resources_lookup_data(path, Gio.ResourceLookupFlags.NONE)
+            document = SvgDocument(path, data)
+        except GLib.Error as e:
+            error = e
+        except Exception as e:
+            print(f"Cannot load {path}: {e}", file=sys.stderr)
+            error = GLib.Error.new_literal(
+                Gio.io_error_quark(), str(e), Gio.IOErrorEnum.INVALID_DATA
+            )
+        finally:
+            GLib.idle_add(self._on_loaded, path, document, error)
+
+    def _on_loaded(
+        self, path: str, document: Optional[SvgDocument], error: Optional[GLib.Error]
+    ) -> bool:
+        # Each callback gets its reference right before it is called. A
+        # callback raising must not keep the others from getting theirs, or
+        # they would never release the document and it could never be
+        # evicted.
+        callbacks = self._loading.pop(path)
+        if document is not None:
+            self._documents[path] = document
+            self._refcounts[path] = 0
+            self._total_size += document.size
+        for callback in callbacks:
+            if document is not None:
+                self._refcounts[path] += 1
+            try:
+                callback(document, error)
+            except Exception:
+                print(f"Error handing out {path}:", file=sys.stderr)
+                traceback.print_exc()
+        self._evict()
+        return False
+
+    def release(self, document: SvgDocument) -> None:
+        """Drops a reference to the given document, taken by acquire."""
+        assert self._refcounts.get(document.path, 0) > 0
+        self._refcounts[document.path] -= 1
+        self._evict()
+
+    def _evict(self) -> None:
+        # Drops unused documents, least recently used first, until the cache
+        # fits its budget. Documents in use are kept even if over budget.
+        for path in list(self._documents):
+            if self._total_size <= self._max_size:
+                break
+            if self._refcounts[path] == 0:
+                self._total_size -= self._documents.pop(path).size
+                del self._refcounts[path]
+
+
+_cache = SvgDocumentCache()
+
+
+def acquire_document(model: str) -> SvgDocument:
+    """Returns the shared document of the SVG for the given model, see
+    RatbagdDevice.model. Release it with release_document when done.
+
+    @raises GLib.Error when the SVG cannot be found or parsed.
+    """
+    return _cache.acquire(get_svg_resource_path(model))
+
+
+def acquire_document_async(model: str, callback: DocumentCallback) -> None:
+    """Like acquire_document, but loads the SVG on a worker thread, see
+    SvgDocumentCache.acquire_async."""
+    _cache.acquire_async(get_svg_resource_path(model), callback)
+
+
+def release_document(document: SvgDocument) -> None:
+    """Releases a document returned by acquire_document."""
+    _cache.release(document)
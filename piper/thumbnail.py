@@ -0,0 +1,137 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Device thumbnails, as shown in the welcome perspective. Thumbnails are
+rendered directly at their size for a display scale factor instead of
+rendering the device at full size and scaling it down.
+
+The build renders thumbnails of all bundled SVGs for the common scale factors
+into the gresource, see data/generate-thumbnails.py. Anything else is
+rendered on first use and cached in $XDG_CACHE_HOME/piper/thumbnails."""
+
+from functools import lru_cache
+from typing import Optional
+
+import hashlib
+import io
+import os
+import sys
+
+import cairo
+import gi
+
+from .svg import get_svg_data, get_svg_resource_path
+
+gi.require_version("Rsvg", "2.0")
+from gi.repository import Gio, GLib, Rsvg  # noqa
+
+"""The width and height of a thumbnail at scale factor 1, in pixels."""
+THUMBNAIL_SIZE = 50
+
+"""The scale factors the build renders thumbnails for."""
+BUNDLED_SCALES = (1, 2)
+
+_THUMBNAIL_RESOURCE_DIR = "/org/freedesktop/Piper/thumbnails"
+
+
+def thumbnail_name(svg_name: str, scale: int) -> str:
+    """Returns the file name of the thumbnail of the SVG with the given file
+    name, such as `logitech-g502@2x.png`."""
+    return f"{svg_name.rsplit('.', 1)[0]}@{scale}x.png"
+
+
+def render_thumbnail(handle: Rsvg.Handle, scale: int) -> Optional[cairo.ImageSurface]:
+    """Renders the Device layer of an SVG into a square thumbnail for the
+    given scale factor. The device is centered and keeps its aspect ratio.
+
+    @param handle The SVG, as Rsvg.Handle
+    @param scale The display scale factor, as int
+
+    @returns the thumbnail, or None if the SVG has no Device layer
+    """
+    ok, position = handle.get_position_sub("#Device")
+    if not ok:
+        return None
+    ok, dimensions = handle.get_dimensions_sub("#Device")
+    if not ok or dimensions.width <= 0 or dimensions.height <= 0:
+        return None
+
+    size = THUMBNAIL_SIZE * scale
+    factor = size / max(dimensions.width, dimensions.height)
+    surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, size, size)
+    cr = cairo.Context(surface)
+    cr.translate(
+        (size - dimensions.width * factor) / 2,
+        (size - dimensions.height * factor) / 2,
+    )
+    cr.scale(factor, factor)
+    cr.translate(-position.x, -position.y)
+    handle.render_cairo_sub(cr, "#Device")
+    surface.flush()
+    return surface
+
+
+def _load_bundled(svg_name: str, scale: int) -> Optional[cairo.ImageSurface]:
+    try:
+        data = Gio.resources_lookup_data(
+            f"{_THUMBNAIL_RESOURCE_DIR}/{thumbnail_name(svg_name, scale)}",
+            Gio.ResourceLookupFlags.NONE,
+        )
+    except GLib.Error:
+        return None
+    return cairo.ImageSurface.create_from_png(io.BytesIO(data.get_data()))
+
+
+def _load_cached(svg_name: str, svg: bytes, scale: int) -> Optional[cairo.ImageSurface]:
+    # Cached thumbnails are keyed by the SVG's content, so they are rendered
+    # again when the SVG changes.
+    digest = hashlib.sha256(svg).hexdigest()[:16]
+    cache_dir = os.path.join(GLib.get_user_cache_dir(), "piper", "thumbnails")
+    cache_file = os.path.join(
+        cache_dir, thumbnail_name(f"{svg_name}-{digest}-{THUMBNAIL_SIZE}", scale)
+    )
+    try:
+        return cairo.ImageSurface.create_from_png(cache_file)
+    except (cairo.Error, OSError):
+        pass
+
+    handle = Rsvg.Handle.new_from_data(svg)
+    surface = render_thumbnail(handle, scale)
+    handle.close()
+    if surface is None:
+        return None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so other instances never read a
+        # partially written thumbnail.
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        surface.write_to_png(tmp_file)
+        os.replace(tmp_file, cache_file)
+    except (cairo.Error, OSError) as e:
+        print(f"Cannot cache thumbnail {cache_file}: {e}", file=sys.stderr)
+    return surface
+
+
+@lru_cache(maxsize=None)
+def _get_thumbnail(path: str, scale: int) -> Optional[cairo.ImageSurface]:
+    svg_name = path.rsplit("/", 1)[-1]
+    surface = _load_bundled(svg_name, scale)
+    if surface is None:
+        svg = get_svg_data(path)
+        if svg is None:
+            return None
+        surface = _load_cached(svg_name.rsplit(".", 1)[0], svg, scale)
+    if surface is not None:
+        surface.set_device_scale(scale, scale)
+    return surface
+
+
+def get_thumbnail(model: str, scale: int) -> Optional[cairo.ImageSurface]:
+    """Returns the thumbnail of the given model, see RatbagdDevice.model, for
+    the given display scale factor. Its device scale is set to the scale
+    factor, so it can be passed to Gtk.Image.set_from_surface as is.
+    Thumbnails are shared and must not be drawn to.
+
+    @returns the thumbnail, or None if the model's SVG has no Device layer
+    @raises GLib.Error when the model's SVG cannot be found.
+    """
+    return _get_thumbnail(get_svg_resource_path(model), scale)
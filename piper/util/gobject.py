@@ -1,4 +1,4 @@
-from typing import Callable, Union
+from typing import Callable, List, Tuple, Union
 
 from gi.repository import GObject
 
@@ -19,3 +19,37 @@ def connect_signal_with_weak_ref(
     handler = obj.connect(signal, func, *args)
     ref_obj.weak_ref(lambda: obj.disconnect(handler))
     return handler
+
+
+class SignalGroup:
+    """
+    Handlers connected to objects that are swapped out together, such as the
+    RatbagdProfile a page shows. All handlers are disconnected by
+    `disconnect_all` or when `ref_obj` is finalized, whichever comes first.
+    """
+
+    def __init__(self, ref_obj: Union[GObject.Object, GObject.GObject]) -> None:
+        self._handlers: List[Tuple[Union[GObject.Object, GObject.GObject], int]] = []
+        ref_obj.weak_ref(self.disconnect_all)
+
+    def connect(
+        self,
+        obj: Union[GObject.Object, GObject.GObject],
+        signal: str,
+        func: Callable,
+        *args,
+    ) -> int:
+        """
+        Connect a handler to `obj` and add it to this group.
+
+        @returns the handler ID, e.g. for `obj.handler_block`
+        """
+        handler = obj.connect(signal, func, *args)
+        self._handlers.append((obj, handler))
+        return handler
+
+    def disconnect_all(self) -> None:
+        """Disconnect all handlers in this group."""
+        for obj, handler in self._handlers:
+            obj.disconnect(handler)
+        self._handlers.clear()
@@ -0,0 +1,71 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from bisect import bisect_left
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set
+
+
+class SearchIndex:
+    """Finds the items whose text contains every term of a search, such as
+    the rows of a list box filtered by a search entry.
+
+    Texts are split into words when they are added. Every suffix of every
+    word is kept in a sorted list, so the words containing a term are those
+    with a suffix starting with it, found by bisecting the list. As search
+    terms never contain a space, a term is in a text exactly when it is in
+    one of its words. The items matching a term are remembered, so typing
+    more terms or deleting characters again doesn't search for the same term
+    twice.
+    """
+
+    def __init__(self) -> None:
+        self.items: Set[Any] = set()
+        self._suffix_items: Dict[str, Set[Any]] = {}
+        # The suffixes in sorted order, built on the first search after items
+        # were added.
+        self._suffixes: Optional[List[str]] = None
+        self._term_items: Dict[str, FrozenSet[Any]] = {}
+
+    def add(self, item: Any, text: str) -> None:
+        """Adds an item with the text to search in, which must be casefolded
+        already."""
+        self.items.add(item)
+        for word in text.split(" "):
+            for i in range(len(word)):
+                self._suffix_items.setdefault(word[i:], set()).add(item)
+        self._suffixes = None
+        self._term_items.clear()
+
+    def search(
+        self, terms: Iterable[str], candidates: Optional[Set[Any]] = None
+    ) -> Set[Any]:
+        """Returns the items whose text contains all given casefolded terms.
+        Empty terms match everything.
+
+        @param terms The terms to search for, as [str]
+        @param candidates If not None, only these items are considered, as
+                          when the previous search is narrowed down
+        """
+        result = set(self.items if candidates is None else candidates)
+        for term in terms:
+            if not result:
+                break
+            if term:
+                result &= self._get_term_items(term)
+        return result
+
+    def _get_term_items(self, term: str) -> FrozenSet[Any]:
+        # The items with a word containing the term.
+        items = self._term_items.get(term)
+        if items is not None:
+            return items
+
+        if self._suffixes is None:
+            self._suffixes = sorted(self._suffix_items)
+        suffixes = self._suffixes
+        matches: Set[Any] = set()
+        i = bisect_left(suffixes, term)
+        while i < len(suffixes) and suffixes[i].startswith(term):
+            matches |= self._suffix_items[suffixes[i]]
+            i += 1
+        items = self._term_items[term] = frozenset(matches)
+        return items
@@ -0,0 +1,30 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+from contextlib import contextmanager
+from typing import Iterator
+
+import os
+import sys
+import time
+
+"""Whether to print timings, enabled by setting PIPER_DEBUG_TIMING in the
+environment."""
+ENABLED = bool(os.environ.get("PIPER_DEBUG_TIMING"))
+
+
+@contextmanager
+def timed(label: str) -> Iterator[None]:
+    """
+    Print how long the wrapped block took to stderr, if PIPER_DEBUG_TIMING
+    is set. Otherwise this does nothing.
+    """
+    if not ENABLED:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        print(f"{label}: {elapsed * 1000:.2f} ms", file=sys.stderr)
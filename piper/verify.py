@@ -0,0 +1,177 @@
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Verifies that devices hold the configuration they were given. ratbagd
+commits asynchronously and silently resynchronizes a device when a commit
+fails, so the only proof that a commit worked is to wait for it to settle and
+read the configuration back. Several devices can be verified concurrently."""
+
+import sys
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .deviceconfig import Record, device_records
+from .ratbagd import RatbagdDevice
+
+"""Properties that are part of a record's identity, not of its value."""
+_KEY_FIELDS = ("type", "profile", "index")
+
+"""Properties that are exported but not verified. Profile names can only be
+written on a few devices and are silently ignored on others."""
+_UNVERIFIED_FIELDS = ("name",)
+
+"""How long to wait for a commit to settle by default, in seconds."""
+DEFAULT_SETTLE_TIMEOUT = 10.0
+
+_SETTLE_POLL_INTERVAL = 0.1
+
+
+class VerifyResult:
+    """The outcome of verifying a single device."""
+
+    def __init__(
+        self,
+        device: RatbagdDevice,
+        mismatches: List[str],
+        settle_time: float,
+        verify_time: float,
+        error: Optional[str] = None,
+    ) -> None:
+        self.device = device
+        self.mismatches = mismatches
+        self.settle_time = settle_time
+        self.verify_time = verify_time
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and not self.mismatches
+
+
+def _record_key(record: Record) -> Tuple[Any, ...]:
+    return tuple(record.get(field) for field in _KEY_FIELDS)
+
+
+def _describe_key(key: Tuple[Any, ...]) -> str:
+    record_type, profile, index = key
+    if record_type == "profile":
+        return f"profile {profile}"
+    return f"profile {profile} {record_type} {index}"
+
+
+def compare_records(intended: Iterable[Record], actual: Iterable[Record]) -> List[str]:
+    """Compares the intended configuration with the one read back from a
+    device. Only the properties present in the intended records are compared,
+    so partial configurations can be verified too.
+
+    @returns A list of messages, one per mismatching property.
+    """
+    actual_by_key: Dict[Tuple[Any, ...], Record] = {
+        _record_key(r): r for r in actual if r.get("type") != "device"
+    }
+    mismatches = []
+    for record in intended:
+        if record.get("type") == "device":
+            continue
+        key = _record_key(record)
+        current = actual_by_key.get(key)
+        if current is None:
+            mismatches.append(f"{_describe_key(key)}: missing on the device")
+            continue
+        for field, value in record.items():
+            if field in _KEY_FIELDS or field in _UNVERIFIED_FIELDS:
+                continue
+            if current.get(field) != value:
+                mismatches.append(
+                    f"{_describe_key(key)}: {field} is {current.get(field)!r}, "
+                    f"expected {value!r}"
+                )
+    return mismatches
+
+
+def wait_until_committed(
+    device: RatbagdDevice, timeout: float = DEFAULT_SETTLE_TIMEOUT
+) -> bool:
+    """Waits until ratbagd has finished committing the device, see
+    RatbagdDevice.is_committed. Returns False if it did not settle in time."""
+    deadline = time.monotonic() + timeout
+    while not device.is_committed():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(_SETTLE_POLL_INTERVAL)
+    return True
+
+
+def verify_device(
+    device: RatbagdDevice,
+    intended: List[Record],
+    timeout: float = DEFAULT_SETTLE_TIMEOUT,
+) -> VerifyResult:
+    """Waits for the device's last commit to settle, reads its configuration
+    back from ratbagd and compares it with the intended one.
+
+    @param device The device to verify, as ratbagd.RatbagdDevice
+    @param intended The configuration the device should hold, as records
+    @param timeout How long to wait for the commit to settle, in seconds
+    """
+    settle_time = 0.0
+    verify_start: Optional[float] = None
+    start = time.monotonic()
+    try:
+        settled = wait_until_committed(device, timeout)
+        settle_time = time.monotonic() - start
+        if not settled:
+            return VerifyResult(
+                device, [], settle_time, 0.0, "commit did not settle in time"
+            )
+        verify_start = time.monotonic()
+        actual = device_records(device.reload())
+        mismatches = compare_records(intended, actual)
+        verify_time = time.monotonic() - verify_start
+    except Exception as e:
+        # Any failure only affects this device, keep going with the others.
+        verify_time = 0.0 if verify_start is None else time.monotonic() - verify_start
+        return VerifyResult(
+            device, [], settle_time, verify_time, str(e) or type(e).__name__
+        )
+    return VerifyResult(device, mismatches, settle_time, verify_time)
+
+
+def verify_devices(
+    targets: List[Tuple[RatbagdDevice, List[Record]]],
+    jobs: int,
+    timeout: float = DEFAULT_SETTLE_TIMEOUT,
+) -> List[VerifyResult]:
+    """Verifies several devices concurrently, see verify_device.
+
+    @param targets The devices to verify, each paired with the configuration
+                   it should hold, as [(ratbagd.RatbagdDevice, [Record])]
+    @param jobs The maximum number of devices to verify concurrently
+    """
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [
+            executor.submit(verify_device, device, records, timeout)
+            for device, records in targets
+        ]
+        return [f.result() for f in futures]
+
+
+def print_results(results: List[VerifyResult], file=sys.stdout) -> None:
+    """Prints one line per device with its verification time, followed by
+    any mismatches."""
+    for result in results:
+        if result.error is not None:
+            status = f"ERROR: {result.error}"
+        elif result.mismatches:
+            status = f"{len(result.mismatches)} mismatch(es)"
+        else:
+            status = "OK"
+        print(
+            f"{result.device.name} ({result.device.id[:8]}): {status} "
+            f"(settled in {result.settle_time:.2f}s, "
+            f"verified in {result.verify_time:.2f}s)",
+            file=file,
+        )
+        for mismatch in result.mismatches:
+            print(f"    {mismatch}", file=file)
@@ -3,6 +3,14 @@
 from gettext import gettext as _
 from typing import Callable, List, Optional
 
+from .deviceconfig import (
+    ConfigFormatError,
+    ConfigIncompatibleError,
+    ConfigReader,
+    ConfigWriter,
+    apply_records,
+    find_section,
+)
 from .errorperspective import ErrorPerspective
 from .mouseperspective import MousePerspective
 from .welcomeperspective import WelcomePerspective
@@ -65,11 +73,15 @@ class Window(Gtk.ApplicationWindow):
 
         welcome_perspective: WelcomePerspective = self._get_child("welcome_perspective")  # type: ignore
         welcome_perspective.connect("device-selected", self._on_device_selected)
+        mouse_perspective: MousePerspective = self._get_child("mouse_perspective")  # type: ignore
+        mouse_perspective.connect("svg-load-failed", self._on_svg_load_failed)
 
         ratbag.connect("device-added", self._on_device_added)
         ratbag.connect("device-removed", self._on_device_removed)
         ratbag.connect("daemon-disappeared", self._on_daemon_disappeared)
 
+        self._build_configuration_actions()
+
         if len(ratbag.devices) == 0:
             self._present_error_perspective(
                 _("Cannot find any devices"),
@@ -97,6 +109,105 @@ class Window(Gtk.ApplicationWindow):
                     return Gdk.EVENT_STOP
         return Gdk.EVENT_PROPAGATE
 
+    def _build_configuration_actions(self) -> None:
+        # The export and import actions only make sense while a device is
+        # being configured.
+        actions = [
+            ("export-configuration", self._on_export_configuration),
+            ("import-configuration", self._on_import_configuration),
+        ]
+        for name, callback in actions:
+            action = Gio.SimpleAction.new(name, None)
+            action.connect("activate", callback)
+            action.set_enabled(False)
+            self.add_action(action)
+        self.stack_perspectives.connect(
+            "notify::visible-child-name", self._on_visible_perspective_changed
+        )
+
+    def _on_visible_perspective_changed(self, stack: Gtk.Stack, pspec) -> None:
+        enabled = stack.get_visible_child_name() == "mouse_perspective"
+        for name in ["export-configuration", "import-configuration"]:
+            self.lookup_action(name).set_enabled(enabled)
+
+    def _run_file_chooser(
+        self, title: str, action: Gtk.FileChooserAction
+    ) -> Optional[str]:
+        # Runs a file chooser for Piper configuration files and returns the
+        # selected path, or None if the user cancelled.
+        chooser = Gtk.FileChooserNative.new(title, self, action, None, None)
+        file_filter = Gtk.FileFilter()
+        file_filter.set_name(_("Piper configuration"))
+        file_filter.add_pattern("*.piper")
+        chooser.add_filter(file_filter)
+        if action == Gtk.FileChooserAction.SAVE:
+            chooser.set_do_overwrite_confirmation(True)
+            chooser.set_current_name("configuration.piper")
+        response = chooser.run()
+        path = chooser.get_filename()
+        chooser.destroy()
+        if response != Gtk.ResponseType.ACCEPT:
+            return None
+        return path
+
+    def _show_message(self, message: str, detail: str) -> None:
+        dialog = Gtk.MessageDialog(
+            self,
+            Gtk.DialogFlags.MODAL,
+            Gtk.MessageType.WARNING,
+            Gtk.ButtonsType.CLOSE,
+            message,
+        )
+        dialog.format_secondary_text(detail)
+        dialog.run()
+        dialog.destroy()
+
+    def _on_export_configuration(self, action: Gio.SimpleAction, param: None) -> None:
+        mouse_perspective: MousePerspective = self._get_child("mouse_perspective")  # type: ignore
+        path = self._run_file_chooser(
+            _("Export Configuration"), Gtk.FileChooserAction.SAVE
+        )
+        if path is None:
+            return
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                ConfigWriter(f).write_device(mouse_perspective.device)
+        except OSError as e:
+            self._show_message(_("Cannot export the configuration"), e.strerror)
+
+    def _on_import_configuration(self, action: Gio.SimpleAction, param: None) -> None:
+        mouse_perspective: MousePerspective = self._get_child("mouse_perspective")  # type: ignore
+        device = mouse_perspective.device
+        path = self._run_file_chooser(
+            _("Import Configuration"), Gtk.FileChooserAction.OPEN
+        )
+        if path is None:
+            return
+        try:
+            # Prefer the section made for this model, but allow importing a
+            # configuration from any other compatible device.
+            with open(path, encoding="utf-8") as f:
+                section = find_section(ConfigReader(f), device.model)
+                if section is not None:
+                    problems = apply_records(section, device, strict=False)
+            if section is None:
+                with open(path, encoding="utf-8") as f:
+                    section = find_section(ConfigReader(f))
+                    if section is None:
+                        raise ConfigFormatError(_("The file contains no devices"))
+                    problems = apply_records(section, device, strict=False)
+        except OSError as e:
+            self._show_message(_("Cannot import the configuration"), e.strerror)
+            return
+        except (ConfigFormatError, ConfigIncompatibleError) as e:
+            self._show_message(_("Cannot import the configuration"), str(e))
+            return
+        if problems:
+            self._show_message(
+                _("Some settings are not supported by this device"),
+                "\n".join(problems),
+            )
+
     def _on_daemon_disappeared(self, ratbag: Ratbagd) -> None:
         self._present_error_perspective(
             _("Ooops. ratbagd has disappeared"), _("Please restart Piper")
@@ -175,19 +286,28 @@ class Window(Gtk.ApplicationWindow):
         except ValueError as e:
             self._present_error_perspective(_("Cannot display device SVG"), str(e))
         except GLib.Error as e:
+            self._present_glib_error(e)
+
+    def _on_svg_load_failed(
+        self, perspective: MousePerspective, error: GLib.Error
+    ) -> None:
+        # The device SVG is loaded asynchronously, so its errors arrive after
+        # _present_mouse_perspective returned.
+        self._present_glib_error(error)
+
+    def _present_glib_error(self, e: GLib.Error) -> None:
+        # Presents an error that occurred while presenting a device.
+        if e.code == Gio.DBusError.UNKNOWN_METHOD:
             # Happens with the GetSvgFd() call when running against older
             # python. This can be removed when we've had the newer call out
             # for a while. The full error is printed to stderr by
             # ratbagd.py.
-            if e.code == Gio.DBusError.UNKNOWN_METHOD:
-                self._present_error_perspective(
-                    _("Newer version of ratbagd required"),
-                    _("Please update to the latest available version"),
-                )
-            else:
-                self._present_error_perspective(
-                    _("Unknown exception occurred"), e.message
-                )
+            self._present_error_perspective(
+                _("Newer version of ratbagd required"),
+                _("Please update to the latest available version"),
+            )
+        else:
+            self._present_error_perspective(_("Unknown exception occurred"), e.message)
 
     def _present_error_perspective(self, message: str, detail: str) -> None:
         # Present the error perspective informing the user of any errors.
@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+
+import argparse
+import io
+import json
+import unittest
+import sys
+
+deviceconfig = None
+ratbagd = None
+
+SECTIONS = [
+    [
+        {"type": "device", "model": "usb:046d:c08b:0", "name": "Logitech G502"},
+        {"type": "profile", "profile": 0, "active": True, "name": "Büro"},
+        {"type": "resolution", "profile": 0, "index": 0, "resolution": [800]},
+        {
+            "type": "button",
+            "profile": 0,
+            "index": 3,
+            "action": "macro",
+            "macro": [["key_press", 30], ["key_release", 30]],
+        },
+        {"type": "led", "profile": 0, "index": 0, "mode": "on"},
+        {"type": "profile", "profile": 1, "active": False, "name": "Games"},
+    ],
+    [
+        {"type": "device", "model": "usb:1038:1702:0", "name": "SteelSeries Rival"},
+        {"type": "profile", "profile": 0, "active": True},
+    ],
+]
+
+
+def write(sections):
+    stream = io.StringIO()
+    writer = deviceconfig.ConfigWriter(stream)
+    for records in sections:
+        for record in records:
+            writer.write(record)
+    return stream.getvalue()
+
+
+def read(text):
+    reader = deviceconfig.ConfigReader(io.StringIO(text))
+    return [(section.model, section.name, list(section)) for section in reader]
+
+
+class FakeProfile:
+    def __init__(self, index, active, resolutions=(), buttons=(), leds=()):
+        self.index = index
+        self.is_active = active
+        self.disabled = False
+        self.name = ""
+        self.capabilities = []
+        self.report_rate = 0
+        self.report_rates = []
+        self.angle_snapping = -1
+        self.debounces = []
+        self.resolutions = list(resolutions)
+        self.buttons = list(buttons)
+        self.leds = list(leds)
+
+    def set_active(self):
+        self.is_active = True
+
+
+class FakeResolution:
+    def __init__(self, index, resolution=(800,), can_disable=False):
+        self.index = index
+        self.resolution = resolution
+        self.resolutions = [400, 800, 1600, 3200]
+        self.capabilities = (
+            [ratbagd.RatbagdResolution.CAP_DISABLE] if can_disable else []
+        )
+        self.is_active = False
+        self.is_default = False
+        self.is_disabled = False
+
+    def set_active(self):
+        self.is_active = True
+
+    def set_default(self):
+        self.is_default = True
+
+    def set_disabled(self, disabled):
+        self.is_disabled = disabled
+
+
+class FakeButton:
+    def __init__(self, index, action_types=None):
+        ActionType = ratbagd.RatbagdButton.ActionType
+        self.index = index
+        self.action_types = list(ActionType) if action_types is None else action_types
+        self.action_type = ActionType.BUTTON
+        self.mapping = index + 1
+        self.special = ratbagd.RatbagdButton.ActionSpecial.UNKNOWN
+        self.key = 0
+        self.macro = ratbagd.RatbagdMacro()
+
+    def disable(self):
+        self.action_type = ratbagd.RatbagdButton.ActionType.NONE
+
+
+class FakeLed:
+    def __init__(self, index, modes=None):
+        Mode = ratbagd.RatbagdLed.Mode
+        self.index = index
+        self.modes = list(Mode) if modes is None else modes
+        self.mode = Mode.OFF
+        self.color = (0, 0, 0)
+        self.brightness = 0
+        self.effect_duration = 0
+
+
+def fake_device(**kwargs):
+    profile = FakeProfile(0, True, **kwargs)
+    return type("Device", (), {"profiles": [profile]}), profile
+
+
+class TestRoundTrip(unittest.TestCase):
+    def test_round_trip(self):
+        sections = read(write(SECTIONS))
+        self.assertEqual(len(sections), len(SECTIONS))
+        for (model, name, records), expected in zip(sections, SECTIONS):
+            self.assertEqual(model, expected[0]["model"])
+            self.assertEqual(name, expected[0]["name"])
+            self.assertEqual(records, expected[1:])
+
+    def test_one_record_per_line(self):
+        lines = write(SECTIONS).splitlines()
+        self.assertEqual(len(lines), 1 + sum(len(s) for s in SECTIONS))
+        self.assertIn("Büro", lines[2])
+
+    def test_header(self):
+        reader = deviceconfig.ConfigReader(io.StringIO(write([])))
+        self.assertEqual(reader.version, deviceconfig.FORMAT_VERSION)
+        self.assertEqual(list(reader), [])
+
+    def test_skips_unread_sections(self):
+        reader = deviceconfig.ConfigReader(io.StringIO(write(SECTIONS)))
+        models = [section.model for section in reader]
+        self.assertEqual(models, [s[0]["model"] for s in SECTIONS])
+
+    def test_partially_read_section(self):
+        reader = deviceconfig.ConfigReader(io.StringIO(write(SECTIONS)))
+        sections = iter(reader)
+        first = next(sections)
+        self.assertEqual(next(iter(first)), SECTIONS[0][1])
+        second = next(sections)
+        self.assertEqual(list(second), SECTIONS[1][1:])
+        # The first section can no longer be read once the reader moved on.
+        self.assertEqual(list(first), [])
+
+    def test_find_section(self):
+        text = write(SECTIONS)
+        reader = deviceconfig.ConfigReader(io.StringIO(text))
+        section = deviceconfig.find_section(reader, "usb:1038:1702:0")
+        self.assertEqual(list(section), SECTIONS[1][1:])
+        reader = deviceconfig.ConfigReader(io.StringIO(text))
+        self.assertIsNone(deviceconfig.find_section(reader, "usb:0000:0000:0"))
+        reader = deviceconfig.ConfigReader(io.StringIO(text))
+        section = deviceconfig.find_section(reader)
+        self.assertEqual(section.model, SECTIONS[0][0]["model"])
+
+    def test_blank_lines(self):
+        text = write(SECTIONS).replace("\n", "\n\n")
+        self.assertEqual(read(text), read(write(SECTIONS)))
+
+
+class TestMalformed(unittest.TestCase):
+    def assertMalformed(self, text):
+        with self.assertRaises(deviceconfig.ConfigFormatError):
+            read(text)
+
+    def test_empty(self):
+        self.assertMalformed("")
+
+    def test_no_header(self):
+        self.assertMalformed('{"type": "device", "model": "usb:046d:c08b:0"}\n')
+
+    def test_newer_version(self):
+        header = {
+            "format": deviceconfig.FORMAT_NAME,
+            "version": deviceconfig.FORMAT_VERSION + 1,
+        }
+        self.assertMalformed(json.dumps(header) + "\n")
+
+    def test_invalid_json(self):
+        self.assertMalformed(write(SECTIONS) + "{not json\n")
+
+    def test_not_an_object(self):
+        self.assertMalformed(write(SECTIONS) + "[1, 2]\n")
+
+    def test_record_before_device(self):
+        self.assertMalformed(write([SECTIONS[0][1:]]))
+
+
+class TestApply(unittest.TestCase):
+    def test_activates_profile(self):
+        profiles = [FakeProfile(0, False), FakeProfile(1, True)]
+        device = type("Device", (), {"profiles": profiles})
+        deviceconfig.apply_records(SECTIONS[0][1:2], device)
+        self.assertTrue(profiles[0].is_active)
+
+    def test_remap_keeps_active_profile(self):
+        profiles = [FakeProfile(0, True), FakeProfile(1, False)]
+        device = type("Device", (), {"profiles": profiles})
+        deviceconfig.apply_records(SECTIONS[0][1:2], device, profile=profiles[1])
+        self.assertFalse(profiles[1].is_active)
+
+
+class TestApplyResolution(unittest.TestCase):
+    def test_apply(self):
+        resolution = FakeResolution(1)
+        device, _profile = fake_device(resolutions=[FakeResolution(0), resolution])
+        record = {
+            "type": "resolution",
+            "profile": 0,
+            "index": 1,
+            "resolution": [1600],
+            "active": True,
+            "default": True,
+        }
+        self.assertEqual(deviceconfig.apply_records([record], device), [])
+        self.assertEqual(resolution.resolution, (1600,))
+        self.assertTrue(resolution.is_active)
+        self.assertTrue(resolution.is_default)
+
+    def test_disable(self):
+        resolution = FakeResolution(0, can_disable=True)
+        device, _profile = fake_device(resolutions=[resolution])
+        record = {"type": "resolution", "profile": 0, "index": 0, "disabled": True}
+        record["resolution"] = [800]
+        deviceconfig.apply_records([record], device)
+        self.assertTrue(resolution.is_disabled)
+
+    def test_incompatible(self):
+        records = [
+            # An unsupported value.
+            {"type": "resolution", "profile": 0, "index": 0, "resolution": [999]},
+            # Separate x and y resolutions on a device with only one.
+            {"type": "resolution", "profile": 0, "index": 0, "resolution": [800, 800]},
+            # A resolution that cannot be disabled.
+            {
+                "type": "resolution",
+                "profile": 0,
+                "index": 0,
+                "resolution": [800],
+                "disabled": True,
+            },
+            # A resolution the device doesn't have.
+            {"type": "resolution", "profile": 0, "index": 5, "resolution": [800]},
+        ]
+        for record in records:
+            device, _profile = fake_device(resolutions=[FakeResolution(0)])
+            with self.assertRaises(deviceconfig.ConfigIncompatibleError, msg=record):
+                deviceconfig.apply_records([record], device)
+
+    def test_not_strict(self):
+        resolutions = [FakeResolution(0), FakeResolution(1)]
+        device, _profile = fake_device(resolutions=resolutions)
+        records = [
+            {"type": "resolution", "profile": 0, "index": 0, "resolution": [999]},
+            {"type": "resolution", "profile": 0, "index": 1, "resolution": [3200]},
+        ]
+        problems = deviceconfig.apply_records(records, device, strict=False)
+        self.assertEqual(len(problems), 1)
+        self.assertTrue(problems[0].startswith("profile 0 resolution 0: "))
+        self.assertEqual(resolutions[0].resolution, (800,))
+        self.assertEqual(resolutions[1].resolution, (3200,))
+
+
+class TestApplyButton(unittest.TestCase):
+    def apply(self, record, button=None, strict=True):
+        button = button or FakeButton(0)
+        device, _profile = fake_device(buttons=[button])
+        record = dict({"type": "button", "profile": 0, "index": 0}, **record)
+        problems = deviceconfig.apply_records([record], device, strict=strict)
+        return button, problems
+
+    def test_none(self):
+        button, _problems = self.apply({"action": "none"})
+        self.assertEqual(button.action_type, ratbagd.RatbagdButton.ActionType.NONE)
+
+    def test_button(self):
+        button, _problems = self.apply({"action": "button", "button": 3})
+        self.assertEqual(button.mapping, 3)
+
+    def test_special(self):
+        button, _problems = self.apply({"action": "special", "special": "wheel_up"})
+        self.assertEqual(button.special, ratbagd.RatbagdButton.ActionSpecial.WHEEL_UP)
+
+    def test_key(self):
+        button, _problems = self.apply({"action": "key", "key": 30})
+        self.assertEqual(button.key, 30)
+
+    def test_macro(self):
+        Macro = ratbagd.RatbagdButton.Macro
+        macro = [["key_press", 30], ["wait", 50], ["key_release", 30]]
+        button, _problems = self.apply({"action": "macro", "macro": macro})
+        self.assertEqual(
+            button.macro.keys,
+            [(Macro.KEY_PRESS, 30), (Macro.WAIT, 50), (Macro.KEY_RELEASE, 30)],
+        )
+
+    def test_unknown(self):
+        # Actions exported from a newer ratbagd leave the button as it is.
+        for record in (
+            {"action": "unknown"},
+            {"action": "special", "special": "unknown"},
+        ):
+            button, problems = self.apply(record)
+            self.assertEqual(problems, [])
+            self.assertEqual(
+                button.action_type, ratbagd.RatbagdButton.ActionType.BUTTON
+            )
+            self.assertEqual(button.mapping, 1)
+
+    def test_unsupported_action(self):
+        ActionType = ratbagd.RatbagdButton.ActionType
+        button = FakeButton(0, action_types=[ActionType.BUTTON])
+        with self.assertRaises(deviceconfig.ConfigIncompatibleError):
+            self.apply({"action": "key", "key": 30}, button)
+        button, problems = self.apply({"action": "key", "key": 30}, button, False)
+        self.assertEqual(len(problems), 1)
+        self.assertEqual(button.key, 0)
+
+    def test_malformed(self):
+        for record in (
+            {"action": "teleport"},
+            {"action": "special", "special": "teleport"},
+            {"action": "macro", "macro": [["teleport", 30]]},
+            {"action": "button"},
+        ):
+            with self.assertRaises(deviceconfig.ConfigFormatError, msg=record):
+                self.apply(record)
+            _button, problems = self.apply(record, strict=False)
+            self.assertEqual(len(problems), 1, msg=record)
+
+    def test_export_unknown_special(self):
+        button = FakeButton(0)
+        button.action_type = ratbagd.RatbagdButton.ActionType.SPECIAL
+        button.special = 12345
+        profile = FakeProfile(0, True, buttons=[button])
+        records = list(deviceconfig.profile_records(profile))
+        self.assertEqual(records[-1]["special"], "unknown")
+        _button, problems = self.apply(records[-1])
+        self.assertEqual(problems, [])
+
+
+class TestApplyLed(unittest.TestCase):
+    def test_apply(self):
+        led = FakeLed(0)
+        device, _profile = fake_device(leds=[led])
+        record = {
+            "type": "led",
+            "profile": 0,
+            "index": 0,
+            "mode": "breathing",
+            "color": [255, 0, 128],
+            "brightness": 200,
+            "effect_duration": 1000,
+        }
+        self.assertEqual(deviceconfig.apply_records([record], device), [])
+        self.assertEqual(led.mode, ratbagd.RatbagdLed.Mode.BREATHING)
+        self.assertEqual(led.color, (255, 0, 128))
+        self.assertEqual(led.brightness, 200)
+        self.assertEqual(led.effect_duration, 1000)
+
+    def test_unsupported_mode(self):
+        Mode = ratbagd.RatbagdLed.Mode
+        led = FakeLed(0, modes=[Mode.OFF, Mode.ON])
+        device, _profile = fake_device(leds=[led])
+        record = {"type": "led", "profile": 0, "index": 0, "mode": "cycle"}
+        with self.assertRaises(deviceconfig.ConfigIncompatibleError):
+            deviceconfig.apply_records([record], device)
+        problems = deviceconfig.apply_records([record], device, strict=False)
+        self.assertEqual(len(problems), 1)
+        self.assertEqual(led.mode, Mode.OFF)
+
+    def test_unknown_mode(self):
+        device, _profile = fake_device(leds=[FakeLed(0)])
+        record = {"type": "led", "profile": 0, "index": 0, "mode": "disco"}
+        with self.assertRaises(deviceconfig.ConfigFormatError):
+            deviceconfig.apply_records([record], device)
+
+
+def main():
+    global deviceconfig, ratbagd
+
+    parser = argparse.ArgumentParser(description="Configuration file format test")
+    parser.add_argument("srcdir", nargs=1, help="Directory containing piper/")
+    args, remainder = parser.parse_known_args()
+    sys.path.insert(0, args.srcdir[0])
+    from piper import deviceconfig as module
+    from piper import ratbagd as ratbagd_module
+
+    deviceconfig = module
+    ratbagd = ratbagd_module
+    unittest.main(argv=[sys.argv[0], *remainder])
+
+
+if __name__ == "__main__":
+    main()
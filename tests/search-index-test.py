@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+import argparse
+import unittest
+import sys
+
+search = None
+
+TEXTS = {
+    "left": "left mouse button click",
+    "right": "right mouse button click",
+    "double": "doubleclick",
+    "wheel-up": "wheel up",
+    "wheel-down": "wheel down",
+    "volume": "lautstärke erhöhen volume up",
+    "disable": "disable",
+}
+
+
+def build():
+    index = search.SearchIndex()
+    for item, text in TEXTS.items():
+        index.add(item, text.casefold())
+    return index
+
+
+def brute_force(terms):
+    # What the index must find: the items with every term in one of the
+    # words of their text.
+    return {
+        item
+        for item, text in TEXTS.items()
+        if all(any(term in word for word in text.split(" ")) for term in terms)
+    }
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = build()
+
+    def assertSearch(self, query, expected, candidates=None):
+        terms = query.casefold().split(" ")
+        self.assertEqual(self.index.search(terms, candidates), set(expected), msg=query)
+
+    def test_empty(self):
+        self.assertSearch("", TEXTS)
+        self.assertEqual(self.index.items, set(TEXTS))
+
+    def test_prefix(self):
+        self.assertSearch("wh", ["wheel-up", "wheel-down"])
+
+    def test_inside_word(self):
+        self.assertSearch("click", ["left", "right", "double"])
+        self.assertSearch("eel", ["wheel-up", "wheel-down"])
+
+    def test_casefold(self):
+        self.assertSearch("LAUTSTÄRKE", ["volume"])
+        self.assertSearch("strasse", [])
+
+    def test_no_match(self):
+        self.assertSearch("xyz", [])
+        self.assertSearch("click xyz", [])
+
+    def test_multiple_terms(self):
+        self.assertSearch("mouse click", ["left", "right"])
+        self.assertSearch("click mouse", ["left", "right"])
+        self.assertSearch("up wheel", ["wheel-up"])
+        self.assertSearch("wheel  up", ["wheel-up"])
+
+    def test_terms_span_no_words(self):
+        # A term never matches across the space between two words.
+        self.assertSearch("lup", [])
+
+    def test_narrowing(self):
+        # Each keystroke only searches the matches of the previous search.
+        previous = None
+        for query in ("w", "wh", "whe", "wheel", "wheel ", "wheel d"):
+            terms = query.split(" ")
+            matches = self.index.search(terms, previous)
+            self.assertEqual(matches, brute_force(terms), msg=query)
+            previous = matches
+        self.assertEqual(previous, {"wheel-down"})
+
+    def test_widening(self):
+        # Deleting characters searches all items again, including terms that
+        # were searched before.
+        for query in ("wheel d", "wheel ", "wheel", "whe", "w", "wheel up"):
+            terms = query.split(" ")
+            self.assertEqual(self.index.search(terms), brute_force(terms), msg=query)
+
+    def test_candidates(self):
+        self.assertSearch("click", ["left"], candidates={"left", "wheel-up"})
+        self.assertSearch("", ["volume"], candidates={"volume"})
+
+    def test_add_after_search(self):
+        self.assertSearch("click", ["left", "right", "double"])
+        self.index.add("middle", "middle click")
+        self.assertSearch("click", ["left", "right", "double", "middle"])
+
+    def test_every_substring(self):
+        for text in TEXTS.values():
+            for word in text.split(" "):
+                for i in range(len(word)):
+                    for j in range(i + 1, len(word) + 1):
+                        terms = [word[i:j]]
+                        self.assertEqual(
+                            self.index.search(terms), brute_force(terms), msg=terms
+                        )
+
+
+def main():
+    global search
+
+    parser = argparse.ArgumentParser(description="Search index test")
+    parser.add_argument("srcdir", nargs=1, help="Directory containing piper/")
+    args, remainder = parser.parse_known_args()
+    sys.path.insert(0, args.srcdir[0])
+    from piper.util import search as module
+
+    search = module
+    unittest.main(argv=[sys.argv[0], *remainder])
+
+
+if __name__ == "__main__":
+    main()
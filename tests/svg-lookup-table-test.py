@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+import argparse
+import ast
+import subprocess
+import tempfile
+import unittest
+import sys
+from pathlib import Path
+from unittest import mock
+
+srcdir = None
+svg = None
+table = None
+
+LOOKUP = """
+[Exact]
+DeviceMatch=usb:046d:c08b;usb:046d:c08b:2
+Svg=exact.svg
+
+[Versions]
+DeviceMatch=usb:046d:c08b:3-5;usb:046d:c08b:9
+Svg=versions.svg
+
+[AnyVersion]
+DeviceMatch=usb:046d:4079:*
+Svg=any-version.svg
+
+[AnyProduct]
+DeviceMatch=usb:046d:*:*
+Svg=any-product.svg
+
+[AnyVendor]
+DeviceMatch=usb:*:4079:*;usb:*:c08b:7-8
+Svg=any-vendor.svg
+
+[Bluetooth]
+DeviceMatch=bluetooth:046d:b01a
+Svg=bluetooth.svg
+"""
+
+
+def generate(text, svgs):
+    # Runs the build's generator on the given svg-lookup.ini, returns its exit
+    # status and the table it wrote.
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name in svgs:
+            Path(tmpdir, name).touch()
+        infile = Path(tmpdir, "svg-lookup.ini")
+        infile.write_text(text)
+        outfile = Path(tmpdir, "svg-lookup.table")
+        result = subprocess.run(
+            [
+                sys.executable,
+                str(Path(srcdir, "data", "generate-svg-lookup-table.py")),
+                str(infile),
+                str(outfile),
+                tmpdir,
+            ],
+            capture_output=True,
+        )
+        table = (
+            ast.literal_eval(outfile.read_text()) if result.returncode == 0 else None
+        )
+        return result.returncode, table
+
+
+def svg_names(text):
+    return [
+        line.split("=", 1)[1] for line in text.split("\n") if line.startswith("Svg=")
+    ]
+
+
+class TestMatch(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(svg, "_get_lookup", lambda: table)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        svg.get_svg_resource_path.cache_clear()
+        self.addCleanup(svg.get_svg_resource_path.cache_clear)
+
+    def assertMatches(self, model, filename):
+        self.assertEqual(
+            svg.get_svg_resource_path(model).rsplit("/", 1)[-1], filename, msg=model
+        )
+
+    def test_exact(self):
+        self.assertMatches("usb:046d:c08b:0", "exact.svg")
+        self.assertMatches("usb:046d:c08b:2", "exact.svg")
+        self.assertMatches("bluetooth:046d:b01a:0", "bluetooth.svg")
+
+    def test_version_range(self):
+        for version in (3, 4, 5, 9):
+            self.assertMatches(f"usb:046d:c08b:{version}", "versions.svg")
+
+    def test_version_outside_range(self):
+        # The product has no wildcard version, so these fall back to the
+        # vendor's wildcard product.
+        self.assertMatches("usb:046d:c08b:1", "any-product.svg")
+        self.assertMatches("usb:046d:c08b:6", "any-product.svg")
+
+    def test_wildcard_version(self):
+        self.assertMatches("usb:046d:4079:0", "any-version.svg")
+        self.assertMatches("usb:046d:4079:12", "any-version.svg")
+
+    def test_exact_product_beats_wildcard_vendor(self):
+        self.assertMatches("usb:046d:4079:3", "any-version.svg")
+        self.assertMatches("usb:1038:4079:3", "any-vendor.svg")
+
+    def test_wildcard_product(self):
+        self.assertMatches("usb:046d:1234:0", "any-product.svg")
+
+    def test_wildcard_vendor_with_range(self):
+        self.assertMatches("usb:1038:c08b:7", "any-vendor.svg")
+        self.assertMatches("usb:1038:c08b:8", "any-vendor.svg")
+        self.assertMatches("usb:1038:c08b:9", "fallback.svg")
+
+    def test_bus(self):
+        self.assertMatches("bluetooth:046d:c08b:0", "fallback.svg")
+        self.assertMatches("usb:046d:b01a:0", "any-product.svg")
+
+    def test_fallback(self):
+        self.assertMatches("usb:1038:1702:0", "fallback.svg")
+        self.assertMatches("i2c:046d:c08b:0", "fallback.svg")
+
+
+class TestGenerator(unittest.TestCase):
+    def assertRejected(self, text, svgs=("a.svg", "b.svg")):
+        status, _table = generate(text, svgs)
+        self.assertNotEqual(status, 0)
+
+    def test_table(self):
+        versions = table["usb"]["046d"]["c08b"]
+        self.assertEqual(versions[0], "exact.svg")
+        self.assertEqual(versions[(3, 5)], "versions.svg")
+        self.assertEqual(table["usb"]["*"]["4079"]["*"], "any-vendor.svg")
+
+    def test_duplicate(self):
+        self.assertRejected(
+            "[A]\nDeviceMatch=usb:046d:c08b\nSvg=a.svg\n"
+            "[B]\nDeviceMatch=usb:046d:c08b:0\nSvg=b.svg\n"
+        )
+
+    def test_overlapping_ranges(self):
+        self.assertRejected(
+            "[A]\nDeviceMatch=usb:046d:c08b:1-4\nSvg=a.svg\n"
+            "[B]\nDeviceMatch=usb:046d:c08b:4-6\nSvg=b.svg\n"
+        )
+
+    def test_version_in_range(self):
+        self.assertRejected(
+            "[A]\nDeviceMatch=usb:046d:c08b:1-4\nSvg=a.svg\n"
+            "[B]\nDeviceMatch=usb:046d:c08b:2\nSvg=b.svg\n"
+        )
+
+    def test_empty_range(self):
+        self.assertRejected("[A]\nDeviceMatch=usb:046d:c08b:4-1\nSvg=a.svg\n")
+
+    def test_malformed(self):
+        self.assertRejected("[A]\nDeviceMatch=usb:46d:c08b\nSvg=a.svg\n")
+        self.assertRejected("[A]\nDeviceMatch=usb:046d:c0*\nSvg=a.svg\n")
+
+    def test_missing_svg(self):
+        self.assertRejected("[A]\nDeviceMatch=usb:046d:c08b\nSvg=c.svg\n")
+
+
+def setUpModule():
+    global table
+
+    status, table = generate(LOOKUP, svg_names(LOOKUP))
+    assert status == 0
+
+
+def main():
+    global srcdir, svg
+
+    parser = argparse.ArgumentParser(description="SVG lookup table test")
+    parser.add_argument("srcdir", nargs=1, help="Directory containing piper/")
+    args, remainder = parser.parse_known_args()
+    srcdir = args.srcdir[0]
+    sys.path.insert(0, srcdir)
+    from piper import svg as module
+
+    svg = module
+    unittest.main(argv=[sys.argv[0], *remainder])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+import argparse
+import unittest
+import sys
+
+svgpath = None
+
+# The paths whose simplification is checked against the tolerance.
+PATHS = [
+    # A circle of four cubics.
+    "M 50 0 C 77.6 0 100 22.4 100 50 C 100 77.6 77.6 100 50 100 "
+    "C 22.4 100 0 77.6 0 50 C 0 22.4 22.4 0 50 0 Z",
+    # Nearly collinear lines and nearly flat curves.
+    "M 0 0 L 10 0.1 L 20 -0.1 L 30 0.05 L 40 0 C 50 0.1 60 -0.1 70 0 "
+    "Q 80 0.2 90 0 L 90 50 L 0 50 Z",
+    # Two subpaths, with lines after closing the first one.
+    "M 0 0 L 100 0 L 100 100 Z L 50 50 L 0 0 M 200 200 l 10 0 l 10 0.2 "
+    "l 10 -0.2 l 10 0 z l -5 5 l -5 5",
+    # A zigzag that must keep all its vertices.
+    "M 0 0 L 10 10 L 20 0 L 30 10 L 40 0 L 50 10",
+]
+
+
+def sample(commands, steps=64):
+    # Returns the polylines of each subpath of the absolute commands, with
+    # the curves sampled densely.
+    polylines = []
+    current = start = (0.0, 0.0)
+    for command, args in commands:
+        if command == "M":
+            current = start = (args[0], args[1])
+            polylines.append([current])
+            continue
+        if not polylines:
+            polylines.append([current])
+        if command == "Z":
+            polylines[-1].append(start)
+            current = start
+            continue
+        end = (args[-2], args[-1])
+        if command == "C":
+            p1, p2 = (args[0], args[1]), (args[2], args[3])
+            for i in range(1, steps + 1):
+                t = i / steps
+                polylines[-1].append(
+                    tuple(
+                        (1 - t) ** 3 * current[k]
+                        + 3 * (1 - t) ** 2 * t * p1[k]
+                        + 3 * (1 - t) * t**2 * p2[k]
+                        + t**3 * end[k]
+                        for k in range(2)
+                    )
+                )
+        elif command == "Q":
+            q = (args[0], args[1])
+            for i in range(1, steps + 1):
+                t = i / steps
+                polylines[-1].append(
+                    tuple(
+                        (1 - t) ** 2 * current[k]
+                        + 2 * (1 - t) * t * q[k]
+                        + t**2 * end[k]
+                        for k in range(2)
+                    )
+                )
+        else:
+            polylines[-1].append(end)
+        current = end
+    return polylines
+
+
+def distance_to_polyline(p, polyline):
+    return min(
+        svgpath._segment_distance(p, a, b) for a, b in zip(polyline, polyline[1:])
+    )
+
+
+def max_deviation(original, simplified):
+    # The largest distance of a point of either outline from the other one,
+    # comparing subpath by subpath.
+    a, b = sample(original), sample(simplified)
+    assert len(a) == len(b)
+    deviation = 0.0
+    for x, y in zip(a, b):
+        for p in x:
+            deviation = max(deviation, distance_to_polyline(p, y))
+        for p in y:
+            deviation = max(deviation, distance_to_polyline(p, x))
+    return deviation
+
+
+class TestSimplify(unittest.TestCase):
+    def test_lines_after_close(self):
+        # Z returns to the start of the subpath, so the line to 50,50 starts
+        # at 0,0 and cannot be dropped.
+        commands = svgpath.absolute_commands("M0 0 L100 0 L100 100 Z L50 50 L0 0")
+        simplified = svgpath.simplify_commands(commands, 1.0)
+        self.assertIn(("L", [50.0, 50.0]), simplified)
+        self.assertLessEqual(max_deviation(commands, simplified), 1.0)
+
+    def test_tolerance(self):
+        for d in PATHS:
+            commands = svgpath.absolute_commands(d)
+            for tolerance in (0.1, 0.5, 1.0):
+                simplified = svgpath.simplify_commands(commands, tolerance)
+                self.assertLessEqual(
+                    max_deviation(commands, simplified),
+                    tolerance + 1e-9,
+                    msg=f"{d} with tolerance {tolerance}",
+                )
+                self.assertLessEqual(
+                    svgpath.count_nodes(simplified), svgpath.count_nodes(commands)
+                )
+
+    def test_simplifies(self):
+        commands = svgpath.absolute_commands(PATHS[1])
+        simplified = svgpath.simplify_commands(commands, 0.5)
+        self.assertLess(svgpath.count_nodes(simplified), svgpath.count_nodes(commands))
+
+    def test_keeps_corners(self):
+        commands = svgpath.absolute_commands(PATHS[3])
+        self.assertEqual(svgpath.simplify_commands(commands, 1.0), commands)
+
+
+def main():
+    global svgpath
+
+    parser = argparse.ArgumentParser(description="SVG path simplification test")
+    parser.add_argument("datadir", nargs=1, help="Directory containing svgpath.py")
+    args, remainder = parser.parse_known_args()
+    sys.path.insert(0, args.datadir[0])
+    import svgpath as module
+
+    svgpath = module
+    unittest.main(argv=[sys.argv[0], *remainder])
+
+
+if __name__ == "__main__":
+    main()
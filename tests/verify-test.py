@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+import argparse
+import unittest
+import sys
+
+verify = None
+
+ACTUAL = [
+    {"type": "device", "model": "usb:046d:c08b:0", "name": "Logitech G502"},
+    {"type": "profile", "profile": 0, "active": True, "name": "Default"},
+    {"type": "resolution", "profile": 0, "index": 0, "resolution": [800]},
+    {"type": "resolution", "profile": 0, "index": 1, "resolution": [1600]},
+    {"type": "button", "profile": 0, "index": 0, "action": "button", "button": 1},
+    {"type": "led", "profile": 0, "index": 0, "mode": "on", "color": [255, 0, 0]},
+]
+
+
+def changed(record, **fields):
+    return dict(record, **fields)
+
+
+class TestCompareRecords(unittest.TestCase):
+    def test_identical(self):
+        self.assertEqual(verify.compare_records(ACTUAL, ACTUAL), [])
+
+    def test_empty(self):
+        self.assertEqual(verify.compare_records([], ACTUAL), [])
+
+    def test_mismatch(self):
+        intended = [changed(ACTUAL[3], resolution=[3200])]
+        mismatches = verify.compare_records(intended, ACTUAL)
+        self.assertEqual(
+            mismatches,
+            ["profile 0 resolution 1: resolution is [1600], expected [3200]"],
+        )
+
+    def test_one_message_per_field(self):
+        intended = [changed(ACTUAL[5], mode="breathing", color=[0, 0, 255])]
+        mismatches = verify.compare_records(intended, ACTUAL)
+        self.assertEqual(len(mismatches), 2)
+        self.assertTrue(all(m.startswith("profile 0 led 0: ") for m in mismatches))
+
+    def test_missing(self):
+        intended = [changed(ACTUAL[4], index=7)]
+        self.assertEqual(
+            verify.compare_records(intended, ACTUAL),
+            ["profile 0 button 7: missing on the device"],
+        )
+
+    def test_missing_profile(self):
+        intended = [changed(ACTUAL[1], profile=3)]
+        self.assertEqual(
+            verify.compare_records(intended, ACTUAL),
+            ["profile 3: missing on the device"],
+        )
+
+    def test_partial_record(self):
+        # Only the properties present in the intended record are compared.
+        intended = [{"type": "led", "profile": 0, "index": 0, "mode": "on"}]
+        self.assertEqual(verify.compare_records(intended, ACTUAL), [])
+
+    def test_property_missing_on_device(self):
+        intended = [changed(ACTUAL[4], macro=[["key_press", 30]])]
+        self.assertEqual(len(verify.compare_records(intended, ACTUAL)), 1)
+
+    def test_name_not_verified(self):
+        intended = [changed(ACTUAL[1], name="Games")]
+        self.assertEqual(verify.compare_records(intended, ACTUAL), [])
+
+    def test_device_record_ignored(self):
+        intended = [changed(ACTUAL[0], model="usb:1038:1702:0")]
+        self.assertEqual(verify.compare_records(intended, ACTUAL), [])
+
+    def test_generators(self):
+        mismatches = verify.compare_records(iter(ACTUAL), iter(ACTUAL))
+        self.assertEqual(mismatches, [])
+
+
+def main():
+    global verify
+
+    parser = argparse.ArgumentParser(description="Configuration verification test")
+    parser.add_argument("srcdir", nargs=1, help="Directory containing piper/")
+    args, remainder = parser.parse_known_args()
+    sys.path.insert(0, args.srcdir[0])
+    from piper import verify as module
+
+    verify = module
+    unittest.main(argv=[sys.argv[0], *remainder])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Compares the startup time of piper-cli with that of the GUI. Both are run
+with --help from a build directory, which covers all imports and resource
+loading but exits before connecting to ratbagd or opening a window."""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+
+def measure(command, runs):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            command,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("builddir", help="the meson build directory")
+    parser.add_argument(
+        "-n", "--runs", type=int, default=10, help="runs per command (default: 10)"
+    )
+    args = parser.parse_args()
+
+    commands = {
+        "piper-cli": ["piper-cli.devel", "--help"],
+        "piper --cli": ["piper.devel", "--cli", "--help"],
+        "piper (GUI)": ["piper.devel", "--help"],
+    }
+    for name, (script, *options) in commands.items():
+        path = os.path.join(args.builddir, script)
+        if not os.path.exists(path):
+            print(f"{path} does not exist, did you build piper?", file=sys.stderr)
+            return 1
+        # Warm up the page cache and the bytecode cache first.
+        measure([sys.executable, path, *options], 1)
+        timings = measure([sys.executable, path, *options], args.runs)
+        print(
+            f"{name:<12} median {statistics.median(timings) * 1000:7.1f}ms  "
+            f"min {min(timings) * 1000:7.1f}ms  max {max(timings) * 1000:7.1f}ms"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
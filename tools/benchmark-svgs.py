@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# SPDX-License-Identifier: GPL-2.0-or-later
+
+"""Measures how expensive every device SVG in svg-lookup.ini is to load, lay
+out and draw in a MouseMap, rendering offscreen. For each SVG this times
+get_svg, creating the Rsvg handle, parsing it with lxml and as SvgDocument,
+the MouseMap's size negotiation, and drawing it to an image surface at scale
+factors 1 and 2: the first draw, which rasterizes the cached layers, a
+cached draw and a draw with a highlighted element.
+
+The results are written as JSON, with timings in milliseconds keyed by SVG
+file name. Comparing against a baseline saved earlier reports every timing
+that got slower than the threshold and fails if there is any.
+
+GTK needs a display, run this under xvfb-run if there is none. Each scale
+factor is measured in its own process as GDK_SCALE is read at startup."""
+
+import argparse
+import configparser
+import json
+import os
+import subprocess
+import sys
+import time
+import types
+
+SRCDIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCALES = (1, 2)
+# Timings below this many milliseconds are noise, they are never reported as
+# regressions.
+NOISE_FLOOR = 0.1
+
+
+def best_of(runs, func):
+    # The best of a few runs of func, in milliseconds, and its last result.
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def once(func):
+    return best_of(1, func)
+
+
+def devices():
+    # Yields the device name, a model matching the device and the SVG file
+    # name of every entry in svg-lookup.ini. Wildcards and ranges are
+    # replaced by a concrete value.
+    config = configparser.ConfigParser(strict=True)
+    config.read(os.path.join(SRCDIR, "data", "svgs", "svg-lookup.ini"))
+    for name in config.sections():
+        pattern = config[name]["DeviceMatch"].split(";")[0]
+        bus, vid, pid, *version = pattern.split(":")
+        version = version[0] if version else "0"
+        version = "0" if version == "*" else version.split("-")[0]
+        vid = "0000" if vid == "*" else vid
+        pid = "0000" if pid == "*" else pid
+        yield name, f"{bus}:{vid}:{pid}:{version}", config[name]["Svg"]
+
+
+def measure_scale(builddir, runs):
+    # Measures every SVG in this process, at the scale factor GTK picked up
+    # from GDK_SCALE.
+    sys.path.insert(0, SRCDIR)
+    import cairo
+    import gi
+
+    gi.require_version("Gdk", "3.0")
+    gi.require_version("Gtk", "3.0")
+    gi.require_version("Rsvg", "2.0")
+    from gi.repository import Gdk, Gio, Gtk, Rsvg
+    from lxml import etree
+
+    if not Gtk.init_check()[0]:
+        print("Cannot initialize GTK, is there a display?", file=sys.stderr)
+        sys.exit(1)
+    resource = Gio.resource_load(os.path.join(builddir, "data", "piper.gresource"))
+    Gio.Resource._register(resource)
+
+    from piper import svg, svgdocument
+    from piper.mousemap import MouseMap
+
+    def measure(model):
+        timings = {}
+        svg.get_svg_resource_path.cache_clear()
+        timings["get_svg"], data = once(lambda: svg.get_svg(model))
+        timings["rsvg"], _ = best_of(runs, lambda: Rsvg.Handle.new_from_data(data))
+        timings["lxml"], _ = best_of(runs, lambda: etree.fromstring(data))
+        # Acquiring the document first makes MouseMap get it synchronously.
+        timings["document"], document = once(
+            lambda: svgdocument.acquire_document(model)
+        )
+
+        device = types.SimpleNamespace(model=model)
+        window = Gtk.OffscreenWindow()
+        mousemap = MouseMap("#Buttons", device, spacing=20, border_width=20)
+        geometry = svg.get_svg_geometry(document.path) or {"elements": {}}
+        elements = [
+            svg_id
+            for svg_id in geometry["elements"]
+            if svg_id.startswith(("#button", "#led")) and "-" not in svg_id
+        ]
+        for svg_id in elements:
+            mousemap.add(Gtk.Label(label=svg_id), svg_id)
+        window.add(mousemap)
+        window.show_all()
+
+        def layout():
+            mousemap.queue_resize()
+            size = mousemap.get_preferred_size()[1]
+            allocation = Gdk.Rectangle()
+            allocation.width, allocation.height = size.width, size.height
+            mousemap.size_allocate(allocation)
+            return allocation
+
+        timings["layout"], allocation = best_of(runs, layout)
+
+        scale = mousemap.get_scale_factor()
+
+        def draw():
+            surface = cairo.ImageSurface(
+                cairo.FORMAT_ARGB32,
+                allocation.width * scale,
+                allocation.height * scale,
+            )
+            surface.set_device_scale(scale, scale)
+            mousemap.draw(cairo.Context(surface))
+
+        timings[f"draw@{scale}"], _ = once(draw)
+        timings[f"draw_cached@{scale}"], _ = best_of(runs, draw)
+        if elements:
+            # Hovering a child highlights its element, the first hover also
+            # renders the element's mask.
+            child = mousemap.get_children()[0]
+            event = Gdk.Event.new(Gdk.EventType.ENTER_NOTIFY)
+            child.emit("enter-notify-event", event)
+            timings[f"hover@{scale}"], _ = once(draw)
+            timings[f"hover_cached@{scale}"], _ = best_of(runs, draw)
+
+        window.destroy()
+        svgdocument.release_document(document)
+        return timings
+
+    results = {}
+    for name, model, filename in devices():
+        if filename in results:
+            continue
+        timings = measure(model)
+        timings["device"] = name
+        results[filename] = timings
+    return results
+
+
+def compare(results, baseline, threshold):
+    # Prints the timings that regressed by more than the threshold and
+    # returns their number.
+    regressions = 0
+    for filename, timings in sorted(results.items()):
+        base = baseline.get(filename, {})
+        for key, value in sorted(timings.items()):
+            old = base.get(key)
+            if not isinstance(value, float) or not isinstance(old, float):
+                continue
+            if value > old * (1 + threshold) and value - old > NOISE_FLOOR:
+                print(
+                    f"{filename} {key}: {old:.2f}ms -> {value:.2f}ms "
+                    f"(+{value / old - 1:.0%})",
+                    file=sys.stderr,
+                )
+                regressions += 1
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("builddir", help="the meson build directory")
+    parser.add_argument(
+        "-n", "--runs", type=int, default=5, help="runs per timing (default: 5)"
+    )
+    parser.add_argument("-o", "--output", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against this earlier result")
+    parser.add_argument("--save-baseline", help="also save the results here")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="how much slower a timing may get before it is reported as a "
+        "regression (default: 0.2, i.e. 20%%)",
+    )
+    parser.add_argument("--scale", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.builddir, "data", "piper.gresource")):
+        print(
+            f"{args.builddir} has no piper.gresource, did you build piper?",
+            file=sys.stderr,
+        )
+        return 1
+
+    if args.scale is not None:
+        # Running as the child process of one scale factor.
+        json.dump(measure_scale(args.builddir, args.runs), sys.stdout)
+        return 0
+
+    results = {}
+    for scale in SCALES:
+        env = dict(os.environ, GDK_SCALE=str(scale))
+        command = [sys.executable, __file__, args.builddir, "--scale", str(scale)]
+        command += ["--runs", str(args.runs)]
+        output = subprocess.run(command, env=env, check=True, stdout=subprocess.PIPE)
+        # The timings that don't depend on the scale factor are measured by
+        # every process, only those of the first one are kept. Later ones
+        # find the files in warmer caches.
+        for filename, timings in json.loads(output.stdout).items():
+            for key, value in timings.items():
+                results.setdefault(filename, {}).setdefault(key, value)
+
+    text = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            f.write(text + "\n")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{regressions} timings regressed", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())